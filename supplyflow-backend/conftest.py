@@ -0,0 +1,46 @@
+"""
+Shared fixtures: graph services over random networks
+"""
+
+import numpy as np
+import pytest
+
+from services.graph_loader import network_from_records
+from services.graph_service import GraphService
+
+def make_edge(rng, edge_id, source, target):
+    """Road edge with random weights and a risk below 0.3"""
+    return {
+        "id": edge_id,
+        "source_id": source,
+        "target_id": target,
+        "route_type": "road",
+        "distance": float(rng.integers(10, 1000)),
+        "cost": float(rng.integers(10, 1000)),
+        "duration": float(rng.integers(1, 100)),
+        "risk_score": float(rng.random() * 0.3)
+    }
+
+def make_service(num_nodes=30, num_edges=90, seed=0):
+    """CSR graph service over a random network, and the generator for further edges"""
+    rng = np.random.default_rng(seed)
+    nodes = [{"id": f"n{i}", "name": f"Node {i}", "type": "warehouse"} for i in range(num_nodes)]
+    pairs = set()
+    edges = []
+    while len(edges) < num_edges:
+        source, target = rng.integers(0, num_nodes, 2).tolist()
+        if source == target or (source, target) in pairs:
+            continue
+        pairs.add((source, target))
+        edges.append(make_edge(rng, f"e{len(edges)}", f"n{source}", f"n{target}"))
+    service = GraphService()
+    service.install_network(network_from_records(nodes, edges))
+    return service, rng
+
+@pytest.fixture
+def build_service():
+    return make_service
+
+@pytest.fixture
+def random_edge():
+    return make_edge
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 import uvicorn
 import asyncio
+import os
+import time
 from contextlib import asynccontextmanager
-import json
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,27 +14,21 @@ load_dotenv()
 
 # Import routers
 from routers import graph, ml, disruptions
-from services.graph_service import GraphService
-from services.ml_service import MLService
+from services.registry import ServiceRegistry
+from services.ws_session import WebSocketSession
+from services.serialization import ENCODINGS, FastJSONResponse, dumps_str
 
-# Global services
-graph_service = None
-ml_service = None
+# Shared services, built once in lifespan and injected into every router
+registry = ServiceRegistry()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup"""
-    global graph_service, ml_service
-
     print("🚀 Starting SupplyFlow AI Backend...")
 
-    # Initialize services
-    graph_service = GraphService()
-    ml_service = MLService()
-
-    # Load sample data
-    await graph_service.load_sample_data()
-    await ml_service.initialize_models()
+    # Initialize services and load sample data
+    await registry.initialize()
+    app.state.services = registry
 
     print("✅ Backend services initialized successfully!")
 
@@ -40,13 +36,15 @@ async def lifespan(app: FastAPI):
 
     # Cleanup
     print("🔄 Shutting down services...")
+    await registry.shutdown()
 
 # Create FastAPI app with lifespan
 app = FastAPI(
     title="SupplyFlow AI Backend",
     description="AI-powered supply chain optimization and analytics API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -70,8 +68,9 @@ async def root():
         "message": "SupplyFlow AI Backend is running!",
         "version": "1.0.0",
         "services": {
-            "graph": graph_service is not None,
-            "ml": ml_service is not None
+            "graph": registry.graph_service is not None,
+            "ml": registry.ml_service is not None,
+            "disruptions": registry.disruption_service is not None
         }
     }
 
@@ -81,77 +80,105 @@ async def health_check():
     return {
         "status": "healthy",
         "services": {
-            "graph_service": "active" if graph_service else "inactive",
-            "ml_service": "active" if ml_service else "inactive"
+            "graph_service": "active" if registry.graph_service else "inactive",
+            "ml_service": "active" if registry.ml_service else "inactive",
+            "disruption_service": "active" if registry.disruption_service else "inactive"
         },
+        "stream": registry.broadcaster.stats() if registry.broadcaster else None,
+        "response_cache": registry.response_cache.stats(),
+        "change_feed": registry.graph_service.changes.stats() if registry.graph_service else None,
         "memory_usage": "normal",
         "timestamp": asyncio.get_event_loop().time()
     }
 
 # Supply Chain Analysis Endpoint
+# Independent stages of /analyze, keyed by the response field they fill
+ANALYSIS_STAGES = {
+    "network_analysis": lambda data: registry.graph_service.analyze_network(data),
+    "disruption_prediction": lambda data: registry.ml_service.predict_disruptions(data),
+    "optimal_routes": lambda data: registry.graph_service.find_optimal_routes(data),
+    "recommendations": lambda data: registry.ml_service.generate_recommendations(data)
+}
+
+# Default per-stage deadline in seconds
+ANALYSIS_STAGE_TIMEOUT = float(os.getenv("ANALYZE_STAGE_TIMEOUT", "10"))
+
+async def run_analysis_stage(name: str, data: dict, timeout: float):
+    """Run one analysis stage under its deadline, returning (result, status)"""
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(ANALYSIS_STAGES[name](data), timeout=timeout)
+        status = {"status": "ok"}
+    except asyncio.TimeoutError:
+        result, status = None, {"status": "timeout", "timeout_seconds": timeout}
+    except Exception as e:
+        result, status = None, {"status": "error", "error": str(e)}
+
+    status["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result, status
+
 @app.post("/analyze")
 async def analyze_supply_chain(data: dict):
     """
     Comprehensive supply chain analysis
-    """
-    try:
-        if not graph_service or not ml_service:
-            raise HTTPException(status_code=503, detail="Services not initialized")
-
-        # Analyze network topology
-        network_analysis = await graph_service.analyze_network(data)
 
-        # Predict disruptions
-        disruption_prediction = await ml_service.predict_disruptions(data)
-
-        # Optimize routes
-        optimal_routes = await graph_service.find_optimal_routes(data)
-
-        # Generate recommendations
-        recommendations = await ml_service.generate_recommendations(data)
-
-        return {
-            "network_analysis": network_analysis,
-            "disruption_prediction": disruption_prediction,
-            "optimal_routes": optimal_routes,
-            "recommendations": recommendations,
-            "analysis_timestamp": asyncio.get_event_loop().time()
-        }
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    Stages run concurrently. Pass ``stages`` to pick a subset and
+    ``stage_timeouts`` ({stage: seconds}) to override the per-stage deadline;
+    a stage that fails or misses its deadline is returned as null with its
+    status so the rest of the analysis is still delivered.
+    """
+    if not registry.initialized:
+        raise HTTPException(status_code=503, detail="Services not initialized")
+
+    stages = data.get("stages") or list(ANALYSIS_STAGES)
+    unknown = [stage for stage in stages if stage not in ANALYSIS_STAGES]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown analysis stages {unknown}, expected any of {list(ANALYSIS_STAGES)}"
+        )
+
+    stage_timeouts = data.get("stage_timeouts") or {}
+    outcomes = await asyncio.gather(*[
+        run_analysis_stage(stage, data, float(stage_timeouts.get(stage, ANALYSIS_STAGE_TIMEOUT)))
+        for stage in stages
+    ])
+
+    if all(status["status"] != "ok" for _, status in outcomes):
+        errors = {stage: status for stage, (_, status) in zip(stages, outcomes)}
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {errors}")
+
+    response = {stage: result for stage, (result, _) in zip(stages, outcomes)}
+    response["stages"] = {stage: status for stage, (_, status) in zip(stages, outcomes)}
+    response["analysis_timestamp"] = asyncio.get_event_loop().time()
+    return response
 
 # Real-time Updates Stream
 @app.get("/stream")
-async def stream_updates():
+async def stream_updates(last_event_id: Optional[str] = Header(None)):
     """
     Server-sent events for real-time updates
-    """
-    async def generate_updates():
-        while True:
-            try:
-                # Check if ml_service is initialized
-                if not ml_service:
-                    yield f"data: {{\"error\": \"ML service not initialized\"}}\n\n"
-                    await asyncio.sleep(10)
-                    continue
-
-                # Get latest disruptions
-                disruptions = await ml_service.get_latest_disruptions()
 
-                # Format as SSE
-                yield f"data: {disruptions}\n\n"
+    Every client shares one producer. A new client receives a
+    ``disruption_snapshot`` followed by ``disruption_delta`` events; a
+    reconnecting client sending ``Last-Event-ID`` is sent only the deltas it
+    missed, or a fresh snapshot when they are no longer retained.
+    """
+    if not registry.initialized or registry.broadcaster is None:
+        raise HTTPException(status_code=503, detail="Services not initialized")
 
-                # Wait 30 seconds before next update
-                await asyncio.sleep(30)
+    subscription = registry.broadcaster.subscribe(last_event_id)
 
-            except Exception as e:
-                yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
-                await asyncio.sleep(10)
+    async def generate_updates():
+        try:
+            async for event in subscription:
+                yield event.frame
+        finally:
+            registry.broadcaster.unsubscribe(subscription)
 
     return StreamingResponse(
         generate_updates(),
-        media_type="text/plain",
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
@@ -160,53 +187,72 @@ async def stream_updates():
     )
 
 # WebSocket for real-time communication (optional)
+# Per-connection request limits for /ws
+WS_MAX_CONCURRENT = int(os.getenv("WS_MAX_CONCURRENT", "8"))
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "64"))
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket):
-    """WebSocket endpoint for real-time communication"""
+async def websocket_endpoint(websocket: WebSocket, encoding: str = "json"):
+    """
+    WebSocket endpoint for real-time communication
+
+    Requests tagged with an ``id`` are handled concurrently and answered out
+    of order with the same id; see ``WebSocketSession`` for cancel and
+    subscribe messages. ``?encoding=msgpack`` switches to binary MessagePack.
+    """
     await websocket.accept()
 
     try:
-        if not ml_service or not graph_service:
-            await websocket.send_text(json.dumps({"type": "error", "message": "Services not initialized"}))
+        if not registry.initialized:
+            await websocket.send_text(dumps_str({"type": "error", "message": "Services not initialized"}))
             await websocket.close()
             return
 
-        while True:
-            # Listen for client messages
-            data = await websocket.receive_text()
-
-            # Process request
-            response = await process_realtime_request(data)
+        if encoding not in ENCODINGS:
+            await websocket.send_text(dumps_str({
+                "type": "error",
+                "message": f"Unsupported encoding '{encoding}', expected one of {list(ENCODINGS)}"
+            }))
+            await websocket.close()
+            return
 
-            # Send response
-            await websocket.send_text(response)
+        session = WebSocketSession(
+            websocket,
+            process_realtime_request,
+            channels={"disruptions": registry.broadcaster},
+            max_concurrent=WS_MAX_CONCURRENT,
+            max_pending=WS_MAX_PENDING,
+            encoding=encoding
+        )
+        await session.run()
 
     except Exception as e:
         print(f"WebSocket error: {e}")
         await websocket.close()
 
-async def process_realtime_request(data: str) -> str:
+async def process_realtime_request(request: dict) -> dict:
     """Process real-time requests from WebSocket"""
-    try:
-        request = json.loads(data)
-
-        if request.get("type") == "disruption_check":
-            if not ml_service:
-                return json.dumps({"type": "error", "message": "ML service not initialized"})
-            result = await ml_service.check_disruptions(request.get("data"))
-            return json.dumps({"type": "disruption_result", "data": result})
-
-        elif request.get("type") == "route_optimization":
-            if not graph_service:
-                return json.dumps({"type": "error", "message": "Graph service not initialized"})
-            result = await graph_service.optimize_routes(request.get("data"))
-            return json.dumps({"type": "route_result", "data": result})
-
-        else:
-            return json.dumps({"type": "error", "message": "Unknown request type"})
-
-    except Exception as e:
-        return json.dumps({"type": "error", "message": str(e)})
+    if request.get("type") == "disruption_check":
+        if not registry.ml_service:
+            return {"type": "error", "message": "ML service not initialized"}
+        result = await registry.ml_service.check_disruptions(request.get("data"))
+        return {"type": "disruption_result", "data": result}
+
+    elif request.get("type") == "disruption_snapshot":
+        return registry.disruption_feed.snapshot()
+
+    elif request.get("type") == "disruption_updates":
+        # Deltas after the client's last seq, or a snapshot when it must resync
+        return registry.disruption_feed.since(int(request.get("since", 0)))
+
+    elif request.get("type") == "route_optimization":
+        if not registry.graph_service:
+            return {"type": "error", "message": "Graph service not initialized"}
+        result = await registry.graph_service.optimize_routes(request.get("data"))
+        return {"type": "route_result", "data": result}
+
+    else:
+        return {"type": "error", "message": "Unknown request type"}
 
 if __name__ == "__main__":
     # Run the server
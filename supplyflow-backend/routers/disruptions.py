@@ -1,191 +1,71 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, List, Any
-import asyncio
-import json
-from datetime import datetime, timedelta
-import random
+from fastapi import APIRouter, Depends, Query, Request
+from typing import Optional
 
-router = APIRouter()
+from services.disruption_service import DisruptionService
+from services.registry import get_disruption_service, get_response_cache
+from services.response_cache import ResponseCache
 
-class DisruptionService:
-    """Service for managing supply chain disruptions"""
-    
-    def __init__(self):
-        self.active_disruptions = []
-        self.disruption_history = []
-    
-    async def get_active_disruptions(self) -> List[Dict[str, Any]]:
-        """Get currently active disruptions"""
-        # Sample active disruptions
-        active = [
-            {
-                "id": "d_001",
-                "title": "Suez Canal Blockage",
-                "description": "Container ship blocking major shipping route",
-                "type": "infrastructure",
-                "severity": "critical",
-                "start_time": (datetime.now() - timedelta(hours=6)).isoformat(),
-                "affected_routes": ["asia_europe", "asia_americas"],
-                "estimated_delay": "3-5 days",
-                "financial_impact": "$2.5M per day",
-                "status": "active"
-            },
-            {
-                "id": "d_002", 
-                "title": "Port Strike - Los Angeles",
-                "description": "Dock workers strike affecting port operations",
-                "type": "labor_dispute",
-                "severity": "high",
-                "start_time": (datetime.now() - timedelta(hours=12)).isoformat(),
-                "affected_routes": ["asia_us_west"],
-                "estimated_delay": "5-7 days",
-                "financial_impact": "$1.8M per day",
-                "status": "active"
-            },
-            {
-                "id": "d_003",
-                "title": "Typhoon Warning - Pacific",
-                "description": "Severe weather affecting shipping lanes",
-                "type": "weather",
-                "severity": "medium", 
-                "start_time": datetime.now().isoformat(),
-                "affected_routes": ["trans_pacific"],
-                "estimated_delay": "2-3 days",
-                "financial_impact": "$800K per day",
-                "status": "monitoring"
-            }
-        ]
-        
-        return active
-    
-    async def create_disruption(self, disruption_data: Dict) -> Dict[str, Any]:
-        """Create a new disruption event"""
-        try:
-            new_disruption = {
-                "id": f"d_{len(self.active_disruptions) + 1:03d}",
-                "created_at": datetime.now().isoformat(),
-                "status": "active",
-                **disruption_data
-            }
-            
-            self.active_disruptions.append(new_disruption)
-            
-            return {
-                "success": True,
-                "disruption": new_disruption,
-                "message": "Disruption created successfully"
-            }
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to create disruption: {str(e)}")
-    
-    async def update_disruption(self, disruption_id: str, update_data: Dict) -> Dict[str, Any]:
-        """Update an existing disruption"""
-        try:
-            # Find and update disruption
-            for disruption in self.active_disruptions:
-                if disruption["id"] == disruption_id:
-                    disruption.update(update_data)
-                    disruption["updated_at"] = datetime.now().isoformat()
-                    
-                    return {
-                        "success": True,
-                        "disruption": disruption,
-                        "message": "Disruption updated successfully"
-                    }
-            
-            raise HTTPException(status_code=404, detail="Disruption not found")
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to update disruption: {str(e)}")
-    
-    async def resolve_disruption(self, disruption_id: str) -> Dict[str, Any]:
-        """Mark a disruption as resolved"""
-        try:
-            for disruption in self.active_disruptions:
-                if disruption["id"] == disruption_id:
-                    disruption["status"] = "resolved"
-                    disruption["resolved_at"] = datetime.now().isoformat()
-                    
-                    # Move to history
-                    self.disruption_history.append(disruption)
-                    self.active_disruptions.remove(disruption)
-                    
-                    return {
-                        "success": True,
-                        "message": "Disruption resolved successfully"
-                    }
-            
-            raise HTTPException(status_code=404, detail="Disruption not found")
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to resolve disruption: {str(e)}")
-    
-    async def get_disruption_analytics(self) -> Dict[str, Any]:
-        """Get analytics on disruptions"""
-        active = await self.get_active_disruptions()
-        
-        analytics = {
-            "summary": {
-                "total_active": len(active),
-                "critical": len([d for d in active if d["severity"] == "critical"]),
-                "high": len([d for d in active if d["severity"] == "high"]),
-                "medium": len([d for d in active if d["severity"] == "medium"]),
-                "low": len([d for d in active if d["severity"] == "low"])
-            },
-            "by_type": {},
-            "financial_impact": {
-                "daily_impact": sum([
-                    float(d.get("financial_impact", "$0").replace("$", "").replace("M", "000000").replace("K", "000").split()[0])
-                    for d in active
-                ]),
-                "currency": "USD"
-            },
-            "trends": {
-                "last_24h": random.randint(2, 5),
-                "last_7d": random.randint(8, 15),
-                "last_30d": random.randint(25, 45)
-            }
-        }
-        
-        # Count by type
-        for disruption in active:
-            d_type = disruption.get("type", "unknown")
-            analytics["by_type"][d_type] = analytics["by_type"].get(d_type, 0) + 1
-        
-        return analytics
+router = APIRouter()
 
 @router.get("/active")
-async def get_active_disruptions():
+async def get_active_disruptions(
+    request: Request,
+    service: DisruptionService = Depends(get_disruption_service),
+    cache: ResponseCache = Depends(get_response_cache)
+):
     """Get all active disruptions"""
-    service = DisruptionService()
-    disruptions = await service.get_active_disruptions()
+    async def build():
+        disruptions = await service.get_active_disruptions()
+        return {"disruptions": disruptions, "count": len(disruptions)}
+    return await cache.respond(request, service.store.version, build)
+
+@router.get("/")
+async def query_disruptions(
+    route: Optional[str] = None,
+    severity: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    service: DisruptionService = Depends(get_disruption_service)
+):
+    """Find active disruptions by affected route, severity, type and start time"""
+    disruptions = await service.query_disruptions(route, severity, type, since, until, limit)
     return {"disruptions": disruptions, "count": len(disruptions)}
 
 @router.post("/")
-async def create_disruption(disruption_data: dict):
+async def create_disruption(disruption_data: dict, service: DisruptionService = Depends(get_disruption_service)):
     """Create a new disruption"""
-    service = DisruptionService()
     result = await service.create_disruption(disruption_data)
     return result
 
 @router.put("/{disruption_id}")
-async def update_disruption(disruption_id: str, update_data: dict):
+async def update_disruption(disruption_id: str, update_data: dict, service: DisruptionService = Depends(get_disruption_service)):
     """Update a disruption"""
-    service = DisruptionService()
     result = await service.update_disruption(disruption_id, update_data)
     return result
 
 @router.post("/{disruption_id}/resolve")
-async def resolve_disruption(disruption_id: str):
+async def resolve_disruption(disruption_id: str, service: DisruptionService = Depends(get_disruption_service)):
     """Resolve a disruption"""
-    service = DisruptionService()
     result = await service.resolve_disruption(disruption_id)
     return result
 
 @router.get("/analytics")
-async def get_disruption_analytics():
+async def get_disruption_analytics(
+    request: Request,
+    service: DisruptionService = Depends(get_disruption_service),
+    cache: ResponseCache = Depends(get_response_cache)
+):
     """Get disruption analytics"""
-    service = DisruptionService()
-    analytics = await service.get_disruption_analytics()
-    return analytics
\ No newline at end of file
+    return await cache.respond(request, service.analytics_version(), service.get_disruption_analytics)
+
+@router.get("/{disruption_id}/impact")
+async def get_disruption_impact(disruption_id: str, service: DisruptionService = Depends(get_disruption_service)):
+    """Stores cut off or rerouted by a disruption, with cost and time deltas"""
+    return await service.get_disruption_impact(disruption_id)
+
+@router.get("/{disruption_id}")
+async def get_disruption(disruption_id: str, service: DisruptionService = Depends(get_disruption_service)):
+    """Get one disruption by id"""
+    return await service.get_disruption(disruption_id)
@@ -1,168 +1,189 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, List, Any
-import asyncio
-import json
-from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-router = APIRouter()
+from services.graph_service import GraphService, DuplicateEntityError
+from services.registry import get_graph_service, get_response_cache
+from services.response_cache import ResponseCache
+from services.serialization import FastJSONResponse
 
-class GraphService:
-    """Service for managing supply chain graph operations"""
-    
-    def __init__(self):
-        self.nodes = {}
-        self.edges = {}
-        self.network_cache = {}
-    
-    async def load_sample_data(self):
-        """Load sample supply chain data"""
-        # Sample nodes (suppliers, warehouses, stores)
-        sample_nodes = [
-            {
-                "id": "supplier_1",
-                "name": "Asia Electronics Supplier",
-                "type": "supplier",
-                "location": {"lat": 35.6762, "lng": 139.6503, "city": "Tokyo"},
-                "capacity": 10000,
-                "risk_level": "medium"
-            },
-            {
-                "id": "warehouse_1", 
-                "name": "West Coast Distribution Center",
-                "type": "warehouse",
-                "location": {"lat": 34.0522, "lng": -118.2437, "city": "Los Angeles"},
-                "capacity": 50000,
-                "risk_level": "low"
-            },
-            {
-                "id": "store_1",
-                "name": "NYC Retail Store",
-                "type": "store", 
-                "location": {"lat": 40.7128, "lng": -74.0060, "city": "New York"},
-                "capacity": 5000,
-                "risk_level": "low"
-            }
-        ]
-        
-        # Sample edges (routes)
-        sample_edges = [
-            {
-                "id": "route_1",
-                "source_id": "supplier_1",
-                "target_id": "warehouse_1",
-                "route_type": "sea",
-                "distance": 8500,
-                "cost": 2500,
-                "duration": 168,  # 7 days
-                "risk_score": 0.3
-            },
-            {
-                "id": "route_2", 
-                "source_id": "warehouse_1",
-                "target_id": "store_1",
-                "route_type": "road",
-                "distance": 2800,
-                "cost": 800,
-                "duration": 72,  # 3 days
-                "risk_score": 0.1
-            }
-        ]
-        
-        for node in sample_nodes:
-            self.nodes[node["id"]] = node
-            
-        for edge in sample_edges:
-            self.edges[edge["id"]] = edge
-    
-    async def analyze_network(self, data: Dict) -> Dict[str, Any]:
-        """Analyze supply chain network topology"""
-        try:
-            analysis = {
-                "total_nodes": len(self.nodes),
-                "total_routes": len(self.edges),
-                "network_health": "good",
-                "bottlenecks": [],
-                "recommendations": [
-                    "Consider adding redundant routes for critical paths",
-                    "Monitor high-risk nodes more frequently"
-                ],
-                "risk_assessment": {
-                    "overall_risk": "medium",
-                    "critical_paths": ["supplier_1 -> warehouse_1"],
-                    "vulnerable_nodes": []
-                }
-            }
-            
-            # Calculate network metrics
-            high_risk_nodes = [node for node in self.nodes.values() if node.get("risk_level") == "high"]
-            if high_risk_nodes:
-                analysis["risk_assessment"]["vulnerable_nodes"] = [node["id"] for node in high_risk_nodes]
-            
-            return analysis
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Network analysis failed: {str(e)}")
-    
-    async def find_optimal_routes(self, data: Dict) -> Dict[str, Any]:
-        """Find optimal routes in the supply chain network"""
-        try:
-            # Simple route optimization logic
-            routes = []
-            for edge in self.edges.values():
-                route_score = (1 / (edge["cost"] + edge["duration"])) * (1 - edge["risk_score"])
-                routes.append({
-                    "route_id": edge["id"],
-                    "from": edge["source_id"],
-                    "to": edge["target_id"],
-                    "score": route_score,
-                    "cost": edge["cost"],
-                    "duration": edge["duration"],
-                    "risk": edge["risk_score"]
-                })
-            
-            # Sort by score (higher is better)
-            routes.sort(key=lambda x: x["score"], reverse=True)
-            
-            return {
-                "optimal_routes": routes[:5],  # Top 5 routes
-                "total_routes_analyzed": len(routes),
-                "optimization_criteria": ["cost", "time", "risk"],
-                "timestamp": datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Route optimization failed: {str(e)}")
-    
-    async def optimize_routes(self, data: Dict) -> Dict[str, Any]:
-        """Real-time route optimization for WebSocket"""
-        return await self.find_optimal_routes(data)
+router = APIRouter()
 
 @router.get("/nodes")
-async def get_nodes():
+async def get_nodes(
+    request: Request,
+    service: GraphService = Depends(get_graph_service),
+    cache: ResponseCache = Depends(get_response_cache)
+):
     """Get all supply chain nodes"""
-    service = GraphService()
-    await service.load_sample_data()
-    return {"nodes": list(service.nodes.values())}
+    # Encoded once per graph version; unchanged clients get 304
+    return await cache.respond(request, service.version, lambda: {"nodes": list(service.nodes_data.values())})
 
 @router.get("/edges") 
-async def get_edges():
+async def get_edges(
+    request: Request,
+    service: GraphService = Depends(get_graph_service),
+    cache: ResponseCache = Depends(get_response_cache)
+):
     """Get all supply chain routes"""
-    service = GraphService()
-    await service.load_sample_data()
-    return {"edges": list(service.edges.values())}
+    return await cache.respond(request, service.version, lambda: {"edges": list(service.edges_data.values())})
+
+@router.get("/nodes/nearest")
+async def get_nearest_nodes(
+    lat: float,
+    lng: float,
+    k: int = 5,
+    type: Optional[str] = None,
+    service: GraphService = Depends(get_graph_service)
+):
+    """Nodes closest to a point, e.g. the nearest warehouses with type=warehouse"""
+    try:
+        nodes = service.nearest_nodes(lat, lng, k, type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"nodes": nodes, "count": len(nodes)}
+
+@router.get("/nodes/within")
+async def get_nodes_within(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    type: Optional[str] = None,
+    service: GraphService = Depends(get_graph_service)
+):
+    """Nodes within a radius of a point, such as a disruption's location"""
+    try:
+        nodes = service.nodes_within(lat, lng, radius_km, type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"nodes": nodes, "count": len(nodes)}
+
+@router.get("/nodes/bbox")
+async def get_nodes_in_bbox(
+    min_lat: float,
+    min_lng: float,
+    max_lat: float,
+    max_lng: float,
+    type: Optional[str] = None,
+    service: GraphService = Depends(get_graph_service)
+):
+    """Nodes inside a map viewport; min_lng > max_lng crosses the antimeridian"""
+    try:
+        nodes = service.nodes_in_bbox(min_lat, min_lng, max_lat, max_lng, type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"nodes": nodes, "count": len(nodes)}
+
+@router.get("/load-report")
+async def get_load_report(service: GraphService = Depends(get_graph_service)):
+    """Row counts, rejections and load rate from the last network load"""
+    return {"load_report": service.load_report, "graph_version": service.version}
+
+@router.post("/nodes", status_code=201)
+async def add_node(data: dict, service: GraphService = Depends(get_graph_service)):
+    """Add a node to the network"""
+    return _mutate(lambda: {"node": service.add_node(data)}, service)
+
+@router.patch("/nodes/{node_id}")
+async def update_node(node_id: str, updates: dict, service: GraphService = Depends(get_graph_service)):
+    """Update node attributes such as capacity or stock in place"""
+    return _mutate(lambda: {"node": service.update_node(node_id, updates)}, service)
+
+@router.delete("/nodes/{node_id}")
+async def remove_node(node_id: str, service: GraphService = Depends(get_graph_service)):
+    """Remove a node and every route into or out of it"""
+    return _mutate(lambda: service.remove_node(node_id), service)
+
+@router.post("/edges", status_code=201)
+async def add_edge(data: dict, service: GraphService = Depends(get_graph_service)):
+    """Add a route between existing nodes"""
+    return _mutate(lambda: {"edge": service.add_edge(data)}, service)
+
+@router.patch("/edges/{edge_id}")
+async def update_edge(edge_id: str, updates: dict, service: GraphService = Depends(get_graph_service)):
+    """Update route attributes such as cost or duration in place"""
+    return _mutate(lambda: {"edge": service.update_edge(edge_id, updates)}, service)
+
+@router.delete("/edges/{edge_id}")
+async def remove_edge(edge_id: str, service: GraphService = Depends(get_graph_service)):
+    """Remove a route"""
+    return _mutate(lambda: {"edge": service.remove_edge(edge_id)}, service)
+
+@router.post("/impact")
+async def assess_impact(data: dict, service: GraphService = Depends(get_graph_service)):
+    """Impact of disrupted routes, nodes, regions or a location on store supply"""
+    try:
+        return await service.disruption_impact(data)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/routes/pareto")
+async def find_pareto_routes(data: dict, service: GraphService = Depends(get_graph_service)):
+    """Pareto frontier of source-target paths, ranked by caller weights, within optional constraints"""
+    try:
+        return await service.find_pareto_routes(data)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/routes/alternatives")
+async def find_alternative_paths(data: dict, service: GraphService = Depends(get_graph_service)):
+    """Top-k loopless paths and maximally disjoint backup paths per criterion"""
+    try:
+        return await service.find_alternative_paths(data)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/risk/simulate")
+async def simulate_route_risk(data: dict, service: GraphService = Depends(get_graph_service)):
+    """Monte Carlo lead time percentiles and unreachability per source-target pair"""
+    try:
+        return await service.simulate_route_risk(data)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/changes")
+async def get_changes(since: int = 0, limit: Optional[int] = None, service: GraphService = Depends(get_graph_service)):
+    """Graph changes after a version, from the bounded change feed history"""
+    return {**service.changes.since(since, limit), "graph_version": service.version}
+
+def _mutate(apply, service: GraphService) -> dict:
+    """Run a graph mutation, mapping service errors to HTTP status codes"""
+    try:
+        return {**apply(), "graph_version": service.version}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except DuplicateEntityError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/analyze")
-async def analyze_network(data: dict):
+async def analyze_network(data: dict, service: GraphService = Depends(get_graph_service)):
     """Analyze supply chain network"""
-    service = GraphService()
-    await service.load_sample_data()
-    result = await service.analyze_network(data)
-    return result
+    try:
+        return await service.analyze_network(data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/optimize")
-async def optimize_routes(data: dict):
+async def optimize_routes(data: dict, service: GraphService = Depends(get_graph_service)):
     """Find optimal routes"""
-    service = GraphService()
-    await service.load_sample_data()
-    result = await service.find_optimal_routes(data)
-    return result
\ No newline at end of file
+    try:
+        return FastJSONResponse(content=await service.find_optimal_routes(data))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,177 +1,73 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, List, Any
-import asyncio
-import json
-import random
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-router = APIRouter()
+from services.ml_service import MLService
+from services.registry import get_ml_service, get_response_cache
+from services.response_cache import ResponseCache
+from services.serialization import FastJSONResponse
 
-class MLService:
-    """Machine Learning service for predictions and analysis"""
-    
-    def __init__(self):
-        self.models_initialized = False
-        self.disruption_cache = []
-    
-    async def initialize_models(self):
-        """Initialize ML models (placeholder)"""
-        # In a real implementation, this would load trained models
-        self.models_initialized = True
-        
-        # Generate sample disruptions
-        self.disruption_cache = [
-            {
-                "id": "disruption_1",
-                "title": "Port Strike in Long Beach",
-                "type": "labor_dispute",
-                "severity": "high",
-                "probability": 0.85,
-                "affected_routes": ["route_1"],
-                "estimated_delay": "5-7 days",
-                "impact_score": 0.7
-            },
-            {
-                "id": "disruption_2", 
-                "title": "Weather Delays in Pacific",
-                "type": "weather",
-                "severity": "medium",
-                "probability": 0.6,
-                "affected_routes": ["route_1"],
-                "estimated_delay": "2-3 days", 
-                "impact_score": 0.4
-            }
-        ]
-    
-    async def predict_disruptions(self, data: Dict) -> Dict[str, Any]:
-        """Predict potential supply chain disruptions"""
-        try:
-            if not self.models_initialized:
-                await self.initialize_models()
-            
-            # Simulate ML prediction
-            predictions = []
-            
-            for disruption in self.disruption_cache:
-                # Add some randomness to simulate real predictions
-                adjusted_probability = max(0.1, disruption["probability"] + random.uniform(-0.2, 0.2))
-                
-                predictions.append({
-                    "disruption_id": disruption["id"],
-                    "title": disruption["title"],
-                    "type": disruption["type"],
-                    "probability": round(adjusted_probability, 2),
-                    "severity": disruption["severity"],
-                    "estimated_impact": disruption["impact_score"],
-                    "time_horizon": "next_7_days",
-                    "confidence": 0.8
-                })
-            
-            return {
-                "predictions": predictions,
-                "model_version": "v1.0.0",
-                "prediction_timestamp": datetime.now().isoformat(),
-                "total_scenarios_analyzed": len(predictions)
-            }
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Disruption prediction failed: {str(e)}")
-    
-    async def generate_recommendations(self, data: Dict) -> Dict[str, Any]:
-        """Generate AI-powered recommendations"""
-        try:
-            recommendations = [
-                {
-                    "id": "rec_1",
-                    "category": "risk_mitigation",
-                    "title": "Diversify Supplier Base",
-                    "description": "Consider adding 2-3 alternative suppliers in different regions",
-                    "priority": "high",
-                    "estimated_benefit": "30% risk reduction",
-                    "implementation_time": "3-6 months"
-                },
-                {
-                    "id": "rec_2",
-                    "category": "cost_optimization", 
-                    "title": "Consolidate Shipments",
-                    "description": "Combine smaller shipments to reduce per-unit transportation costs",
-                    "priority": "medium",
-                    "estimated_benefit": "15% cost savings",
-                    "implementation_time": "1-2 months"
-                },
-                {
-                    "id": "rec_3",
-                    "category": "efficiency",
-                    "title": "Implement Predictive Maintenance",
-                    "description": "Use IoT sensors to predict equipment failures before they occur",
-                    "priority": "medium", 
-                    "estimated_benefit": "25% uptime improvement",
-                    "implementation_time": "4-8 months"
-                }
-            ]
-            
-            return {
-                "recommendations": recommendations,
-                "total_recommendations": len(recommendations),
-                "categories": ["risk_mitigation", "cost_optimization", "efficiency"],
-                "generated_at": datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Recommendation generation failed: {str(e)}")
-    
-    async def get_latest_disruptions(self) -> str:
-        """Get latest disruptions for streaming"""
-        try:
-            current_disruptions = []
-            for disruption in self.disruption_cache:
-                # Simulate real-time updates
-                current_disruptions.append({
-                    "id": disruption["id"],
-                    "title": disruption["title"],
-                    "severity": disruption["severity"],
-                    "status": random.choice(["active", "monitoring", "resolved"]),
-                    "last_updated": datetime.now().isoformat()
-                })
-            
-            return json.dumps({
-                "type": "disruption_update",
-                "data": current_disruptions,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-        except Exception as e:
-            return json.dumps({"error": str(e)})
-    
-    async def check_disruptions(self, data: Dict) -> Dict[str, Any]:
-        """Check for disruptions in real-time"""
-        return await self.predict_disruptions(data)
+router = APIRouter()
 
 @router.post("/predict")
-async def predict_disruptions(data: dict):
+async def predict_disruptions(data: dict, service: MLService = Depends(get_ml_service)):
     """Predict supply chain disruptions"""
-    service = MLService()
-    await service.initialize_models()
-    result = await service.predict_disruptions(data)
-    return result
+    try:
+        return await service.predict_disruptions(data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/recommendations")
-async def get_recommendations(data: dict):
+async def get_recommendations(data: dict, service: MLService = Depends(get_ml_service)):
     """Get AI-powered recommendations"""
-    service = MLService()
-    await service.initialize_models()
-    result = await service.generate_recommendations(data)
-    return result
+    try:
+        return await service.generate_recommendations(data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/forecast")
+async def forecast_demand(data: dict, service: MLService = Depends(get_ml_service)):
+    """Forecast demand for one region/product series with a fitted model"""
+    try:
+        return FastJSONResponse(content=await service.forecast_demand(data))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/demand")
+async def record_demand(data: dict, service: MLService = Depends(get_ml_service)):
+    """Append demand observations used by the forecasting models"""
+    try:
+        return service.record_demand(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/forecast/batch")
+async def forecast_demand_batch(data: dict, service: MLService = Depends(get_ml_service)):
+    """Forecast demand for many region/product series in one call (columnar result)"""
+    try:
+        # Forecast rows stay NumPy arrays and are encoded straight from their buffers
+        return FastJSONResponse(content=await service.forecast_demand_batch(data))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/models/status")
-async def get_model_status():
+async def get_model_status(
+    request: Request,
+    service: MLService = Depends(get_ml_service),
+    cache: ResponseCache = Depends(get_response_cache)
+):
     """Get ML model status"""
-    return {
+    return await cache.respond(request, service.status_version, lambda: {
         "status": "active",
         "models": [
             {"name": "disruption_predictor", "version": "v1.0.0", "accuracy": 0.85},
             {"name": "demand_forecaster", "version": "v1.2.0", "accuracy": 0.78},
             {"name": "route_optimizer", "version": "v1.1.0", "accuracy": 0.92}
         ],
-        "last_trained": "2024-01-15T10:30:00Z"
-    }
\ No newline at end of file
+        "last_trained": "2024-01-15T10:30:00Z",
+        "forecasting": service.model_status()
+    })
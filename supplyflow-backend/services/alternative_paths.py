@@ -0,0 +1,274 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+import heapq
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from services.graph_engine import CompiledGraph, walk_predecessors
+from services.route_index import INDEXED_CRITERIA
+
+# Criteria alternatives can be ranked by; risk adds up as -log(1 - risk_score)
+ALTERNATIVE_CRITERIA = tuple(INDEXED_CRITERIA)
+
+# What backup paths avoid sharing with the primary path and each other
+DISJOINT_MODES = ("edge", "node")
+
+def criterion_weights(graph: CompiledGraph, criterion: str) -> np.ndarray:
+    """Additive edge weights a criterion minimizes"""
+    return graph.column(INDEXED_CRITERIA[criterion])
+
+def compute_alternative_paths(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    criterion: str,
+    k: int = 3,
+    backups: int = 2,
+    disjoint: str = "edge"
+) -> Dict[str, Any]:
+    """Top-``k`` loopless paths and up to ``backups`` maximally disjoint backup paths for one criterion"""
+    started = time.perf_counter()
+    weights = criterion_weights(graph, criterion)
+    n = graph.number_of_nodes()
+
+    # Cost to the target from every node, and the tree realizing it
+    reverse = csr_matrix((weights, graph.indices, graph.indptr), shape=(n, n)).T
+    to_target, successors = dijkstra(reverse, directed=True, indices=target, return_predecessors=True)
+    if not np.isfinite(to_target[source]):
+        return {
+            "criterion": criterion,
+            "status": "no_path",
+            "k_shortest": [],
+            "backups": [],
+            "compute_seconds": round(time.perf_counter() - started, 4)
+        }
+
+    shortest = _yen(graph, weights, to_target, successors, source, target, k)
+    return {
+        "criterion": criterion,
+        "status": "ok",
+        "k_shortest": [
+            {"rank": rank, **_describe(graph, positions)}
+            for rank, positions in enumerate(shortest, start=1)
+        ],
+        "backups": _backups(graph, weights, source, target, shortest[0], backups, disjoint),
+        "compute_seconds": round(time.perf_counter() - started, 4)
+    }
+
+def _yen(
+    graph: CompiledGraph,
+    weights: np.ndarray,
+    to_target: np.ndarray,
+    successors: np.ndarray,
+    source: int,
+    target: int,
+    k: int
+) -> List[np.ndarray]:
+    """Yen's ``k`` shortest loopless paths as edge positions, cheapest first
+
+    Each path is only spurred from the node where it left its parent
+    (Lawler), since the earlier spur nodes were searched from the parent.
+    """
+    primary = _tree_path(successors, source, target)
+    found = [(primary, graph.path_positions(primary), 0)]
+    candidates: List[Tuple[float, int, List[int], int]] = []
+    seen = {tuple(primary)}
+
+    while len(found) < k:
+        nodes, positions, deviation = found[-1]
+        prefix = np.concatenate([[0.0], np.cumsum(weights[positions])])
+        for j in range(deviation, len(nodes) - 1):
+            root = nodes[:j + 1]
+            # First hops already taken by found paths sharing this root are off limits
+            blocked_edges = {
+                int(other_positions[j]) for other_nodes, other_positions, _ in found
+                if len(other_nodes) > j + 1 and other_nodes[:j + 1] == root
+            }
+            spur = _spur_path(graph, weights, to_target, successors, target, root, blocked_edges)
+            if spur is None:
+                continue
+            path = root[:-1] + spur[0]
+            if tuple(path) not in seen:
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (float(prefix[j]) + spur[1], len(seen), path, j))
+
+        if not candidates:
+            break
+        _, _, path, deviation = heapq.heappop(candidates)
+        found.append((path, graph.path_positions(path), deviation))
+
+    return [positions for _, positions, _ in found]
+
+def _spur_path(
+    graph: CompiledGraph,
+    weights: np.ndarray,
+    to_target: np.ndarray,
+    successors: np.ndarray,
+    target: int,
+    root: List[int],
+    blocked_edges: Set[int]
+) -> Optional[Tuple[List[int], float]]:
+    """Cheapest path (and its cost) from the root's last node to the target that leaves the root behind
+
+    The tree cost to the target is a lower bound on every detour, so when
+    the best first hop's tree path avoids the root it is the answer. Only
+    the remaining spurs pay for a Dijkstra run on the masked graph.
+    """
+    spur = root[-1]
+    blocked_nodes = set(root)
+    start, end = graph.indptr[spur], graph.indptr[spur + 1]
+    heads = graph.indices[start:end]
+    estimates = weights[start:end] + to_target[heads]
+    allowed = np.isfinite(estimates)
+    for i, head in enumerate(heads.tolist()):
+        if head in blocked_nodes or start + i in blocked_edges:
+            allowed[i] = False
+    if not allowed.any():
+        return None
+
+    best = int(np.flatnonzero(allowed)[np.argmin(estimates[allowed])])
+    tail = _tree_path(successors, int(heads[best]), target)
+    if blocked_nodes.isdisjoint(tail):
+        return [spur] + tail, float(estimates[best])
+
+    masked = weights.copy()
+    masked[np.isin(graph.indices, list(blocked_nodes))] = np.inf
+    masked[list(blocked_edges)] = np.inf
+    n = graph.number_of_nodes()
+    distances, predecessors = dijkstra(
+        csr_matrix((masked, graph.indices, graph.indptr), shape=(n, n)),
+        directed=True, indices=spur, return_predecessors=True
+    )
+    if not np.isfinite(distances[target]):
+        return None
+    return walk_predecessors(predecessors, spur, target), float(distances[target])
+
+def _backups(
+    graph: CompiledGraph,
+    weights: np.ndarray,
+    source: int,
+    target: int,
+    primary: np.ndarray,
+    count: int,
+    disjoint: str
+) -> List[Dict[str, Any]]:
+    """Backup paths sharing as few edges (or intermediate nodes) as possible with the primary and each other
+
+    Each already used edge costs more than any simple path, so every backup
+    first minimizes what it shares and then its own cost. Backups stop
+    early once the only path left repeats one already chosen.
+    """
+    n = graph.number_of_nodes()
+    penalty = float(weights.sum()) + 1
+    used_edges = np.zeros(len(weights), dtype=np.int64)
+    used_nodes = np.zeros(n, dtype=np.int64)
+    chosen = [primary]
+    _mark(graph, primary, used_edges, used_nodes, target)
+    primary_edges = set(primary.tolist())
+    primary_nodes = _inner_nodes(graph, primary)
+
+    results = []
+    for _ in range(count):
+        reuse = used_edges if disjoint == "edge" else used_nodes[graph.indices] + used_edges
+        _, predecessors = dijkstra(
+            csr_matrix((weights + penalty * reuse, graph.indices, graph.indptr), shape=(n, n)),
+            directed=True, indices=source, return_predecessors=True
+        )
+        positions = graph.path_positions(walk_predecessors(predecessors, source, target))
+        if any(np.array_equal(positions, other) for other in chosen):
+            break
+        shared_edges = sum(1 for position in positions.tolist() if position in primary_edges)
+        shared_nodes = len(_inner_nodes(graph, positions) & primary_nodes)
+        results.append({
+            **_describe(graph, positions),
+            "shared_edges_with_primary": shared_edges,
+            "shared_nodes_with_primary": shared_nodes,
+            "disjoint": shared_edges == 0 and (disjoint == "edge" or shared_nodes == 0)
+        })
+        chosen.append(positions)
+        _mark(graph, positions, used_edges, used_nodes, target)
+    return results
+
+def _mark(graph: CompiledGraph, positions: np.ndarray, used_edges: np.ndarray, used_nodes: np.ndarray, target: int):
+    used_edges[positions] += 1
+    inner = graph.indices[positions]
+    used_nodes[inner[inner != target]] += 1
+
+def _inner_nodes(graph: CompiledGraph, positions: np.ndarray) -> Set[int]:
+    return set(graph.indices[positions[:-1]].tolist())
+
+def _tree_path(successors: np.ndarray, node: int, target: int) -> List[int]:
+    """Nodes from ``node`` to ``target`` along the reverse shortest-path tree"""
+    path = [node]
+    while path[-1] != target:
+        path.append(int(successors[path[-1]]))
+    return path
+
+def _describe(graph: CompiledGraph, positions: np.ndarray) -> Dict[str, Any]:
+    """Node and edge ids of a path given by edge positions, with its totals"""
+    nodes = graph.edge_sources()[positions].tolist() + [int(graph.indices[positions[-1]])]
+    risk = np.clip(graph.weights["risk_score"][positions], 0, 1)
+    return {
+        "path": [graph.node_ids[i] for i in nodes],
+        "edges": graph.edge_ids[positions].tolist(),
+        "metrics": {
+            "total_distance": round(float(graph.weights["distance"][positions].sum()), 4),
+            "total_cost": round(float(graph.weights["cost"][positions].sum()), 4),
+            "total_duration": round(float(graph.weights["duration"][positions].sum()), 4),
+            # Chance that at least one leg fails, treating leg risks as independent
+            "failure_probability": round(1 - float(np.prod(1 - risk)), 4)
+        }
+    }
+
+def _covers(asked: int, returned: int, wanted: int) -> bool:
+    return asked >= wanted or returned < asked
+
+class AlternativePathCache:
+    """Alternative path results per (source, target, criterion) for the current graph version
+
+    An entry answers any request for no more paths than it holds, so a
+    larger request replaces it. A new graph version empties the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._version: Optional[int] = None
+        # (source, target, criterion, disjoint) -> (k, backups, result), least recently used first
+        self._entries: "OrderedDict[Tuple[str, str, str, str], Tuple[int, int, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: int, key: Tuple[str, str, str, str], k: int, backups: int) -> Optional[Dict[str, Any]]:
+        """Cached result trimmed to ``k`` paths and ``backups`` backups, or None on a miss"""
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        entry = self._entries.get(key)
+        # A list shorter than was asked for already holds every path there is
+        if entry is None or not (_covers(entry[0], len(entry[2]["k_shortest"]), k)
+                                 and _covers(entry[1], len(entry[2]["backups"]), backups)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        result = entry[2]
+        return {**result, "k_shortest": result["k_shortest"][:k], "backups": result["backups"][:backups]}
+
+    def put(self, version: int, key: Tuple[str, str, str, str], k: int, backups: int, result: Dict[str, Any]):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        self._entries[key] = (k, backups, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached_results": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,192 @@
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+from collections import deque
+import asyncio
+
+from services.serialization import dumps_str, packb
+
+class Event:
+    """One published update, serialized once per encoding however many clients receive it"""
+
+    __slots__ = ("id", "event", "payload", "data", "frame", "_packed")
+
+    def __init__(self, event_id: int, event: str, payload: Any, retry_interval: float):
+        self.id = event_id
+        self.event = event
+        self.payload = payload
+        self.data = dumps_str(payload)
+        self.frame = _frame(event_id, event, self.data, retry_interval)
+        self._packed = None
+
+    def packed(self, header: Dict[str, Any]) -> bytes:
+        """MessagePack of ``header`` plus this event's payload under ``data``, packed once per event"""
+        if self._packed is None:
+            self._packed = packb(self.payload)
+        # Rewrite the fixmap header to count the extra key, then splice in the cached payload
+        head = packb(header)
+        return bytes([0x80 | (len(header) + 1)]) + head[1:] + packb("data") + self._packed
+
+class Subscription:
+    """One client's bounded queue of published events"""
+
+    def __init__(self, queue_size: int):
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Event:
+        event = await self.queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    def offer(self, event: Event) -> bool:
+        """Queue an event; a full queue closes the stream and returns False
+
+        Frames may be deltas, so skipping one would corrupt the client's
+        state. A dropped client reconnects with ``Last-Event-ID`` instead.
+        """
+        if self.closed:
+            return False
+        if self.queue.full():
+            self.close()
+            return False
+        self.queue.put_nowait(event)
+        return True
+
+    def close(self):
+        """End the stream after anything already queued is discarded"""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+class Broadcaster:
+    """Single producer fanning each serialized update out to every SSE subscriber
+
+    ``produce`` runs once per interval no matter how many clients are
+    connected; its result is framed and encoded once and the same bytes are
+    queued for each subscriber, and a None result publishes nothing. Recent
+    frames are kept so a reconnecting client sending ``Last-Event-ID``
+    receives only what it missed; new clients, and clients that missed more
+    than is retained, start from ``snapshot()`` when one is given.
+    """
+
+    def __init__(
+        self,
+        produce: Callable[[], Awaitable[Any]],
+        event: str = "disruption_update",
+        snapshot: Optional[Callable[[], Any]] = None,
+        snapshot_event: str = "snapshot",
+        interval: float = 30.0,
+        retry_interval: float = 10.0,
+        queue_size: int = 16,
+        history: int = 256
+    ):
+        self.produce = produce
+        self.event = event
+        self.snapshot = snapshot
+        self.snapshot_event = snapshot_event
+        self._snapshot_event: Optional[Event] = None
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.queue_size = max(1, queue_size)
+        self._history: Deque[Event] = deque(maxlen=max(1, history))
+        self._subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.last_event_id = 0
+        self.dropped = 0
+
+    async def start(self):
+        """Start the producer loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop producing and end every open stream"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in list(self._subscribers):
+            subscription.close()
+        self._subscribers.clear()
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """Register a client, pre-queuing the events it missed or a starting snapshot"""
+        subscription = Subscription(self.queue_size)
+        for event in self._backlog(last_event_id):
+            subscription.queue.put_nowait(event)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, payload: Any, event: Optional[str] = None) -> Optional[int]:
+        """Serialize ``payload`` once and queue it for every subscriber; returns the event id"""
+        if payload is None:
+            return None
+        self.last_event_id += 1
+        published = Event(self.last_event_id, event or self.event, payload, self.retry_interval)
+        self._history.append(published)
+
+        for subscription in list(self._subscribers):
+            if not subscription.offer(published):
+                self._subscribers.discard(subscription)
+                self.dropped += 1
+        return self.last_event_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "last_event_id": self.last_event_id,
+            "dropped_clients": self.dropped,
+            "interval_seconds": self.interval
+        }
+
+    def _backlog(self, last_event_id: Optional[str]) -> list:
+        try:
+            since = int(last_event_id) if last_event_id else None
+        except ValueError:
+            since = None
+
+        oldest = self._history[0].id if self._history else self.last_event_id + 1
+        if since is not None and oldest - 1 <= since <= self.last_event_id:
+            missed = [event for event in self._history if event.id > since]
+            if len(missed) < self.queue_size:
+                return missed
+
+        # New clients, unknown ids (e.g. from before a restart) and long gaps
+        if self.snapshot is not None:
+            return [self._current_snapshot()]
+        return [self._history[-1]] if self._history else []
+
+    def _current_snapshot(self) -> Event:
+        """Snapshot tagged with the current event id, encoded once per id"""
+        if self._snapshot_event is None or self._snapshot_event.id != self.last_event_id:
+            self._snapshot_event = Event(self.last_event_id, self.snapshot_event, self.snapshot(), self.retry_interval)
+        return self._snapshot_event
+
+    async def _run(self):
+        while True:
+            try:
+                self.publish(await self.produce())
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.publish({"error": str(e)}, event="error")
+                await asyncio.sleep(self.retry_interval)
+
+def _frame(event_id: int, event: str, data: str, retry_interval: float) -> bytes:
+    """Encode one text/event-stream message"""
+    lines = [f"id: {event_id}", f"event: {event}", f"retry: {int(retry_interval * 1000)}"]
+    lines.extend(f"data: {line}" for line in (data.splitlines() or [""]))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
@@ -0,0 +1,141 @@
+from typing import Dict, Any, Optional
+import asyncio
+import math
+import time
+import numpy as np
+
+from services.graph_engine import CompiledGraph
+from services.executor import WorkerPool
+from services.change_feed import GraphChange
+
+def compute_centrality(graph: CompiledGraph, samples: int, seed: Optional[int] = None) -> Dict[str, Any]:
+    """Betweenness and closeness for one snapshot, exact when samples covers every node"""
+    started = time.perf_counter()
+    n = graph.number_of_nodes()
+
+    if samples >= n:
+        betweenness = graph.betweenness_centrality()
+        closeness = graph.closeness_centrality()
+    else:
+        pivots = np.random.default_rng(seed).choice(n, size=samples, replace=False)
+        betweenness = graph.betweenness_centrality(sources=pivots.tolist())
+        closeness = graph.closeness_from_pivots(pivots.tolist())
+
+    return {
+        "version": graph.version,
+        "betweenness": dict(zip(graph.node_ids, betweenness.tolist())),
+        "closeness": dict(zip(graph.node_ids, closeness.tolist())),
+        "method": "exact" if samples >= n else "sampled",
+        "samples": min(samples, n),
+        "computed_at": time.time(),
+        "compute_seconds": round(time.perf_counter() - started, 4)
+    }
+
+class CentralityCache:
+    """Sampled betweenness/closeness keyed by graph version, recomputed in the background"""
+
+    def __init__(self, epsilon: float = 0.1, seed: Optional[int] = None, pool: Optional[WorkerPool] = None):
+        # Pivot count follows the Eppstein-Wang bound k = ln(n) / epsilon^2;
+        # small graphs where k >= n are computed exactly
+        self.epsilon = epsilon
+        self.seed = seed
+        self.pool = pool or WorkerPool()
+        self._results: Dict[int, Dict[str, Any]] = {}
+        self._latest_version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        # Newest graph that changed while a recompute was running
+        self._pending: Optional[CompiledGraph] = None
+
+    def sample_size(self, num_nodes: int) -> int:
+        """Number of BFS pivots needed for the configured accuracy"""
+        if num_nodes <= 2 or self.epsilon <= 0:
+            return num_nodes
+        return min(num_nodes, math.ceil(math.log(num_nodes) / self.epsilon ** 2))
+
+    async def compute(self, graph: CompiledGraph) -> Dict[str, Any]:
+        """Compute centrality in the worker pool and store it under the graph version"""
+        result = await self.pool.run(
+            compute_centrality, graph, self.sample_size(graph.number_of_nodes()), self.seed
+        )
+
+        # Keep only the newest result; older versions are never served again
+        if self._latest_version is None or result["version"] >= self._latest_version:
+            self._results = {result["version"]: result}
+            self._latest_version = result["version"]
+        return result
+
+    def get(self, version: int) -> Optional[Dict[str, Any]]:
+        """Result for exactly this version, if it has been computed"""
+        return self._results.get(version)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Most recent result regardless of version"""
+        if self._latest_version is None:
+            return None
+        return self._results.get(self._latest_version)
+
+    @property
+    def recomputing(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def schedule(self, graph: CompiledGraph):
+        """Recompute for a new topology in the background without blocking callers
+
+        Changes arriving during a recompute coalesce: only the newest graph is
+        computed once the running task finishes.
+        """
+        if self.get(graph.version) is not None:
+            return
+        if self.recomputing:
+            self._pending = graph
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self.compute(graph))
+        self._task.add_done_callback(self._finished)
+
+    def apply_change(self, change: GraphChange):
+        """Change feed subscriber; centrality is unweighted, so only topology changes count"""
+        if change.topology:
+            self.schedule(change.graph)
+
+    def reset(self, change: GraphChange):
+        """Forget every result, so nothing computed for an older topology is served"""
+        self._results = {}
+        self._latest_version = None
+        self._pending = None
+
+    def _finished(self, task: asyncio.Task):
+        _log_failure(task)
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self.schedule(pending)
+
+    async def ensure(self, graph: CompiledGraph) -> Dict[str, Any]:
+        """Latest result, computing inline only when nothing has been computed yet"""
+        result = self.latest()
+        if result is None:
+            if self.recomputing:
+                return await asyncio.shield(self._task)
+            return await self.compute(graph)
+
+        if result["version"] != graph.version:
+            self.schedule(graph)
+        return result
+
+    def staleness(self, result: Dict[str, Any], current_version: int) -> Dict[str, Any]:
+        """How far a served result lags behind the live graph"""
+        return {
+            "computed_for_version": result["version"],
+            "current_version": current_version,
+            "stale": result["version"] != current_version,
+            "age_seconds": round(time.time() - result["computed_at"], 3),
+            "recomputing": self.recomputing
+        }
+
+def _log_failure(task: asyncio.Task):
+    """Surface background recompute errors instead of leaving them unretrieved"""
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Centrality recompute failed: {task.exception()}")
@@ -0,0 +1,142 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import deque
+import logging
+import time
+import numpy as np
+
+from services.graph_engine import CompiledGraph
+
+logger = logging.getLogger(__name__)
+
+# Kinds of change published by GraphService
+CHANGE_KINDS = (
+    "network_loaded",
+    "node_added",
+    "node_updated",
+    "node_removed",
+    "edge_added",
+    "edge_updated",
+    "edge_removed"
+)
+
+class GraphChange:
+    """One applied graph mutation as seen by change feed subscribers
+
+    ``source``/``target`` are node positions in ``graph`` for edge changes,
+    ``before``/``after`` carry the edge weights or node record around the
+    change, and ``node_map`` maps old to new node positions (-1 for removed)
+    when a node removal renumbered the graph.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        entity_id: Optional[str],
+        version: int,
+        graph: CompiledGraph,
+        record: Optional[Dict[str, Any]] = None,
+        source: Optional[int] = None,
+        target: Optional[int] = None,
+        before: Optional[Dict[str, Any]] = None,
+        after: Optional[Dict[str, Any]] = None,
+        node_map: Optional[np.ndarray] = None
+    ):
+        if kind not in CHANGE_KINDS:
+            raise ValueError(f"Unknown change kind '{kind}', expected one of {CHANGE_KINDS}")
+        self.kind = kind
+        self.entity_id = entity_id
+        self.version = version
+        self.graph = graph
+        self.record = record
+        self.source = source
+        self.target = target
+        self.before = before
+        self.after = after
+        self.node_map = node_map
+        self.timestamp = time.time()
+
+    @property
+    def topology(self) -> bool:
+        """Whether nodes or edges were added or removed"""
+        return self.kind not in ("node_updated", "edge_updated")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public form served by the change feed endpoint"""
+        return {
+            "version": self.version,
+            "kind": self.kind,
+            "id": self.entity_id,
+            "data": self.record,
+            "topology": self.topology,
+            "timestamp": self.timestamp
+        }
+
+class ChangeFeed:
+    """In-process publish/subscribe feed of graph changes with a bounded replay history
+
+    History keeps only the public form of each change; the compiled graph a
+    change carries is handed to subscribers and then let go, so old
+    snapshots are not pinned by the replay buffer.
+    """
+
+    def __init__(self, history: int = 1000):
+        self._subscribers: List[Tuple[Callable[[GraphChange], None], Optional[Callable[[GraphChange], None]]]] = []
+        self._history: "deque[Dict[str, Any]]" = deque(maxlen=history)
+        self.published = 0
+        # Subscriber name -> failures, and the most recent one
+        self.failures: Dict[str, int] = {}
+        self.last_failure: Optional[Dict[str, Any]] = None
+
+    def subscribe(self, callback: Callable[[GraphChange], None], reset: Optional[Callable[[GraphChange], None]] = None):
+        """Call ``callback`` synchronously for every change, in publish order
+
+        ``reset`` is called instead of trusting the subscriber's state when
+        ``callback`` raises; it should drop whatever the subscriber caches.
+        """
+        self._subscribers.append((callback, reset))
+
+    def publish(self, change: GraphChange):
+        """Record a change and deliver it to every subscriber"""
+        self._history.append(change.to_dict())
+        self.published += 1
+        for callback, reset in self._subscribers:
+            # One failing cache must not stop the others from seeing the change
+            try:
+                callback(change)
+            except Exception as e:
+                self._failed(callback, reset, change, e)
+
+    def since(self, version: int, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Changes after ``version``; ``truncated`` means older ones were already dropped"""
+        changes = [change for change in self._history if change["version"] > version]
+        oldest = self._history[0]["version"] if self._history else None
+        truncated = oldest is not None and version < oldest - 1
+        if limit is not None:
+            changes = changes[:limit]
+        return {"changes": changes, "truncated": truncated, "oldest_version": oldest}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "history": len(self._history),
+            "subscribers": len(self._subscribers),
+            "failures": dict(self.failures),
+            "last_failure": self.last_failure
+        }
+
+    def _failed(self, callback: Callable, reset: Optional[Callable], change: GraphChange, error: Exception):
+        """Count a subscriber failure and reset its cache so it cannot serve the old graph"""
+        name = getattr(callback, "__qualname__", repr(callback))
+        self.failures[name] = self.failures.get(name, 0) + 1
+        self.last_failure = {"subscriber": name, "kind": change.kind, "version": change.version, "error": str(error)}
+        logger.error(
+            "Change feed subscriber %s failed on %s (version %s)", name, change.kind, change.version, exc_info=error
+        )
+        if reset is None:
+            return
+        try:
+            reset(change)
+            logger.warning("Reset change feed subscriber %s after the failure", name)
+        except Exception as e:
+            self.last_failure["reset_error"] = str(e)
+            logger.exception("Resetting change feed subscriber %s failed too", name)
@@ -0,0 +1,76 @@
+from typing import Any, Deque, Dict, Iterable, List, Optional
+from collections import deque
+import time
+
+class DeltaFeed:
+    """Sequence-numbered deltas between successive snapshots of a record set
+
+    ``apply`` diffs the new records against the previous ones by ``key`` and
+    returns only what was added, changed (changed fields only) or removed.
+    Every delta carries ``seq`` and the ``base_seq`` it applies on top of, so
+    a client that sees ``base_seq`` differ from its last ``seq`` knows it
+    missed one and must resync from ``snapshot()``.
+    """
+
+    def __init__(self, name: str = "disruption", key: str = "id", history: int = 256):
+        self.name = name
+        self.key = key
+        self.seq = 0
+        self._records: Dict[Any, Dict[str, Any]] = {}
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=max(1, history))
+        self._snapshot: Optional[Dict[str, Any]] = None
+
+    def apply(self, records: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Replace the record set, returning the delta message (None when nothing changed)"""
+        current = {record[self.key]: record for record in records}
+        added = [record for record_id, record in current.items() if record_id not in self._records]
+        removed = [record_id for record_id in self._records if record_id not in current]
+        changed = {}
+        for record_id, record in current.items():
+            previous = self._records.get(record_id)
+            if previous is None or previous == record:
+                continue
+            fields = {field: value for field, value in record.items() if previous.get(field) != value}
+            dropped = [field for field in previous if field not in record]
+            if dropped:
+                fields["_removed_fields"] = dropped
+            changed[record_id] = fields
+
+        self._records = current
+        if not (added or changed or removed):
+            return None
+
+        self.seq += 1
+        self._snapshot = None
+        delta = {
+            "type": f"{self.name}_delta",
+            "seq": self.seq,
+            "base_seq": self.seq - 1,
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+            "timestamp": time.time()
+        }
+        self._history.append(delta)
+        return delta
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full record set as of ``seq``; cached until the next change"""
+        if self._snapshot is None:
+            self._snapshot = {
+                "type": f"{self.name}_snapshot",
+                "seq": self.seq,
+                "data": list(self._records.values()),
+                "timestamp": time.time()
+            }
+        return self._snapshot
+
+    def since(self, seq: int) -> Dict[str, Any]:
+        """Deltas after ``seq``, or a snapshot when they are no longer all retained"""
+        if seq == self.seq:
+            return {"type": f"{self.name}_deltas", "seq": self.seq, "deltas": []}
+        oldest = self._history[0]["base_seq"] if self._history else self.seq
+        if seq < oldest or seq > self.seq:
+            return {**self.snapshot(), "resync": True}
+        deltas: List[Dict[str, Any]] = [delta for delta in self._history if delta["seq"] > seq]
+        return {"type": f"{self.name}_deltas", "seq": self.seq, "deltas": deltas}
@@ -0,0 +1,160 @@
+from typing import Dict, Tuple
+from urllib.parse import quote
+import json
+import os
+import numpy as np
+
+# On-disk column types; dates are datetime64[s] ticks
+DATE_DTYPE = np.dtype("<i8")
+DEMAND_DTYPE = np.dtype("<f8")
+COLUMNS = {"dates": DATE_DTYPE, "demand": DEMAND_DTYPE}
+
+MANIFEST_NAME = "manifest.json"
+
+class DemandStore:
+    """Append-only columnar demand store with one memory-mapped partition per series
+
+    Layout is ``<root>/region=<r>/product_category=<c>/<column>.<generation>.bin``
+    plus a manifest holding row counts. Readers map only the rows the manifest
+    recorded when they opened, so appends never disturb an open snapshot.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._manifest = self._read_manifest()
+        # (region, product_category, generation) -> (mapped rows, dates, demand)
+        self._maps: Dict[Tuple[str, str, int], Tuple[int, np.ndarray, np.ndarray]] = {}
+
+    def __getstate__(self) -> dict:
+        # Workers reopen the files themselves instead of receiving copied arrays
+        return {"root": self.root}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state["root"])
+
+    @property
+    def version(self) -> int:
+        return self._manifest["version"]
+
+    def partitions(self) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """(region, product_category) -> (rows, generation) as of the last manifest write"""
+        return {
+            (p["region"], p["product_category"]): (p["rows"], p["generation"])
+            for p in self._manifest["partitions"].values()
+        }
+
+    def columns(self, key: Tuple[str, str], rows: int, generation: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Read-only (dates, demand) views over the first ``rows`` rows of a partition"""
+        if rows == 0:
+            return np.empty(0, dtype=DATE_DTYPE), np.empty(0, dtype=DEMAND_DTYPE)
+
+        cache_key = (*key, generation)
+        mapped = self._maps.get(cache_key)
+        if mapped is None or mapped[0] < rows:
+            directory = self._partition_dir(key)
+            dates, demand = (
+                np.memmap(self._column_path(directory, name, generation), dtype=dtype, mode="r", shape=(rows,))
+                for name, dtype in COLUMNS.items()
+            )
+            mapped = (rows, dates, demand)
+            self._maps[cache_key] = mapped
+        return mapped[1][:rows], mapped[2][:rows]
+
+    def append(self, batches: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]) -> int:
+        """Append (dates, demand) per series and publish them in one manifest write
+
+        Returns the new store version. Out-of-order dates rewrite the partition
+        sorted into a new generation; the previous generation is kept until the
+        next rewrite so snapshots already handed out stay readable.
+        """
+        for key, (dates, demand) in batches.items():
+            dates = np.asarray(dates, dtype=DATE_DTYPE)
+            demand = np.asarray(demand, dtype=DEMAND_DTYPE)
+            if len(dates) != len(demand):
+                raise ValueError(f"Series {key}: dates and demand lengths differ")
+            if not len(dates):
+                continue
+
+            order = np.argsort(dates, kind="stable")
+            dates, demand = dates[order], demand[order]
+            entry = self._manifest["partitions"].get(self._partition_name(key))
+            if entry is None:
+                entry = {"region": key[0], "product_category": key[1], "rows": 0, "generation": 0, "last_date": None}
+                self._manifest["partitions"][self._partition_name(key)] = entry
+
+            if entry["rows"] and dates[0] < entry["last_date"]:
+                self._rewrite(key, entry, dates, demand)
+            else:
+                self._extend(key, entry, dates, demand)
+            last = int(dates[-1])
+            entry["last_date"] = last if entry["last_date"] is None else max(entry["last_date"], last)
+
+        self._manifest["version"] += 1
+        self._write_manifest()
+        return self.version
+
+    def _extend(self, key: Tuple[str, str], entry: dict, dates: np.ndarray, demand: np.ndarray):
+        """Write new rows after the last committed row of the current generation"""
+        directory = self._partition_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        for (name, dtype), values in zip(COLUMNS.items(), (dates, demand)):
+            path = self._column_path(directory, name, entry["generation"])
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                # Drop bytes from any append that never reached the manifest
+                f.truncate(entry["rows"] * dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        entry["rows"] += len(dates)
+
+    def _rewrite(self, key: Tuple[str, str], entry: dict, dates: np.ndarray, demand: np.ndarray):
+        """Merge late-arriving rows into a freshly sorted generation"""
+        old_dates, old_demand = self.columns(key, entry["rows"], entry["generation"])
+        merged_dates = np.concatenate([old_dates, dates])
+        order = np.argsort(merged_dates, kind="stable")
+        merged_demand = np.concatenate([old_demand, demand])[order]
+        merged_dates = merged_dates[order]
+
+        directory = self._partition_dir(key)
+        retired = entry["generation"] - 1
+        entry["generation"] += 1
+        entry["rows"] = 0
+        self._extend(key, entry, merged_dates, merged_demand)
+
+        for name in COLUMNS:
+            path = self._column_path(directory, name, retired)
+            if retired >= 0 and os.path.exists(path):
+                os.remove(path)
+        self._maps = {k: v for k, v in self._maps.items() if k[:2] != key or k[2] > retired}
+
+    def _partition_name(self, key: Tuple[str, str]) -> str:
+        return f"region={quote(key[0], safe='')}/product_category={quote(key[1], safe='')}"
+
+    def _partition_dir(self, key: Tuple[str, str]) -> str:
+        return os.path.join(self.root, *self._partition_name(key).split("/"))
+
+    def _column_path(self, directory: str, name: str, generation: int) -> str:
+        return os.path.join(directory, f"{name}.{generation}.bin")
+
+    def _read_manifest(self) -> dict:
+        path = os.path.join(self.root, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return {"version": 0, "partitions": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        """Atomically replace the manifest so readers never see a partial write"""
+        path = os.path.join(self.root, MANIFEST_NAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+def to_store_dates(values) -> np.ndarray:
+    """Convert datetimes or ISO strings to the store's datetime64[s] ticks"""
+    return np.asarray(values, dtype="datetime64[s]").astype(DATE_DTYPE)
@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Kinds of event recorded for each disruption mutation
+EVENT_KINDS = ("created", "updated", "resolved")
+
+# Snapshots kept after a new one is written; the events behind an older one are
+# compacted away, so it could not be rolled forward and is pruned
+SNAPSHOTS_KEPT = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    disruption_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    seq INTEGER PRIMARY KEY,
+    state TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+"""
+
+class DisruptionLog:
+    """Append-only SQLite (WAL) log of disruption events with periodic snapshots
+
+    Appends are buffered and committed together once ``batch_size`` events
+    are pending or ``flush_interval`` seconds have passed, whichever comes
+    first. Events still buffered when the process dies are lost, so the
+    interval bounds how much recent history a crash can drop. A snapshot
+    deletes the events it covers, so the log stays bounded by
+    ``snapshot_every`` events past the latest snapshot.
+    """
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 0.5):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Commits happen on the caller's thread and on the flush timer
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[int, str, str, str, float]] = []
+        self._timer: Optional[threading.Timer] = None
+        self.snapshot_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM snapshots").fetchone()[0]
+        # Compaction may leave no events, so numbering resumes after the snapshot too
+        self.last_seq = max(
+            self.snapshot_seq,
+            self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+        )
+
+    def append(self, kind: str, disruption_id: str, payload: Dict[str, Any]) -> int:
+        """Buffer one event and return its sequence number"""
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind '{kind}', expected one of {EVENT_KINDS}")
+        with self._lock:
+            self.last_seq += 1
+            self._pending.append((self.last_seq, kind, disruption_id, json.dumps(payload), time.time()))
+            if len(self._pending) >= self.batch_size:
+                self._commit()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return self.last_seq
+
+    def flush(self):
+        """Commit every buffered event"""
+        with self._lock:
+            self._commit()
+
+    def snapshot(self, state: Dict[str, Any]) -> int:
+        """Persist the full store state as of the last appended event, deleting the events it covers"""
+        with self._lock:
+            self._commit()
+            # One transaction: a crash leaves either the old snapshot and its events or the new one alone
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshots (seq, state, recorded_at) VALUES (?, ?, ?)",
+                (self.last_seq, json.dumps(state), time.time())
+            )
+            self._conn.execute("DELETE FROM events WHERE seq <= ?", (self.last_seq,))
+            self._conn.execute(
+                "DELETE FROM snapshots WHERE seq NOT IN (SELECT seq FROM snapshots ORDER BY seq DESC LIMIT ?)",
+                (SNAPSHOTS_KEPT,)
+            )
+            self._conn.commit()
+            self.snapshot_seq = self.last_seq
+            return self.snapshot_seq
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Tuple[int, str, str, Dict[str, Any]]]]:
+        """Latest snapshot (or None) and the (seq, kind, id, payload) events recorded after it"""
+        with self._lock:
+            self._commit()
+            row = self._conn.execute("SELECT seq, state FROM snapshots ORDER BY seq DESC LIMIT 1").fetchone()
+            since, state = (row[0], json.loads(row[1])) if row else (0, None)
+            events = [
+                (seq, kind, disruption_id, json.loads(payload))
+                for seq, kind, disruption_id, payload in self._conn.execute(
+                    "SELECT seq, kind, disruption_id, payload FROM events WHERE seq > ? ORDER BY seq",
+                    (since,)
+                )
+            ]
+            return state, events
+
+    @property
+    def events_since_snapshot(self) -> int:
+        return self.last_seq - self.snapshot_seq
+
+    def close(self):
+        """Commit pending events and close the database"""
+        self.flush()
+        self._conn.close()
+
+    def _commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT INTO events (seq, kind, disruption_id, payload, recorded_at) VALUES (?, ?, ?, ?, ?)",
+            self._pending
+        )
+        self._conn.commit()
+        self._pending = []
@@ -0,0 +1,287 @@
+from fastapi import HTTPException
+from typing import Awaitable, Callable, Dict, List, Any, Optional
+from datetime import datetime, timedelta
+import logging
+
+from services.disruption_store import DisruptionStore, SEVERITY_LEVELS, event_timestamp
+from services.disruption_log import DisruptionLog
+
+logger = logging.getLogger(__name__)
+
+# Seconds the analytics trend windows may lag behind the clock when cached
+ANALYTICS_TREND_RESOLUTION = 60
+
+class DisruptionService:
+    """Service for managing supply chain disruptions"""
+    
+    def __init__(
+        self,
+        log_path: Optional[str] = None,
+        log_batch_size: int = 64,
+        log_flush_interval: float = 0.5,
+        snapshot_every: int = 1000,
+        impact: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+    ):
+        self.store = DisruptionStore()
+        # Joins a disruption to the supply graph; without it impacts are unavailable
+        self.impact = impact
+        # Without a log path disruptions live in memory only
+        self.log_path = log_path
+        self.log_batch_size = log_batch_size
+        self.log_flush_interval = log_flush_interval
+        self.snapshot_every = snapshot_every
+        self.log: Optional[DisruptionLog] = None
+    
+    async def load_sample_data(self):
+        """Restore disruptions from the event log, seeding sample ones into an empty log"""
+        if self.log_path:
+            self.log = DisruptionLog(self.log_path, self.log_batch_size, self.log_flush_interval)
+            if self._replay():
+                return
+        
+        samples = [
+            {
+                "id": "d_001",
+                "title": "Suez Canal Blockage",
+                "description": "Container ship blocking major shipping route",
+                "type": "infrastructure",
+                "severity": "critical",
+                "start_time": (datetime.now() - timedelta(hours=6)).isoformat(),
+                "affected_routes": ["asia_europe", "asia_americas"],
+                "estimated_delay": "3-5 days",
+                "financial_impact": "$2.5M per day",
+                "status": "active"
+            },
+            {
+                "id": "d_002", 
+                "title": "Port Strike - Los Angeles",
+                "description": "Dock workers strike affecting port operations",
+                "type": "labor_dispute",
+                "severity": "high",
+                "start_time": (datetime.now() - timedelta(hours=12)).isoformat(),
+                "affected_routes": ["asia_us_west"],
+                "location": {"lat": 33.7405, "lng": -118.2720, "radius_km": 50},
+                "estimated_delay": "5-7 days",
+                "financial_impact": "$1.8M per day",
+                "status": "active"
+            },
+            {
+                "id": "d_003",
+                "title": "Typhoon Warning - Pacific",
+                "description": "Severe weather affecting shipping lanes",
+                "type": "weather",
+                "severity": "medium", 
+                "start_time": datetime.now().isoformat(),
+                "affected_routes": ["trans_pacific"],
+                "estimated_delay": "2-3 days",
+                "financial_impact": "$800K per day",
+                "status": "monitoring"
+            }
+        ]
+        for disruption in samples:
+            if self.store.get(disruption["id"]) is None:
+                self._record("created", disruption["id"], disruption)
+    
+    def close(self):
+        """Snapshot the store and close the event log, so the next start replays no events"""
+        if self.log is not None:
+            if self.log.events_since_snapshot:
+                self.log.snapshot(self.store.state())
+            self.log.close()
+            self.log = None
+    
+    def _replay(self) -> bool:
+        """Rebuild the store from the latest snapshot plus the events logged after it"""
+        started = datetime.now()
+        state, events = self.log.load()
+        if state is None and not events:
+            return False
+        
+        if state is not None:
+            self.store = DisruptionStore.from_state(state)
+        skipped = 0
+        for seq, kind, disruption_id, payload in events:
+            try:
+                self._apply(kind, disruption_id, payload)
+            except KeyError:
+                if kind == "created":
+                    raise
+                # An update or resolve whose disruption is not active; replaying the rest beats refusing to start
+                logger.warning("Skipping event %d: %s of unknown or resolved disruption %s", seq, kind, disruption_id)
+                skipped += 1
+        
+        elapsed = (datetime.now() - started).total_seconds()
+        print(
+            f"✅ Restored {len(self.store)} active disruptions from event log "
+            f"({'snapshot + ' if state is not None else ''}{len(events) - skipped} events replayed in {elapsed:.2f}s"
+            f"{f', {skipped} orphan events skipped' if skipped else ''})"
+        )
+        return True
+    
+    def _apply(self, kind: str, disruption_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply one event to the store"""
+        if kind == "created":
+            return self.store.add(payload)
+        if kind == "updated":
+            return self.store.update(disruption_id, payload)
+        return self.store.resolve(disruption_id, payload)
+    
+    def _record(self, kind: str, disruption_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply an event, then append it to the log and snapshot when one is due"""
+        disruption = self._apply(kind, disruption_id, payload)
+        if self.log is not None:
+            self.log.append(kind, disruption_id, payload)
+            if self.log.events_since_snapshot >= self.snapshot_every:
+                self.log.snapshot(self.store.state())
+        return disruption
+    
+    async def get_active_disruptions(self) -> List[Dict[str, Any]]:
+        """Get currently active disruptions"""
+        return self.store.active()
+    
+    async def get_disruption(self, disruption_id: str) -> Dict[str, Any]:
+        """Get one active or resolved disruption by id"""
+        disruption = self.store.get(disruption_id)
+        if disruption is None:
+            raise HTTPException(status_code=404, detail="Disruption not found")
+        return disruption
+    
+    async def get_disruption_impact(self, disruption_id: str) -> Dict[str, Any]:
+        """Downstream reach and per-store reroute deltas of one disruption on the supply graph"""
+        disruption = await self.get_disruption(disruption_id)
+        if self.impact is None:
+            raise HTTPException(status_code=503, detail="Impact assessment not available")
+        
+        try:
+            return {"disruption_id": disruption_id, **(await self.impact(disruption))}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Impact assessment failed: {str(e)}")
+    
+    async def query_disruptions(
+        self,
+        route: Optional[str] = None,
+        severity: Optional[str] = None,
+        disruption_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Find active disruptions by affected route, severity, type and start time window"""
+        try:
+            return self.store.query(
+                route=route,
+                severity=severity,
+                disruption_type=disruption_type,
+                since=event_timestamp({"start_time": since}) if since else None,
+                until=event_timestamp({"start_time": until}) if until else None,
+                limit=limit
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    async def create_disruption(self, disruption_data: Dict) -> Dict[str, Any]:
+        """Create a new disruption event"""
+        try:
+            # Ids come from a monotonic counter so they stay unique after resolves
+            new_disruption = {
+                "created_at": datetime.now().isoformat(),
+                "status": "active",
+                **disruption_data,
+                "id": self.store.next_id()
+            }
+            
+            self._record("created", new_disruption["id"], new_disruption)
+            
+            result = {
+                "success": True,
+                "disruption": new_disruption,
+                "message": "Disruption created successfully"
+            }
+            # The disruption is stored either way; a failed assessment is reported alongside it
+            if self.impact is not None:
+                try:
+                    result["impact"] = await self.impact(new_disruption)
+                except Exception as e:
+                    result["impact"] = {"error": f"Impact assessment failed: {str(e)}"}
+            return result
+            
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create disruption: {str(e)}")
+    
+    async def update_disruption(self, disruption_id: str, update_data: Dict) -> Dict[str, Any]:
+        """Update an existing disruption"""
+        if not self.store.is_active(disruption_id):
+            raise HTTPException(status_code=404, detail="Disruption not found")
+        if update_data.get("id", disruption_id) != disruption_id:
+            raise HTTPException(status_code=400, detail="Disruption id cannot be changed")
+        if update_data.get("status") == "resolved":
+            return await self.resolve_disruption(disruption_id, update_data)
+        
+        try:
+            disruption = self._record("updated", disruption_id, {
+                **update_data,
+                "updated_at": datetime.now().isoformat()
+            })
+            
+            return {
+                "success": True,
+                "disruption": disruption,
+                "message": "Disruption updated successfully"
+            }
+            
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update disruption: {str(e)}")
+    
+    async def resolve_disruption(self, disruption_id: str, update_data: Optional[Dict] = None) -> Dict[str, Any]:
+        """Mark a disruption as resolved"""
+        if not self.store.is_active(disruption_id):
+            raise HTTPException(status_code=404, detail="Disruption not found")
+        
+        try:
+            # Resolved disruptions leave the active indexes but stay on the timeline
+            self._record("resolved", disruption_id, {
+                **(update_data or {}),
+                "status": "resolved",
+                "resolved_at": datetime.now().isoformat()
+            })
+            
+            return {
+                "success": True,
+                "message": "Disruption resolved successfully"
+            }
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to resolve disruption: {str(e)}")
+    
+    def analytics_version(self) -> tuple:
+        """Changes whenever the analytics could: on any store change, and as trend windows move"""
+        return (self.store.version, int(datetime.now().timestamp() // ANALYTICS_TREND_RESOLUTION))
+    
+    async def get_disruption_analytics(self) -> Dict[str, Any]:
+        """Get analytics on disruptions"""
+        # Counters are maintained by the store, so this never walks the disruptions
+        now = datetime.now().timestamp()
+        day = 24 * 3600
+        
+        return {
+            "summary": {
+                "total_active": len(self.store),
+                **{level: self.store.severity_counts.get(level, 0) for level in SEVERITY_LEVELS}
+            },
+            "by_type": dict(self.store.type_counts),
+            "financial_impact": {
+                "daily_impact": self.store.daily_impact,
+                "currency": "USD"
+            },
+            "trends": {
+                "last_24h": self.store.started_between(now - day, now),
+                "last_7d": self.store.started_between(now - 7 * day, now),
+                "last_30d": self.store.started_between(now - 30 * day, now)
+            }
+        }
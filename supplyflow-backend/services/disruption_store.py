@@ -0,0 +1,237 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, defaultdict
+from datetime import datetime
+import re
+
+# Severity levels reported by the analytics summary
+SEVERITY_LEVELS = ("critical", "high", "medium", "low")
+
+# Suffix multipliers for impact strings such as "$2.5M per day"
+IMPACT_SUFFIXES = {"": 1.0, "K": 1e3, "M": 1e6, "B": 1e9}
+_IMPACT_PATTERN = re.compile(r"\$?\s*([\d.,]+)\s*([KMB]?)", re.IGNORECASE)
+
+def parse_daily_impact(value: Any) -> float:
+    """Dollar amount from a financial_impact value ("$800K per day" -> 800000.0)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _IMPACT_PATTERN.search(str(value or ""))
+    if match is None:
+        return 0.0
+    try:
+        amount = float(match.group(1).replace(",", ""))
+    except ValueError:
+        return 0.0
+    return amount * IMPACT_SUFFIXES[match.group(2).upper()]
+
+def event_timestamp(disruption: Dict[str, Any]) -> float:
+    """POSIX time a disruption started (start_time, else created_at)"""
+    value = disruption.get("start_time") or disruption.get("created_at")
+    if value is None:
+        return datetime.now().timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid start_time '{value}', expected an ISO 8601 timestamp")
+
+class DisruptionStore:
+    """Disruptions indexed by id, affected route, severity, type and start time
+
+    Every index and analytics counter is maintained on insert, update and
+    resolve, so lookups and summaries never scan the full set of events.
+    """
+
+    def __init__(self):
+        # Insertion-ordered, so iteration follows creation order
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self._resolved: Dict[str, Dict[str, Any]] = {}
+        self._by_route: Dict[str, Set[str]] = defaultdict(set)
+        self._by_severity: Dict[str, Set[str]] = defaultdict(set)
+        self._by_type: Dict[str, Set[str]] = defaultdict(set)
+        # Sorted (start timestamp, id) for every event ever recorded, active or resolved
+        self._timeline: List[Tuple[float, str]] = []
+        self._started: Dict[str, float] = {}
+        self.severity_counts: Counter = Counter()
+        self.type_counts: Counter = Counter()
+        self.daily_impact = 0.0
+        self._next_id = 1
+        # Bumped by every add, update and resolve
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def next_id(self) -> str:
+        """Monotonic id that is never reused, even after resolves"""
+        disruption_id = f"d_{self._next_id:03d}"
+        self._next_id += 1
+        return disruption_id
+
+    def add(self, disruption: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert an active disruption and index it"""
+        disruption_id = disruption["id"]
+        if disruption_id in self._active or disruption_id in self._resolved:
+            raise ValueError(f"Disruption '{disruption_id}' already exists")
+        started = event_timestamp(disruption)
+
+        # Keep generated ids ahead of explicitly supplied numeric ones
+        match = re.fullmatch(r"d_(\d+)", disruption_id)
+        if match:
+            self._next_id = max(self._next_id, int(match.group(1)) + 1)
+
+        self._active[disruption_id] = disruption
+        self._index(disruption)
+        self._started[disruption_id] = started
+        insort(self._timeline, (started, disruption_id))
+        self.version += 1
+        return disruption
+
+    def get(self, disruption_id: str) -> Optional[Dict[str, Any]]:
+        """Active or resolved disruption by id"""
+        return self._active.get(disruption_id) or self._resolved.get(disruption_id)
+
+    def is_active(self, disruption_id: str) -> bool:
+        return disruption_id in self._active
+
+    def update(self, disruption_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply changes to an active disruption, re-indexing only what they touch"""
+        disruption = self._active[disruption_id]
+        started = event_timestamp({**disruption, **changes}) if "start_time" in changes else None
+
+        self._unindex(disruption)
+        disruption.update(changes)
+        self._index(disruption)
+
+        if started is not None and started != self._started[disruption_id]:
+            self._move_in_timeline(disruption_id, started)
+        self.version += 1
+        return disruption
+
+    def resolve(self, disruption_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Move an active disruption to the resolved set; it stays on the timeline"""
+        disruption = self._active.pop(disruption_id)
+        self._unindex(disruption)
+        disruption.update(changes)
+        self._resolved[disruption_id] = disruption
+        self.version += 1
+        return disruption
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Active disruptions in creation order"""
+        return list(self._active.values())
+
+    def query(
+        self,
+        route: Optional[str] = None,
+        severity: Optional[str] = None,
+        disruption_type: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Active disruptions matching every given filter, ordered by start time"""
+        candidates = [
+            index.get(key, set())
+            for index, key in (
+                (self._by_route, route),
+                (self._by_severity, severity),
+                (self._by_type, disruption_type)
+            )
+            if key is not None
+        ]
+
+        lower = bisect_left(self._timeline, (since,)) if since is not None else 0
+        upper = bisect_right(self._timeline, (until, chr(0x10FFFF))) if until is not None else len(self._timeline)
+
+        if candidates:
+            # Intersect starting from the smallest index set
+            candidates.sort(key=len)
+            ids = set(candidates[0]).intersection(*candidates[1:])
+            matches = sorted(
+                (self._started[disruption_id], disruption_id)
+                for disruption_id in ids
+                if since is None or self._started[disruption_id] >= since
+                if until is None or self._started[disruption_id] <= until
+            )
+        else:
+            matches = (entry for entry in self._timeline[lower:upper] if entry[1] in self._active)
+
+        results = []
+        for _, disruption_id in matches:
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(self._active[disruption_id])
+        return results
+
+    def state(self) -> Dict[str, Any]:
+        """Plain-data form of every disruption, used for snapshots"""
+        return {
+            "next_id": self._next_id,
+            "active": list(self._active.values()),
+            "resolved": list(self._resolved.values())
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "DisruptionStore":
+        """Rebuild a store and its indexes from ``state()`` output"""
+        store = cls()
+        for disruption in state["resolved"]:
+            store.add(disruption)
+            store.resolve(disruption["id"], {})
+        for disruption in state["active"]:
+            store.add(disruption)
+        store._next_id = max(store._next_id, state["next_id"])
+        return store
+
+    def started_between(self, since: float, until: float) -> int:
+        """Events (active or resolved) that started in [since, until], by binary search"""
+        return bisect_right(self._timeline, (until, chr(0x10FFFF))) - bisect_left(self._timeline, (since,))
+
+    def _index(self, disruption: Dict[str, Any]):
+        disruption_id = disruption["id"]
+        for route in _routes(disruption):
+            self._by_route[route].add(disruption_id)
+        severity = disruption.get("severity")
+        disruption_type = disruption.get("type", "unknown")
+        self._by_severity[severity].add(disruption_id)
+        self._by_type[disruption_type].add(disruption_id)
+        self.severity_counts[severity] += 1
+        self.type_counts[disruption_type] += 1
+        self.daily_impact += parse_daily_impact(disruption.get("financial_impact"))
+
+    def _unindex(self, disruption: Dict[str, Any]):
+        disruption_id = disruption["id"]
+        for route in _routes(disruption):
+            _discard(self._by_route, route, disruption_id)
+        severity = disruption.get("severity")
+        disruption_type = disruption.get("type", "unknown")
+        _discard(self._by_severity, severity, disruption_id)
+        _discard(self._by_type, disruption_type, disruption_id)
+        _decrement(self.severity_counts, severity)
+        _decrement(self.type_counts, disruption_type)
+        self.daily_impact -= parse_daily_impact(disruption.get("financial_impact"))
+
+    def _move_in_timeline(self, disruption_id: str, started: float):
+        entry = (self._started[disruption_id], disruption_id)
+        del self._timeline[bisect_left(self._timeline, entry)]
+        self._started[disruption_id] = started
+        insort(self._timeline, (started, disruption_id))
+
+def _routes(disruption: Dict[str, Any]) -> Iterable[str]:
+    routes = disruption.get("affected_routes") or []
+    return [routes] if isinstance(routes, str) else set(routes)
+
+def _discard(index: Dict[str, Set[str]], key: Any, disruption_id: str):
+    """Remove an id from an index bucket, dropping the bucket once empty"""
+    bucket = index.get(key)
+    if bucket is not None:
+        bucket.discard(disruption_id)
+        if not bucket:
+            del index[key]
+
+def _decrement(counter: Counter, key: Any):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
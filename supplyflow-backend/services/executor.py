@@ -0,0 +1,229 @@
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+import asyncio
+import functools
+import os
+import pickle
+import numpy as np
+
+from services.graph_engine import CompiledGraph, EDGE_ATTRIBUTES
+
+# Supported pool kinds
+POOL_KINDS = ("thread", "process")
+
+class WorkerPoolBusy(Exception):
+    """Raised when the pool's pending-task limit stays full past the timeout"""
+
+class WorkerTimeout(Exception):
+    """Raised when a task exceeds its time budget"""
+
+class SharedGraphHandle:
+    """Picklable reference to a CompiledGraph published in shared memory"""
+
+    def __init__(self, version: int, arrays: Dict[str, Tuple[str, Tuple[int, ...], str]], labels: Tuple[str, int]):
+        self.version = version
+        self.arrays = arrays
+        self.labels = labels
+
+class _PublishedGraph:
+    """Shared memory segments owned by the publishing process"""
+
+    def __init__(self, graph: CompiledGraph):
+        self.graph = graph
+        self.revision = graph.revision
+        # Tasks submitted with this snapshot that have not finished yet
+        self.refs = 0
+        self.segments: List[SharedMemory] = []
+        arrays = {}
+        for key, array in _graph_arrays(graph).items():
+            segment = SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+            self.segments.append(segment)
+            arrays[key] = (segment.name, array.shape, array.dtype.str)
+
+        # Node and edge ids are strings, so they travel once as a pickled blob
+        blob = pickle.dumps((graph.node_ids, graph.edge_ids.tolist()), protocol=pickle.HIGHEST_PROTOCOL)
+        labels = SharedMemory(create=True, size=max(1, len(blob)))
+        labels.buf[:len(blob)] = blob
+        self.segments.append(labels)
+
+        self.handle = SharedGraphHandle(graph.version, arrays, (labels.name, len(blob)))
+
+    def release(self):
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+# Per-worker cache of the most recently attached graph
+_attached: Dict[str, Any] = {}
+
+def attach_graph(handle: SharedGraphHandle) -> CompiledGraph:
+    """Map a published graph into this process without copying the arrays"""
+    cached = _attached.get("handle")
+    if cached is not None and cached.arrays == handle.arrays:
+        return _attached["graph"]
+
+    for segment in _attached.get("segments", []):
+        segment.close()
+
+    segments = []
+    arrays = {}
+    for key, (name, shape, dtype) in handle.arrays.items():
+        segment = SharedMemory(name=name, track=False)
+        segments.append(segment)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+
+    labels_name, labels_size = handle.labels
+    labels = SharedMemory(name=labels_name, track=False)
+    node_ids, edge_ids = pickle.loads(bytes(labels.buf[:labels_size]))
+    labels.close()
+
+    graph = CompiledGraph(
+        node_ids,
+        arrays["indptr"],
+        arrays["indices"],
+        np.asarray(edge_ids, dtype=object),
+        {attr: arrays[attr] for attr in EDGE_ATTRIBUTES},
+        handle.version
+    )
+    _attached.update(handle=handle, graph=graph, segments=segments)
+    return graph
+
+def _graph_arrays(graph: CompiledGraph) -> Dict[str, np.ndarray]:
+    return {"indptr": graph.indptr, "indices": graph.indices, **graph.weights}
+
+def _invoke(fn: Callable, args: tuple, kwargs: dict) -> Any:
+    """Worker-side trampoline that swaps shared graph handles for attached graphs"""
+    args = tuple(attach_graph(a) if isinstance(a, SharedGraphHandle) else a for a in args)
+    kwargs = {k: attach_graph(v) if isinstance(v, SharedGraphHandle) else v for k, v in kwargs.items()}
+    return fn(*args, **kwargs)
+
+class WorkerPool:
+    """Bounded thread or process pool that services dispatch CPU-bound work to"""
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        default_timeout: float = 30.0
+    ):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown worker pool kind '{kind}', expected one of {POOL_KINDS}")
+
+        self.kind = kind
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.max_pending = max_pending or self.max_workers * 4
+        self.default_timeout = default_timeout
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._published: Optional[_PublishedGraph] = None
+        # Older snapshots stay mapped until the last task shipped with them finishes
+        self._retired: List[_PublishedGraph] = []
+        self.submitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def executor(self) -> Executor:
+        """Underlying executor, created on first use"""
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="supplyflow-worker"
+                )
+        return self._executor
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) in the pool with backpressure and a time budget"""
+        timeout = self.default_timeout if timeout is None else timeout
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise WorkerPoolBusy(f"Worker pool saturated ({self.max_pending} pending tasks)")
+
+        loop = asyncio.get_running_loop()
+        shipped: List[_PublishedGraph] = []
+        try:
+            self.submitted += 1
+            if self.kind == "process":
+                args = tuple(self._ship(a, shipped) for a in args)
+                kwargs = {k: self._ship(v, shipped) for k, v in kwargs.items()}
+                call = functools.partial(_invoke, fn, args, kwargs)
+            else:
+                call = functools.partial(fn, *args, **kwargs)
+            future = self.executor.submit(call)
+        except BaseException:
+            self._finish(shipped)
+            raise
+
+        # The slot and snapshots are held until the worker is done, even past a timeout
+        def done(_):
+            try:
+                loop.call_soon_threadsafe(self._finish, shipped)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+        future.add_done_callback(done)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise WorkerTimeout(f"{getattr(fn, '__name__', 'task')} exceeded {timeout}s")
+
+    def _finish(self, shipped: List[_PublishedGraph]):
+        """Return a task's slot and drop its snapshot references"""
+        self._slots.release()
+        for published in shipped:
+            published.refs -= 1
+            if published.refs == 0 and published in self._retired:
+                self._retired.remove(published)
+                published.release()
+
+    def _ship(self, value: Any, shipped: List[_PublishedGraph]) -> Any:
+        """Replace a CompiledGraph with a shared memory handle, publishing it once per snapshot"""
+        if not isinstance(value, CompiledGraph):
+            return value
+        published = self._published
+        if published is None or published.graph is not value or published.revision != value.revision:
+            if published is not None:
+                if published.refs == 0:
+                    published.release()
+                else:
+                    self._retired.append(published)
+            published = self._published = _PublishedGraph(value)
+        published.refs += 1
+        shipped.append(published)
+        return published.handle
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+    def shutdown(self):
+        """Stop the workers and release shared graph segments"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for published in [self._published, *self._retired]:
+            if published is not None:
+                published.release()
+        self._published = None
+        self._retired = []
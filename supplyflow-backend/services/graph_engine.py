@@ -0,0 +1,540 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+# Edge attributes compiled into one float column each
+EDGE_ATTRIBUTES = ("distance", "cost", "duration", "risk_score")
+
+# Edge risk is capped below 1 so a certain failure still has a finite log cost
+MAX_EDGE_RISK = 0.999999
+
+def risk_cost(risk):
+    """Additive cost -log(1 - risk); a path's sum converts back to its chance of failing on some leg"""
+    return -np.log1p(-np.clip(risk, 0, MAX_EDGE_RISK))
+
+# Weight columns derived from one stored attribute: name -> (attribute, transform)
+DERIVED_WEIGHTS = {"risk_cost": ("risk_score", risk_cost)}
+
+def with_derived(values: Dict[str, float]) -> Dict[str, float]:
+    """One edge's attribute values plus every derived weight whose attribute is present"""
+    derived = {
+        weight: float(derive(values[attr]))
+        for weight, (attr, derive) in DERIVED_WEIGHTS.items() if attr in values
+    }
+    return {**values, **derived}
+
+# Position shifts an EdgeIndex translates through before it is rebuilt as a plain dict
+MAX_INDEX_SHIFTS = 32
+
+# Default weights of each criterion in composite route scores
+ROUTE_SCORE_WEIGHTS = {"distance": 0.2, "cost": 0.3, "duration": 0.3, "risk": 0.2}
+
+class EdgeIndex:
+    """Edge id -> position lookup that survives edge inserts and deletes without a rebuild
+
+    Inserting or deleting edges moves every later position, so instead of
+    re-enumerating all ids a snapshot shares its ancestor's dict and
+    translates looked-up positions through the shifts made since then.
+    Once there are ``MAX_INDEX_SHIFTS`` of them the chain is folded back
+    into a fresh dict.
+    """
+
+    def __init__(
+        self,
+        base: Dict[str, int],
+        size: int,
+        shifts: Tuple[Tuple[str, np.ndarray], ...] = (),
+        added: Optional[Dict[str, Tuple[int, int]]] = None
+    ):
+        self._base = base
+        self._size = size
+        # ("insert" | "delete", sorted positions in the numbering just before the shift)
+        self._shifts = shifts
+        # Ids inserted since the base: id -> (position after its shift, number of shifts applied)
+        self._added = added or {}
+
+    @classmethod
+    def build(cls, edge_ids: np.ndarray) -> "EdgeIndex":
+        return cls(dict(zip(edge_ids.tolist(), range(len(edge_ids)))), len(edge_ids))
+
+    def shifted(
+        self,
+        edge_ids: np.ndarray,
+        deleted: Optional[np.ndarray] = None,
+        inserted: Optional[np.ndarray] = None,
+        inserted_ids: Sequence[str] = ()
+    ) -> "EdgeIndex":
+        """Index for ``edge_ids`` after deleting positions or inserting ids before positions (np.insert style)"""
+        if len(self._shifts) >= MAX_INDEX_SHIFTS:
+            return EdgeIndex.build(edge_ids)
+        if deleted is not None:
+            return EdgeIndex(self._base, len(edge_ids), self._shifts + (("delete", np.sort(deleted)),), self._added)
+
+        shifts = self._shifts + (("insert", inserted),)
+        added = dict(self._added)
+        # np.insert places the i-th new id (in position order) at inserted[i] + i
+        for i, (edge_id, position) in enumerate(zip(inserted_ids, inserted.tolist())):
+            added[edge_id] = (position + i, len(shifts))
+        return EdgeIndex(self._base, len(edge_ids), shifts, added)
+
+    def get(self, edge_id: str, default: Optional[int] = None) -> Optional[int]:
+        if edge_id in self._added:
+            position, applied = self._added[edge_id]
+        elif edge_id in self._base:
+            position, applied = self._base[edge_id], 0
+        else:
+            return default
+
+        for kind, positions in self._shifts[applied:]:
+            if kind == "delete":
+                offset = int(np.searchsorted(positions, position))
+                if offset < len(positions) and positions[offset] == position:
+                    return default
+                position -= offset
+            else:
+                position += int(np.searchsorted(positions, position, side="right"))
+        return position
+
+    def __getitem__(self, edge_id: str) -> int:
+        position = self.get(edge_id)
+        if position is None:
+            raise KeyError(edge_id)
+        return position
+
+    def __contains__(self, edge_id: str) -> bool:
+        return self.get(edge_id) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+class CompiledGraph:
+    """Compact CSR snapshot of the supply chain graph backed by NumPy arrays"""
+
+    def __init__(
+        self,
+        node_ids: Sequence[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        edge_ids: np.ndarray,
+        weights: Dict[str, np.ndarray],
+        version: int = 0,
+        node_index: Optional[Dict[str, int]] = None,
+        edge_index: Optional[EdgeIndex] = None
+    ):
+        self.node_ids = list(node_ids)
+        self.node_index = node_index if node_index is not None else dict(zip(self.node_ids, range(len(self.node_ids))))
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_ids = edge_ids
+        self.weights = weights
+        self.version = version
+        # Counts weight patches since this topology was compiled
+        self.revision = 0
+        self.edge_index = edge_index if edge_index is not None else EdgeIndex.build(edge_ids)
+        self._matrices: Dict[str, csr_matrix] = {}
+        self._derived: Dict[str, np.ndarray] = {}
+        self._reverse: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_arrays(
+        cls,
+        node_ids: Sequence[str],
+        sources: np.ndarray,
+        targets: np.ndarray,
+        edge_ids: Sequence[str],
+        columns: Dict[str, np.ndarray],
+        version: int = 0
+    ) -> "CompiledGraph":
+        """Build a CSR graph from integer edge endpoints and attribute columns"""
+        num_nodes = len(node_ids)
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+
+        # Sort edges by (source, target) so each row is searchable
+        order = np.lexsort((targets, sources))
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+
+        weights = {
+            attr: np.ascontiguousarray(
+                np.asarray(columns.get(attr, np.zeros(len(order))), dtype=np.float64)[order]
+            )
+            for attr in EDGE_ATTRIBUTES
+        }
+
+        return cls(
+            node_ids,
+            indptr,
+            np.ascontiguousarray(targets[order]),
+            np.asarray(edge_ids, dtype=object)[order],
+            weights,
+            version
+        )
+
+    @classmethod
+    def from_networkx(cls, graph: nx.DiGraph, version: int = 0) -> "CompiledGraph":
+        """Compile a networkx DiGraph whose edges carry the standard attributes"""
+        node_ids = list(graph.nodes())
+        node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        num_edges = graph.number_of_edges()
+
+        sources = np.empty(num_edges, dtype=np.int32)
+        targets = np.empty(num_edges, dtype=np.int32)
+        edge_ids = []
+        columns = {attr: np.zeros(num_edges, dtype=np.float64) for attr in EDGE_ATTRIBUTES}
+
+        for i, (u, v, attrs) in enumerate(graph.edges(data=True)):
+            sources[i] = node_index[u]
+            targets[i] = node_index[v]
+            edge_ids.append(attrs.get("id", f"{u}->{v}"))
+            for attr in EDGE_ATTRIBUTES:
+                columns[attr][i] = attrs.get(attr, 0)
+
+        return cls.from_arrays(node_ids, sources, targets, edge_ids, columns, version)
+
+    def with_edges(
+        self,
+        version: int,
+        sources: Sequence[int],
+        targets: Sequence[int],
+        edge_ids: Sequence[str],
+        columns: Dict[str, Sequence[float]]
+    ) -> "CompiledGraph":
+        """New snapshot with edges inserted into their rows; this one is untouched
+
+        Each edge goes straight to its sorted slot within the source row, so
+        the cost is one vectorized copy of the edge arrays rather than a
+        re-sort, and the id index is carried over instead of rebuilt.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.lexsort((targets, sources))
+        sources, targets = sources[order], targets[order]
+        edge_ids = np.asarray(edge_ids, dtype=object)[order]
+        slots = np.array([
+            self.indptr[source] + np.searchsorted(self.indices[self.indptr[source]:self.indptr[source + 1]], target)
+            for source, target in zip(sources.tolist(), targets.tolist())
+        ], dtype=np.int64)
+
+        indptr = self.indptr.copy()
+        indptr[1:] += np.cumsum(np.bincount(sources, minlength=self.number_of_nodes()))
+        all_ids = np.insert(self.edge_ids, slots, edge_ids)
+        return CompiledGraph(
+            self.node_ids,
+            indptr,
+            np.insert(self.indices, slots, targets.astype(self.indices.dtype)),
+            all_ids,
+            {
+                attr: np.insert(column, slots, np.asarray(columns[attr], dtype=np.float64)[order])
+                for attr, column in self.weights.items()
+            },
+            version,
+            node_index=self.node_index,
+            edge_index=self.edge_index.shifted(all_ids, inserted=slots, inserted_ids=edge_ids.tolist())
+        )
+
+    def without_edges(self, version: int, positions: Sequence[int]) -> "CompiledGraph":
+        """New snapshot with the edges at ``positions`` dropped; node positions are unchanged"""
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        keep = np.ones(self.number_of_edges(), dtype=bool)
+        keep[positions] = False
+        indptr = self.indptr.copy()
+        indptr[1:] -= np.cumsum(np.bincount(self.edge_sources()[positions], minlength=self.number_of_nodes()))
+        edge_ids = self.edge_ids[keep]
+        return CompiledGraph(
+            self.node_ids,
+            indptr,
+            self.indices[keep],
+            edge_ids,
+            {attr: column[keep] for attr, column in self.weights.items()},
+            version,
+            node_index=self.node_index,
+            edge_index=self.edge_index.shifted(edge_ids, deleted=positions)
+        )
+
+    def with_node(self, version: int, node_id: str) -> "CompiledGraph":
+        """New snapshot with an edgeless node at the next position; edge arrays are shared"""
+        return CompiledGraph(
+            self.node_ids + [node_id],
+            np.append(self.indptr, self.indptr[-1]),
+            self.indices,
+            self.edge_ids,
+            self.weights,
+            version,
+            node_index={**self.node_index, node_id: len(self.node_ids)},
+            edge_index=self.edge_index
+        )
+
+    def with_weights(self, positions: Sequence[int], columns: Dict[str, Sequence[float]]) -> "CompiledGraph":
+        """New snapshot with edge weights patched; this one is untouched
+
+        Only the patched columns are copied. Topology arrays and the untouched
+        columns are shared, and the version stays the same because the
+        topology is unchanged.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        weights = dict(self.weights)
+        for attr, values in columns.items():
+            column = weights[attr].copy()
+            column[positions] = np.asarray(values, dtype=np.float64)
+            weights[attr] = column
+        graph = CompiledGraph(
+            self.node_ids,
+            self.indptr,
+            self.indices,
+            self.edge_ids,
+            weights,
+            self.version,
+            node_index=self.node_index,
+            edge_index=self.edge_index
+        )
+        graph.revision = self.revision + 1
+        graph._reverse = self._reverse
+        graph._derived = {
+            weight: column for weight, column in self._derived.items()
+            if DERIVED_WEIGHTS[weight][0] not in columns
+        }
+        return graph
+
+    def without_node(self, version: int, position: int) -> "CompiledGraph":
+        """New snapshot without an edgeless node; later nodes move down one position
+
+        Renumbering keeps every row's targets in order, so the edge arrays
+        only need their targets shifted, not re-sorted.
+        """
+        if self.indptr[position] != self.indptr[position + 1] or (self.indices == position).any():
+            raise ValueError(f"Node at position {position} still has edges")
+        indices = self.indices.copy()
+        indices[indices > position] -= 1
+        return CompiledGraph(
+            self.node_ids[:position] + self.node_ids[position + 1:],
+            np.delete(self.indptr, position + 1),
+            indices,
+            self.edge_ids,
+            self.weights,
+            version,
+            edge_index=self.edge_index
+        )
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        return int(self.indices.shape[0])
+
+    def nbytes(self) -> int:
+        """Memory held by the numeric arrays"""
+        return int(
+            self.indptr.nbytes
+            + self.indices.nbytes
+            + sum(column.nbytes for column in self.weights.values())
+        )
+
+    def edge_sources(self) -> np.ndarray:
+        """Source node index of every edge, aligned with ``indices``"""
+        return np.repeat(
+            np.arange(self.number_of_nodes(), dtype=np.int32), np.diff(self.indptr)
+        )
+
+    def edge_position(self, source: int, target: int) -> int:
+        """Position of the source->target edge in the edge arrays, or -1"""
+        start, end = self.indptr[source], self.indptr[source + 1]
+        offset = int(np.searchsorted(self.indices[start:end], target))
+        if start + offset < end and self.indices[start + offset] == target:
+            return int(start + offset)
+        return -1
+
+    def path_positions(self, path: Sequence[int]) -> np.ndarray:
+        """Edge positions along a path of node indices"""
+        return np.array(
+            [self.edge_position(path[i], path[i + 1]) for i in range(len(path) - 1)],
+            dtype=np.int64
+        )
+
+    def column(self, weight: str) -> np.ndarray:
+        """Stored attribute column, or a derived weight column computed on first use"""
+        if weight in self.weights:
+            return self.weights[weight]
+        if weight not in self._derived:
+            attr, derive = DERIVED_WEIGHTS[weight]
+            self._derived[weight] = derive(self.weights[attr])
+        return self._derived[weight]
+
+    def matrix(self, weight: str) -> csr_matrix:
+        """Sparse adjacency matrix weighted by one edge attribute or derived weight"""
+        if weight not in self._matrices:
+            n = self.number_of_nodes()
+            self._matrices[weight] = csr_matrix(
+                (self.column(weight), self.indices, self.indptr), shape=(n, n)
+            )
+        return self._matrices[weight]
+
+    def shortest_path(self, source: int, target: int, weight: str) -> Optional[List[int]]:
+        """Dijkstra shortest path between node indices, or None if unreachable"""
+        _, predecessors = dijkstra(
+            self.matrix(weight), directed=True, indices=source, return_predecessors=True
+        )
+        return walk_predecessors(predecessors, source, target)
+
+    def route_scores(self, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Composite route score for every edge, computed column-wise"""
+        weights = weights or ROUTE_SCORE_WEIGHTS
+        distance_score = 1 / (1 + self.weights["distance"] / 1000)
+        cost_score = 1 / (1 + self.weights["cost"] / 1000)
+        time_score = 1 / (1 + self.weights["duration"] / 24)
+        risk_score = 1 - self.weights["risk_score"]
+
+        composite = (
+            distance_score * weights["distance"]
+            + cost_score * weights["cost"]
+            + time_score * weights["duration"]
+            + risk_score * weights["risk"]
+        )
+        return np.round(composite, 3)
+
+    def betweenness_centrality(
+        self,
+        sources: Optional[Sequence[int]] = None,
+        normalized: bool = True
+    ) -> np.ndarray:
+        """Unweighted betweenness (Brandes) with level-synchronous BFS over the CSR arrays"""
+        n = self.number_of_nodes()
+        betweenness = np.zeros(n, dtype=np.float64)
+        pivots = range(n) if sources is None else sources
+
+        for source in pivots:
+            sigma, dag_levels = self._bfs_dag(int(source), self.indptr, self.indices)
+            delta = np.zeros(n, dtype=np.float64)
+            for src, dst in reversed(dag_levels):
+                np.add.at(delta, src, sigma[src] / sigma[dst] * (1 + delta[dst]))
+            delta[source] = 0
+            betweenness += delta
+
+        if normalized and n > 2:
+            betweenness *= 1 / ((n - 1) * (n - 2))
+        if sources is not None and len(sources) > 0:
+            betweenness *= n / len(sources)
+        return betweenness
+
+    def closeness_centrality(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Closeness over incoming unweighted distances, matching networkx"""
+        n = self.number_of_nodes()
+        closeness = np.zeros(n, dtype=np.float64)
+        if n <= 1:
+            return closeness
+
+        indptr, indices = self.reverse()
+        targets = range(n) if nodes is None else nodes
+        for node in targets:
+            dist = _bfs_distances(int(node), indptr, indices)
+            reached = dist >= 0
+            total = dist[reached].sum()
+            reachable = int(reached.sum())
+            if total > 0:
+                closeness[node] = (reachable - 1) / total * (reachable - 1) / (n - 1)
+        return closeness
+
+    def closeness_from_pivots(self, pivots: Sequence[int]) -> np.ndarray:
+        """Estimate closeness from forward BFS runs out of sampled pivots (Eppstein-Wang)"""
+        n = self.number_of_nodes()
+        closeness = np.zeros(n, dtype=np.float64)
+        if n <= 1 or len(pivots) == 0:
+            return closeness
+
+        total = np.zeros(n, dtype=np.float64)
+        reach = np.zeros(n, dtype=np.float64)
+        for pivot in pivots:
+            dist = _bfs_distances(int(pivot), self.indptr, self.indices)
+            reached = dist > 0
+            total[reached] += dist[reached]
+            reach[reached] += 1
+
+        # Scale the sampled sums up to estimates over every source node
+        estimated_reach = np.minimum(reach * n / len(pivots), n - 1)
+        has_paths = total > 0
+        closeness[has_paths] = (
+            reach[has_paths] / total[has_paths] * estimated_reach[has_paths] / (n - 1)
+        )
+        return closeness
+
+    def reverse(self) -> Tuple[np.ndarray, np.ndarray]:
+        """CSR arrays of the transposed graph (incoming edges per node)"""
+        if self._reverse is None:
+            n = self.number_of_nodes()
+            sources = self.edge_sources()
+            order = np.lexsort((sources, self.indices))
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=n), out=indptr[1:])
+            self._reverse = (indptr, np.ascontiguousarray(sources[order]))
+        return self._reverse
+
+    def _bfs_dag(
+        self, source: int, indptr: np.ndarray, indices: np.ndarray
+    ) -> Tuple[np.ndarray, List[Tuple[np.ndarray, np.ndarray]]]:
+        """Shortest-path counts and per-level DAG edges from one source"""
+        n = self.number_of_nodes()
+        dist = np.full(n, -1, dtype=np.int64)
+        sigma = np.zeros(n, dtype=np.float64)
+        dist[source] = 0
+        sigma[source] = 1
+
+        levels = []
+        frontier = np.array([source], dtype=np.int64)
+        depth = 0
+        while frontier.size:
+            src, dst = _expand(frontier, indptr, indices)
+            if src.size == 0:
+                break
+            new_nodes = np.unique(dst[dist[dst] < 0])
+            dist[new_nodes] = depth + 1
+            on_level = dist[dst] == depth + 1
+            src, dst = src[on_level], dst[on_level]
+            np.add.at(sigma, dst, sigma[src])
+            levels.append((src, dst))
+            frontier = new_nodes
+            depth += 1
+
+        return sigma, levels
+
+def _expand(frontier: np.ndarray, indptr: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """All (source, target) edges leaving a frontier of nodes"""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    group_offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    positions = group_offsets + np.arange(total)
+    return np.repeat(frontier, counts), indices[positions].astype(np.int64)
+
+def _bfs_distances(source: int, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Unweighted hop distances from a source (-1 when unreachable)"""
+    dist = np.full(indptr.shape[0] - 1, -1, dtype=np.int64)
+    dist[source] = 0
+    frontier = np.array([source], dtype=np.int64)
+    depth = 0
+    while frontier.size:
+        _, dst = _expand(frontier, indptr, indices)
+        frontier = np.unique(dst[dist[dst] < 0])
+        depth += 1
+        dist[frontier] = depth
+    return dist
+
+def walk_predecessors(predecessors: np.ndarray, source: int, target: int) -> Optional[List[int]]:
+    """Rebuild a source->target path from a scipy predecessor row"""
+    if source == target:
+        return [source]
+    if predecessors[target] < 0:
+        return None
+
+    path = [target]
+    node = target
+    while node != source:
+        node = int(predecessors[node])
+        path.append(node)
+    path.reverse()
+    return path
@@ -0,0 +1,371 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from services.graph_engine import CompiledGraph, EDGE_ATTRIBUTES
+
+# Column name -> kind; anything else in the input is ignored
+NODE_SCHEMA = {
+    "id": "string",
+    "name": "string",
+    "type": "string",
+    "lat": "number",
+    "lng": "number",
+    "city": "string",
+    "capacity": "number",
+    "current_stock": "number",
+    "current_load": "number",
+    "risk_level": "string"
+}
+EDGE_SCHEMA = {
+    "id": "string",
+    "source_id": "string",
+    "target_id": "string",
+    "route_type": "string",
+    **{attr: "number" for attr in EDGE_ATTRIBUTES}
+}
+REQUIRED_NODE_COLUMNS = ("id",)
+REQUIRED_EDGE_COLUMNS = ("source_id", "target_id") + EDGE_ATTRIBUTES
+
+# Node columns nested under "location" in node records
+LOCATION_COLUMNS = ("lat", "lng", "city")
+
+# File extension -> reader format
+FILE_FORMATS = {
+    ".csv": "csv",
+    ".gz": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet"
+}
+
+# Errors kept in the load report per file
+MAX_REPORTED_ERRORS = 20
+
+class GraphLoadError(ValueError):
+    """Raised when an input file cannot be read or fails schema validation"""
+
+class LoadedNetwork:
+    """Validated nodes and edges plus the CSR graph built from them in one pass
+
+    The node and edge record dicts are built from the validated frames the
+    first time they are read, after which the frames are released.
+    """
+
+    def __init__(self, nodes: pd.DataFrame, edges: pd.DataFrame, compiled: CompiledGraph, report: Dict[str, Any]):
+        self._node_frame: Optional[pd.DataFrame] = nodes
+        self._edge_frame: Optional[pd.DataFrame] = edges
+        self._nodes: Optional[List[Dict[str, Any]]] = None
+        self._edges: Optional[List[Dict[str, Any]]] = None
+        self.compiled = compiled
+        self.report = report
+
+    @property
+    def nodes(self) -> List[Dict[str, Any]]:
+        if self._nodes is None:
+            self._nodes = _node_records(self._node_frame)
+            self._node_frame = None
+        return self._nodes
+
+    @property
+    def edges(self) -> List[Dict[str, Any]]:
+        if self._edges is None:
+            self._edges = _edge_records(self._edge_frame, self.compiled.node_ids)
+            self._edge_frame = None
+        return self._edges
+
+def read_network(
+    nodes_path: str,
+    edges_path: str,
+    chunk_size: int = 100000,
+    strict: bool = False,
+    version: int = 0
+) -> LoadedNetwork:
+    """Stream node and edge files in chunks, validate them and build the graph once
+
+    Nodes are read first, so every validated edge chunk swaps its endpoint
+    ids for node positions as it arrives. Peak memory is the node table, one
+    raw edge chunk and, per kept edge, its id, route type, two positions and
+    the weight columns, which the CSR build then copies once.
+    """
+    started = time.perf_counter()
+    nodes, node_stats = _read_validated(nodes_path, NODE_SCHEMA, REQUIRED_NODE_COLUMNS, chunk_size, strict)
+    nodes = _unique_nodes(nodes, node_stats, strict)
+    node_index = pd.Index(nodes["id"])
+    edges, edge_stats = _read_validated(
+        edges_path,
+        EDGE_SCHEMA,
+        REQUIRED_EDGE_COLUMNS,
+        chunk_size,
+        strict,
+        lambda chunk, stats: _resolve_endpoints(chunk, node_index, stats, strict)
+    )
+    read_seconds = time.perf_counter() - started
+    return _build(nodes, edges, node_stats, edge_stats, strict, version, started, read_seconds)
+
+def network_from_records(
+    nodes: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    strict: bool = True,
+    version: int = 0
+) -> LoadedNetwork:
+    """Run in-memory node/edge records through the same validation and bulk build"""
+    started = time.perf_counter()
+    node_frame, node_stats = _validate_all([_flatten_location(nodes)], NODE_SCHEMA, REQUIRED_NODE_COLUMNS, strict, "nodes")
+    node_frame = _unique_nodes(node_frame, node_stats, strict)
+    edge_frame, edge_stats = _validate_all(
+        [pd.DataFrame(edges)],
+        EDGE_SCHEMA,
+        REQUIRED_EDGE_COLUMNS,
+        strict,
+        "edges",
+        lambda chunk, stats: _resolve_endpoints(chunk, pd.Index(node_frame["id"]), stats, strict)
+    )
+    return _build(node_frame, edge_frame, node_stats, edge_stats, strict, version, started, 0.0)
+
+def validate_node(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and normalize one node record against the loader schema"""
+    frame, _ = _validate_all([_flatten_location([record])], NODE_SCHEMA, REQUIRED_NODE_COLUMNS, True, "node")
+    return _node_records(frame)[0]
+
+def validate_edge(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and normalize one edge record against the loader schema"""
+    frame, _ = _validate_all([pd.DataFrame([record])], EDGE_SCHEMA, REQUIRED_EDGE_COLUMNS, True, "edge")
+    return _records(frame)[0]
+
+def file_format(path: str) -> str:
+    """Reader format for a path, from its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FILE_FORMATS:
+        raise GraphLoadError(f"Unsupported file type '{extension}' for {path}, expected one of {sorted(FILE_FORMATS)}")
+    return FILE_FORMATS[extension]
+
+def iter_chunks(path: str, columns: Tuple[str, ...], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks of at most chunk_size rows, reading only schema columns"""
+    if not os.path.exists(path):
+        raise GraphLoadError(f"File not found: {path}")
+
+    fmt = file_format(path)
+    if fmt == "csv":
+        # Ids stay strings even when they look numeric
+        yield from pd.read_csv(
+            path,
+            chunksize=chunk_size,
+            low_memory=False,
+            usecols=lambda column: column in columns,
+            dtype={column: str for column in ("id", "source_id", "target_id")}
+        )
+    elif fmt == "jsonl":
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        parquet = pq.ParquetFile(path)
+        present = [column for column in parquet.schema_arrow.names if column in columns]
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=present):
+            yield batch.to_pandas()
+
+def _read_validated(
+    path: str,
+    schema: Dict[str, str],
+    required: Tuple[str, ...],
+    chunk_size: int,
+    strict: bool,
+    resolve: Optional[Callable[[pd.DataFrame, Dict[str, Any]], pd.DataFrame]] = None
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    return _validate_all(iter_chunks(path, tuple(schema), chunk_size), schema, required, strict, path, resolve)
+
+def _validate_all(
+    chunks,
+    schema: Dict[str, str],
+    required: Tuple[str, ...],
+    strict: bool,
+    label: str,
+    resolve: Optional[Callable[[pd.DataFrame, Dict[str, Any]], pd.DataFrame]] = None
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Validate every chunk column-wise and concatenate the rows that pass, after ``resolve`` if given"""
+    kept = []
+    errors: List[str] = []
+    stats = {"source": label, "rows_read": 0, "rows_rejected": 0, "chunks": 0}
+
+    for chunk in chunks:
+        chunk = chunk[[column for column in chunk.columns if column in schema]].copy()
+        missing = [column for column in required if column not in chunk.columns]
+        if missing:
+            raise GraphLoadError(f"{label}: missing required columns {missing}")
+
+        valid, reasons = _validate_chunk(chunk, schema, required)
+        bad = np.flatnonzero(~valid)
+        if len(bad):
+            if strict:
+                row = stats["rows_read"] + int(bad[0])
+                raise GraphLoadError(f"{label}: row {row} invalid ({reasons[bad[0]]})")
+            for position in bad[:MAX_REPORTED_ERRORS - len(errors)]:
+                errors.append(f"row {stats['rows_read'] + int(position)}: {reasons[position]}")
+
+        stats["rows_read"] += len(chunk)
+        stats["rows_rejected"] += len(bad)
+        stats["chunks"] += 1
+        kept.append(chunk[valid] if resolve is None else resolve(chunk[valid], stats))
+
+    frame = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=list(required))
+    stats["errors"] = errors
+    return frame, stats
+
+def _validate_chunk(chunk: pd.DataFrame, schema: Dict[str, str], required: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """Coerce schema columns in place; return a row mask and a reason per rejected row"""
+    valid = np.ones(len(chunk), dtype=bool)
+    reasons = np.full(len(chunk), "", dtype=object)
+
+    def reject(mask: np.ndarray, reason: str):
+        mask = mask & valid
+        reasons[mask] = reason
+        valid[mask] = False
+
+    for column in chunk.columns:
+        values = chunk[column]
+        if schema[column] == "number":
+            numbers = pd.to_numeric(values, errors="coerce")
+            reject((numbers.isna() & values.notna()).to_numpy(), f"'{column}' is not a number")
+            # Keep whole numbers integral even when some rows leave the column empty
+            present = numbers.dropna()
+            if len(present) and numbers.isna().any() and (present % 1 == 0).all():
+                numbers = numbers.astype("Int64")
+            chunk[column] = numbers
+        elif not pd.api.types.is_string_dtype(values):
+            # JSON-lines and Parquet may carry numeric ids; the graph keys on strings
+            chunk[column] = values.where(values.isna(), values.astype(str))
+
+    for column in required:
+        values = chunk[column]
+        empty = values.isna()
+        if schema[column] == "string":
+            empty |= values.eq("")
+        reject(empty.to_numpy(), f"'{column}' is required")
+
+    for column in ("distance", "cost", "duration"):
+        if column in chunk.columns:
+            reject((chunk[column] < 0).to_numpy(dtype=bool, na_value=False), f"'{column}' must be non-negative")
+    if "risk_score" in chunk.columns:
+        risk = chunk["risk_score"]
+        reject(((risk < 0) | (risk > 1)).to_numpy(dtype=bool, na_value=False), "'risk_score' must be within [0, 1]")
+
+    return valid, reasons
+
+def _unique_nodes(nodes: pd.DataFrame, stats: Dict[str, Any], strict: bool) -> pd.DataFrame:
+    """Nodes with later copies of an id dropped; edge endpoints resolve against this"""
+    duplicates = nodes["id"].duplicated().to_numpy()
+    if strict and duplicates.any():
+        raise GraphLoadError("Duplicate node ids, edge ids or source/target lanes")
+    stats["duplicates"] = int(duplicates.sum())
+    return nodes[~duplicates].reset_index(drop=True)
+
+def _resolve_endpoints(edges: pd.DataFrame, node_ids: pd.Index, stats: Dict[str, Any], strict: bool) -> pd.DataFrame:
+    """Swap one validated chunk's endpoint ids for node positions, dropping dangling edges"""
+    # Edges without an id are named after their lane, as in CompiledGraph.from_networkx
+    if "id" not in edges.columns:
+        edges.insert(0, "id", edges["source_id"] + "->" + edges["target_id"])
+    unnamed = edges["id"].isna()
+    if unnamed.any():
+        edges.loc[unnamed, "id"] = edges.loc[unnamed, "source_id"] + "->" + edges.loc[unnamed, "target_id"]
+
+    sources = node_ids.get_indexer(edges["source_id"])
+    targets = node_ids.get_indexer(edges["target_id"])
+    dangling = (sources < 0) | (targets < 0)
+    if strict and dangling.any():
+        raise GraphLoadError(f"{int(dangling.sum())} edges reference unknown nodes")
+    stats["dangling"] = stats.get("dangling", 0) + int(dangling.sum())
+
+    # The endpoint columns keep their place but hold positions until records are built
+    edges = edges[~dangling].copy()
+    edges["source_id"] = sources[~dangling].astype(np.int64)
+    edges["target_id"] = targets[~dangling].astype(np.int64)
+    return edges
+
+def _build(
+    nodes: pd.DataFrame,
+    edges: pd.DataFrame,
+    node_stats: Dict[str, Any],
+    edge_stats: Dict[str, Any],
+    strict: bool,
+    version: int,
+    started: float,
+    read_seconds: float
+) -> LoadedNetwork:
+    """Drop duplicate edges from deduplicated nodes and resolved edges, then build the CSR graph"""
+    build_started = time.perf_counter()
+
+    lanes = edges["source_id"] * max(1, len(nodes)) + edges["target_id"]
+    duplicate_edges = (edges["id"].duplicated() | lanes.duplicated()).to_numpy()
+    if strict and duplicate_edges.any():
+        raise GraphLoadError("Duplicate node ids, edge ids or source/target lanes")
+    edges = edges[~duplicate_edges].reset_index(drop=True)
+
+    compiled = CompiledGraph.from_arrays(
+        nodes["id"].tolist(),
+        edges["source_id"].to_numpy(),
+        edges["target_id"].to_numpy(),
+        edges["id"].to_numpy(dtype=object),
+        {attr: edges[attr].to_numpy(dtype=np.float64) for attr in EDGE_ATTRIBUTES},
+        version
+    )
+    build_seconds = time.perf_counter() - build_started
+
+    total_seconds = time.perf_counter() - started
+    rows = node_stats["rows_read"] + edge_stats["rows_read"]
+    report = {
+        "nodes": {**node_stats, "loaded": len(nodes)},
+        "edges": {
+            **edge_stats,
+            "duplicates": int(duplicate_edges.sum()),
+            "dangling": edge_stats.get("dangling", 0),
+            "loaded": len(edges)
+        },
+        "read_seconds": round(read_seconds, 4),
+        "build_seconds": round(build_seconds, 4),
+        "total_seconds": round(total_seconds, 4),
+        "rows_per_second": int(rows / total_seconds) if total_seconds > 0 else rows
+    }
+    return LoadedNetwork(nodes, edges, compiled, report)
+
+def _flatten_location(nodes: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Node records as a frame with the nested location spread into columns"""
+    frame = pd.DataFrame(nodes)
+    if "location" in frame.columns:
+        location = pd.DataFrame([value or {} for value in frame.pop("location")], index=frame.index)
+        frame = frame.join(location[[c for c in LOCATION_COLUMNS if c in location.columns]])
+    return frame
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Row dicts built column-wise, with missing optional values dropped (NaN is not valid JSON)"""
+    names = list(frame.columns)
+    columns = [frame[name].tolist() for name in names]
+    records = [dict(zip(names, row)) for row in zip(*columns)]
+
+    # Only rows that actually miss a value are touched
+    for name in names:
+        for position in np.flatnonzero(frame[name].isna().to_numpy()).tolist():
+            del records[position][name]
+    return records
+
+def _edge_records(edges: pd.DataFrame, node_ids: List[str]) -> List[Dict[str, Any]]:
+    """Edge dicts with endpoint positions mapped back to node ids"""
+    ids = np.asarray(node_ids, dtype=object)
+    edges = edges.assign(source_id=ids[edges["source_id"].to_numpy()], target_id=ids[edges["target_id"].to_numpy()])
+    return _records(edges)
+
+def _node_records(nodes: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Node dicts in the service's shape, with coordinates nested under location"""
+    nodes = nodes.copy()
+    if "name" not in nodes.columns:
+        nodes["name"] = nodes["id"]
+    nodes["name"] = nodes["name"].fillna(nodes["id"])
+    nodes["type"] = nodes["type"].fillna("unknown") if "type" in nodes.columns else "unknown"
+
+    location_columns = [column for column in LOCATION_COLUMNS if column in nodes.columns]
+    records = _records(nodes.drop(columns=location_columns))
+    if location_columns:
+        for record, location in zip(records, _records(nodes[location_columns])):
+            record["location"] = location
+    return records
@@ -1,15 +1,301 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+import asyncio
 import networkx as nx
+import numpy as np
 import json
 from datetime import datetime
 
+from scipy.sparse.csgraph import connected_components, dijkstra
+
+from services.graph_engine import CompiledGraph, EDGE_ATTRIBUTES, ROUTE_SCORE_WEIGHTS, walk_predecessors
+from services.graph_loader import LoadedNetwork, network_from_records, read_network, validate_edge, validate_node
+from services.change_feed import ChangeFeed, GraphChange
+from services.route_index import RouteIndex, INDEXED_CRITERIA, build_trees
+from services.centrality import CentralityCache
+from services.resilience import ResilienceEngine
+from services.executor import WorkerPool
+from services.spatial_index import SpatialIndex
+from services.impact import ImpactEngine
+from services.risk_simulation import RiskSimulator
+from services.pareto import compute_pareto_routes, normalize_weights, path_limits
+from services.alternative_paths import ALTERNATIVE_CRITERIA, DISJOINT_MODES, AlternativePathCache, compute_alternative_paths
+
+# Source-target pairs one risk simulation may cover
+MAX_RISK_PAIRS = 100
+
+# Most ranked and backup paths one alternatives request may ask for per criterion
+MAX_ALTERNATIVE_PATHS = 20
+MAX_BACKUP_PATHS = 10
+
+# Seconds spent precomputing route trees after a load; the rest fill in on demand
+ROUTE_WARM_BUDGET = 1.0
+
+class DuplicateEntityError(ValueError):
+    """Raised when adding a node or edge whose id (or edge lane) already exists"""
+
 class GraphService:
     """Service for managing supply chain graph operations"""
     
-    def __init__(self):
-        self.graph = nx.DiGraph()
+    def __init__(
+        self,
+        route_index_size: int = 256,
+        centrality_epsilon: float = 0.1,
+        resilience_budget: float = 2.0,
+        risk_max_trials: int = 100000,
+        risk_trials_per_task: int = 5000,
+        pareto_max_labels: int = 20000,
+        alternatives_cache_size: int = 1024,
+        pool: Optional[WorkerPool] = None
+    ):
+        self._graph: Optional[nx.DiGraph] = nx.DiGraph()
         self.nodes_data = {}
         self.edges_data = {}
+        self.version = 0
+        self.topology_version = 0
+        self._compiled: Optional[CompiledGraph] = None
+        self.pool = pool or WorkerPool()
+        self.route_index = RouteIndex(max_trees=route_index_size)
+        self.centrality = CentralityCache(epsilon=centrality_epsilon, pool=self.pool)
+        self.resilience = ResilienceEngine(time_budget=resilience_budget, pool=self.pool)
+        self.pareto_max_labels = pareto_max_labels
+        self.alternatives = AlternativePathCache(max_entries=alternatives_cache_size)
+        self.risk = RiskSimulator(pool=self.pool, max_trials=risk_max_trials, trials_per_task=risk_trials_per_task)
+        self.load_report: Optional[Dict[str, Any]] = None
+        # Capacity bottlenecks by node id, maintained from the change feed
+        self.bottlenecks: Dict[str, Dict[str, Any]] = {}
+        
+        # Derived caches follow mutations instead of being rebuilt wholesale
+        self.changes = ChangeFeed()
+        self.changes.subscribe(self.route_index.apply_change, reset=self.route_index.reset)
+        self.changes.subscribe(self.centrality.apply_change, reset=self.centrality.reset)
+        self.changes.subscribe(self._track_bottlenecks, reset=self._rescan_bottlenecks)
+        self.spatial = SpatialIndex(lambda: self.nodes_data.values())
+        self.changes.subscribe(self.spatial.apply_change, reset=self.spatial.reset)
+        self.impact = ImpactEngine(lambda: self.nodes_data)
+        self.changes.subscribe(self.impact.apply_change, reset=self.impact.reset)
+        # (graph version, lower-cased city -> node ids) for region lookups
+        self._cities: Optional[tuple] = None
+        # Background route-tree warming for the last installed network
+        self._warming: Optional[asyncio.Task] = None
+    
+    @property
+    def graph(self) -> nx.DiGraph:
+        """networkx view of the network, materialized on first use after a bulk load"""
+        if self._graph is None:
+            graph = nx.DiGraph()
+            graph.add_nodes_from((node_id, node) for node_id, node in self.nodes_data.items())
+            graph.add_edges_from((edge["source_id"], edge["target_id"], edge) for edge in self.edges_data.values())
+            self._graph = graph
+        return self._graph
+    
+    @property
+    def compiled(self) -> CompiledGraph:
+        """CSR snapshot of the current graph, recompiled when the topology changes"""
+        if self._compiled is None or self._compiled.version != self.topology_version:
+            self._compiled = CompiledGraph.from_networkx(self.graph, self.topology_version)
+            self.route_index.attach(self._compiled)
+        return self._compiled
+    
+    def _bump_version(self, topology: bool = True):
+        """Record that the graph changed so derived structures are rebuilt"""
+        self.version += 1
+        if topology:
+            self.topology_version += 1
+    
+    def add_node(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a node; it takes the next position so cached route trees stay valid"""
+        node = validate_node(data)
+        if node["id"] in self.nodes_data:
+            raise DuplicateEntityError(f"Node '{node['id']}' already exists")
+        
+        compiled = self.compiled
+        self._bump_version()
+        graph = compiled.with_node(self.topology_version, node["id"])
+        self.nodes_data[node["id"]] = node
+        if self._graph is not None:
+            self._graph.add_node(node["id"], **node)
+        self._compiled = graph
+        
+        self.changes.publish(GraphChange("node_added", node["id"], self.version, graph, record=node))
+        return node
+    
+    def update_node(self, node_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Update node attributes in place; the topology is unchanged"""
+        if node_id not in self.nodes_data:
+            raise KeyError(f"Node '{node_id}' not found")
+        if "id" in updates and updates["id"] != node_id:
+            raise ValueError("Cannot change 'id' of an existing node")
+        
+        previous = self.nodes_data[node_id]
+        merged = {**previous, **updates}
+        if isinstance(updates.get("location"), dict):
+            merged["location"] = {**previous.get("location", {}), **updates["location"]}
+        node = validate_node(merged)
+        
+        self.nodes_data[node_id] = node
+        if self._graph is not None:
+            self._graph.nodes[node_id].clear()
+            self._graph.nodes[node_id].update(node)
+        self._bump_version(topology=False)
+        
+        self.changes.publish(GraphChange(
+            "node_updated", node_id, self.version, self.compiled, record=node, before=previous, after=node
+        ))
+        return node
+    
+    def remove_node(self, node_id: str) -> Dict[str, Any]:
+        """Remove a node together with every route into or out of it"""
+        if node_id not in self.nodes_data:
+            raise KeyError(f"Node '{node_id}' not found")
+        
+        compiled = self.compiled
+        position = compiled.node_index[node_id]
+        incident = np.union1d(
+            np.arange(compiled.indptr[position], compiled.indptr[position + 1]),
+            np.flatnonzero(compiled.indices == position)
+        )
+        removed_edges = self._remove_edges(compiled.edge_ids[incident].tolist())
+        
+        compiled = self.compiled
+        node_map = np.arange(compiled.number_of_nodes(), dtype=np.int64)
+        node_map[position + 1:] -= 1
+        node_map[position] = -1
+        
+        self._bump_version()
+        graph = compiled.without_node(self.topology_version, position)
+        node = self.nodes_data.pop(node_id)
+        if self._graph is not None:
+            self._graph.remove_node(node_id)
+        self._compiled = graph
+        
+        self.changes.publish(GraphChange("node_removed", node_id, self.version, graph, record=node, node_map=node_map))
+        return {"node": node, "removed_edges": [edge["id"] for edge in removed_edges]}
+    
+    def add_edge(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a route between existing nodes"""
+        edge = validate_edge(data)
+        edge.setdefault("id", f"{edge['source_id']}->{edge['target_id']}")
+        for key in ("source_id", "target_id"):
+            if edge[key] not in self.nodes_data:
+                raise KeyError(f"Node '{edge[key]}' not found")
+        if edge["id"] in self.edges_data:
+            raise DuplicateEntityError(f"Edge '{edge['id']}' already exists")
+        
+        compiled = self.compiled
+        source = compiled.node_index[edge["source_id"]]
+        target = compiled.node_index[edge["target_id"]]
+        if compiled.edge_position(source, target) >= 0:
+            raise DuplicateEntityError(f"A route from '{edge['source_id']}' to '{edge['target_id']}' already exists")
+        
+        weights = {attr: float(edge[attr]) for attr in EDGE_ATTRIBUTES}
+        self._bump_version()
+        graph = compiled.with_edges(
+            self.topology_version, [source], [target], [edge["id"]], {attr: [value] for attr, value in weights.items()}
+        )
+        self.edges_data[edge["id"]] = edge
+        if self._graph is not None:
+            self._graph.add_edge(edge["source_id"], edge["target_id"], **edge)
+        self._compiled = graph
+        
+        self.changes.publish(GraphChange(
+            "edge_added", edge["id"], self.version, graph, record=edge, source=source, target=target, after=weights
+        ))
+        return edge
+    
+    def update_edge(self, edge_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Update edge attributes, publishing a snapshot with the patched CSR columns"""
+        if edge_id not in self.edges_data:
+            raise KeyError(f"Edge '{edge_id}' not found")
+        
+        edge = self.edges_data[edge_id]
+        for key in ("id", "source_id", "target_id"):
+            if key in updates and updates[key] != edge[key]:
+                raise ValueError(f"Cannot change '{key}' of an existing edge")
+        validated = validate_edge({**edge, **updates})
+        
+        compiled = self.compiled
+        position = compiled.edge_index[edge_id]
+        before = {}
+        after = {}
+        for attr in EDGE_ATTRIBUTES:
+            if attr in updates:
+                before[attr] = float(compiled.weights[attr][position])
+                after[attr] = float(validated[attr])
+        # Copy-on-write: snapshots held by running tasks keep their weights
+        graph = compiled.with_weights([position], {attr: [value] for attr, value in after.items()})
+        self._compiled = graph
+        
+        edge.update(validated)
+        if self._graph is not None:
+            self._graph[edge["source_id"]][edge["target_id"]].update(validated)
+        self._bump_version(topology=False)
+        
+        self.changes.publish(GraphChange(
+            "edge_updated", edge_id, self.version, graph, record=edge,
+            source=graph.node_index[edge["source_id"]], target=graph.node_index[edge["target_id"]],
+            before=before, after=after
+        ))
+        return edge
+    
+    def remove_edge(self, edge_id: str) -> Dict[str, Any]:
+        """Remove a route; node positions are unchanged"""
+        if edge_id not in self.edges_data:
+            raise KeyError(f"Edge '{edge_id}' not found")
+        return self._remove_edges([edge_id])[0]
+    
+    def _remove_edges(self, edge_ids: List[str]) -> List[Dict[str, Any]]:
+        """Drop several routes with one CSR snapshot, publishing a change per route"""
+        if not edge_ids:
+            return []
+        
+        compiled = self.compiled
+        positions = np.array([compiled.edge_index[edge_id] for edge_id in edge_ids])
+        graph = compiled.without_edges(self.topology_version + len(edge_ids), positions)
+        self._compiled = graph
+        
+        removed = []
+        for edge_id, position in zip(edge_ids, positions.tolist()):
+            edge = self.edges_data.pop(edge_id)
+            if self._graph is not None:
+                self._graph.remove_edge(edge["source_id"], edge["target_id"])
+            self._bump_version()
+            self.changes.publish(GraphChange(
+                "edge_removed", edge_id, self.version, graph, record=edge,
+                source=compiled.node_index[edge["source_id"]], target=compiled.node_index[edge["target_id"]],
+                before={attr: float(compiled.weights[attr][position]) for attr in EDGE_ATTRIBUTES}
+            ))
+            removed.append(edge)
+        return removed
+    
+    def _track_bottlenecks(self, change: GraphChange):
+        """Change feed subscriber: re-check only the nodes a change touched"""
+        if change.kind == "network_loaded":
+            self._rescan_bottlenecks(change)
+        elif change.kind in ("node_added", "node_updated"):
+            self._check_bottleneck(change.entity_id, change.record)
+        elif change.kind == "node_removed":
+            self.bottlenecks.pop(change.entity_id, None)
+    
+    def _rescan_bottlenecks(self, change: Optional[GraphChange] = None):
+        """Re-check every node's utilization"""
+        self.bottlenecks = {}
+        for node_id, node in self.nodes_data.items():
+            self._check_bottleneck(node_id, node)
+    
+    def _check_bottleneck(self, node_id: str, node_data: Dict[str, Any]):
+        """Capacity utilization check for one node"""
+        self.bottlenecks.pop(node_id, None)
+        if node_data.get("current_stock") and node_data.get("capacity"):
+            utilization = node_data["current_stock"] / node_data["capacity"]
+            
+            if utilization > 0.9:  # Over 90% capacity
+                self.bottlenecks[node_id] = {
+                    "node_id": node_id,
+                    "name": node_data["name"],
+                    "type": "capacity",
+                    "utilization": round(utilization, 2),
+                    "severity": "high" if utilization > 0.95 else "medium"
+                }
     
     async def load_sample_data(self):
         """Load sample supply chain network data"""
@@ -134,35 +420,78 @@ class GraphService:
             }
         ]
         
-        # Store data
-        for node in nodes:
-            self.nodes_data[node["id"]] = node
-            self.graph.add_node(node["id"], **node)
-            
-        for edge in edges:
-            self.edges_data[edge["id"]] = edge
-            self.graph.add_edge(
-                edge["source_id"], 
-                edge["target_id"], 
-                **edge
-            )
+        self.install_network(network_from_records(nodes, edges))
+    
+    async def load_from_files(self, nodes_path: str, edges_path: str, chunk_size: int = 100000, strict: bool = False):
+        """Bulk load a network from CSV, JSON-lines or Parquet node and edge files"""
+        loaded = read_network(nodes_path, edges_path, chunk_size=chunk_size, strict=strict)
+        self.install_network(loaded)
+        
+        report = loaded.report
+        print(
+            f"✅ Loaded {report['nodes']['loaded']:,} nodes and {report['edges']['loaded']:,} edges "
+            f"in {report['total_seconds']:.2f}s ({report['rows_per_second']:,} rows/s, "
+            f"{report['nodes']['rows_rejected'] + report['edges']['rows_rejected']:,} rejected)"
+        )
+        return report
+    
+    def install_network(self, loaded: LoadedNetwork):
+        """Replace the whole network with a validated, already compiled one"""
+        self.nodes_data = {node["id"]: node for node in loaded.nodes}
+        self.edges_data = {edge["id"]: edge for edge in loaded.edges}
+        # networkx view is rebuilt lazily; the CSR graph is adopted as-is
+        self._graph = None
+        self._bump_version()
+        loaded.compiled.version = self.topology_version
+        self._compiled = loaded.compiled
+        self.load_report = loaded.report
+        self.changes.publish(GraphChange("network_loaded", None, self.version, self._compiled, record=loaded.report))
+        
+        # Precompute route trees from every node that ships somewhere, in the worker pool
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        compiled = self.compiled
+        self._warming = loop.create_task(self._warm_routes(compiled, np.flatnonzero(np.diff(compiled.indptr)).tolist()))
+        self._warming.add_done_callback(_log_warm_failure)
+    
+    async def _warm_routes(self, compiled: CompiledGraph, sources: List[int]):
+        """Build route trees off the event loop and hand them to the index if the graph has not moved on"""
+        weights = tuple(INDEXED_CRITERIA.values())
+        trees = await self.pool.run(
+            build_trees,
+            compiled,
+            self.route_index.warm_sources(sources, weights),
+            weights,
+            self.route_index.warm_batch_size,
+            ROUTE_WARM_BUDGET
+        )
+        self.route_index.adopt(compiled, trees)
     
     async def analyze_network(self, data: Dict) -> Dict[str, Any]:
         """Analyze supply chain network topology and performance"""
         try:
             # Basic network metrics
-            num_nodes = self.graph.number_of_nodes()
-            num_edges = self.graph.number_of_edges()
+            compiled = self.compiled
+            num_nodes = compiled.number_of_nodes()
+            num_edges = compiled.number_of_edges()
             
-            # Calculate centrality measures
-            betweenness = nx.betweenness_centrality(self.graph)
-            closeness = nx.closeness_centrality(self.graph)
+            # Serve the last computed centrality; a newer topology recomputes in the background
+            centrality = await self.centrality.ensure(self.compiled)
+            betweenness = centrality["betweenness"]
+            closeness = centrality["closeness"]
             
             # Identify critical nodes (high betweenness centrality)
-            critical_nodes = sorted(betweenness.items(), key=lambda x: x[1], reverse=True)[:3]
+            critical_nodes = sorted(
+                ((node_id, score) for node_id, score in betweenness.items() if node_id in self.nodes_data),
+                key=lambda x: x[1],
+                reverse=True
+            )[:3]
             
-            # Calculate network resilience
-            resilience_score = self._calculate_resilience()
+            # Calculate network resilience in a worker under a time budget
+            resilience = await self.resilience.evaluate(self.compiled)
+            resilience_score = resilience["score"]
             
             # Identify bottlenecks
             bottlenecks = self._identify_bottlenecks()
@@ -171,24 +500,37 @@ class GraphService:
                 "network_overview": {
                     "total_nodes": num_nodes,
                     "total_edges": num_edges,
-                    "network_density": nx.density(self.graph),
-                    "is_connected": nx.is_weakly_connected(self.graph)
+                    "network_density": num_edges / (num_nodes * (num_nodes - 1)) if num_nodes > 1 else 0,
+                    "is_connected": num_nodes > 0 and connected_components(
+                        compiled.matrix("distance"), directed=True, connection="weak", return_labels=False
+                    ) == 1
                 },
                 "critical_nodes": [
                     {
                         "node_id": node_id,
                         "name": self.nodes_data[node_id]["name"],
                         "centrality_score": score,
+                        "closeness_score": closeness.get(node_id, 0.0),
                         "type": self.nodes_data[node_id]["type"]
                     }
                     for node_id, score in critical_nodes
                 ],
+                "centrality": {
+                    "method": centrality["method"],
+                    "samples": centrality["samples"],
+                    **self.centrality.staleness(centrality, self.topology_version)
+                },
                 "resilience": {
                     "score": resilience_score,
-                    "level": "high" if resilience_score > 0.7 else "medium" if resilience_score > 0.4 else "low"
+                    "level": "high" if resilience_score > 0.7 else "medium" if resilience_score > 0.4 else "low",
+                    "status": resilience["status"],
+                    "single_points_of_failure": resilience.get("articulation_points", []),
+                    "bridge_routes": len(resilience.get("bridges", [])),
+                    "sampled_pairs": resilience.get("sampled_pairs", 0),
+                    "mean_pair_connectivity": resilience.get("mean_pair_connectivity", 0.0)
                 },
                 "bottlenecks": bottlenecks,
-                "recommendations": self._generate_network_recommendations(resilience_score, bottlenecks),
+                "recommendations": self._generate_network_recommendations(resilience, bottlenecks),
                 "analysis_timestamp": datetime.now().isoformat()
             }
             
@@ -199,20 +541,28 @@ class GraphService:
     
     async def find_optimal_routes(self, data: Dict) -> Dict[str, Any]:
         """Find optimal routes between nodes"""
+        weights = normalize_weights(data.get("weights"))
         try:
             source = data.get("source")
             target = data.get("target")
             
+            status = "ok"
             if source and target:
                 # Find shortest path by different criteria
-                paths = self._find_multiple_paths(source, target)
+                paths = await self._find_multiple_paths(source, target)
+                if not paths:
+                    # Every criterion uses the same routes, so either all of them find a path or none do
+                    compiled = self.compiled
+                    known = source in compiled.node_index and target in compiled.node_index
+                    status = "no_path" if known else "unknown_node"
             else:
                 # Find all optimal routes in the network
-                paths = self._find_all_optimal_routes()
+                paths = self._find_all_optimal_routes(weights)
             
             return {
+                "status": status,
                 "optimal_routes": paths,
-                "criteria": ["shortest_distance", "lowest_cost", "fastest_time", "lowest_risk"],
+                "criteria": list(ALTERNATIVE_CRITERIA),
                 "total_routes_analyzed": len(paths),
                 "optimization_timestamp": datetime.now().isoformat()
             }
@@ -220,52 +570,237 @@ class GraphService:
         except Exception as e:
             raise Exception(f"Route optimization failed: {str(e)}")
     
-    def _calculate_resilience(self) -> float:
-        """Calculate network resilience score"""
-        try:
-            # Simple resilience calculation based on connectivity and redundancy
-            connectivity = nx.average_node_connectivity(self.graph.to_undirected())
-            redundancy = len(list(nx.edge_disjoint_paths(self.graph.to_undirected(), 
-                                                        list(self.graph.nodes())[0], 
-                                                        list(self.graph.nodes())[-1])))
-            
-            # Normalize to 0-1 scale
-            resilience = min(1.0, (connectivity + redundancy) / 5.0)
-            return round(resilience, 2)
-        except:
-            return 0.5  # Default moderate resilience
+    async def find_pareto_routes(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Pareto-optimal source-target paths over distance, cost, duration and risk, ranked by caller weights"""
+        compiled = self.compiled
+        source, target = data.get("source"), data.get("target")
+        if not source or not target:
+            raise ValueError("source and target are required")
+        for node_id in (source, target):
+            if node_id not in compiled.node_index:
+                raise KeyError(f"Node '{node_id}' not found")
+        if source == target:
+            raise ValueError("source and target must differ")
+        
+        weights = normalize_weights(data.get("weights"))
+        limits = path_limits(data.get("constraints"))
+        epsilon = float(data.get("epsilon", 0.0))
+        if not 0 <= epsilon <= 1:
+            raise ValueError("epsilon must be between 0 and 1")
+        limit = int(data.get("limit", 20))
+        if not 1 <= limit <= 1000:
+            raise ValueError("limit must be between 1 and 1000")
+        
+        result = await self.pool.run(
+            compute_pareto_routes, compiled, compiled.node_index[source], compiled.node_index[target],
+            weights, limits, epsilon, self.pareto_max_labels, limit
+        )
+        return {**result, "graph_version": self.version}
+    
+    async def find_alternative_paths(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Top-k loopless paths and maximally disjoint backups per criterion, cached per graph version"""
+        compiled = self.compiled
+        version = self.version
+        source, target = data.get("source"), data.get("target")
+        if not source or not target:
+            raise ValueError("source and target are required")
+        for node_id in (source, target):
+            if node_id not in compiled.node_index:
+                raise KeyError(f"Node '{node_id}' not found")
+        if source == target:
+            raise ValueError("source and target must differ")
+        
+        criteria = data.get("criteria") or list(ALTERNATIVE_CRITERIA)
+        if isinstance(criteria, str):
+            criteria = [criteria]
+        unknown = [criterion for criterion in criteria if criterion not in ALTERNATIVE_CRITERIA]
+        if unknown:
+            raise ValueError(f"Unknown criteria {unknown}, expected {list(ALTERNATIVE_CRITERIA)}")
+        k = int(data.get("k", 3))
+        if not 1 <= k <= MAX_ALTERNATIVE_PATHS:
+            raise ValueError(f"k must be between 1 and {MAX_ALTERNATIVE_PATHS}")
+        backups = int(data.get("backups", 2))
+        if not 0 <= backups <= MAX_BACKUP_PATHS:
+            raise ValueError(f"backups must be between 0 and {MAX_BACKUP_PATHS}")
+        disjoint = data.get("disjoint", "edge")
+        if disjoint not in DISJOINT_MODES:
+            raise ValueError(f"disjoint must be one of {list(DISJOINT_MODES)}")
+        
+        results = {}
+        for criterion in criteria:
+            cached = self.alternatives.get(version, (source, target, criterion, disjoint), k, backups)
+            if cached is not None:
+                results[criterion] = {**cached, "cached": True}
+        missing = [criterion for criterion in criteria if criterion not in results]
+        computed = await asyncio.gather(*(
+            self.pool.run(
+                compute_alternative_paths, compiled, compiled.node_index[source], compiled.node_index[target],
+                criterion, k, backups, disjoint
+            )
+            for criterion in missing
+        ))
+        for criterion, result in zip(missing, computed):
+            # A mutation while the workers ran makes the result stale for the cache, not for this caller
+            if self.version == version:
+                self.alternatives.put(version, (source, target, criterion, disjoint), k, backups, result)
+            results[criterion] = {**result, "cached": False}
+        
+        return {
+            "source": source,
+            "target": target,
+            "disjoint": disjoint,
+            "alternatives": [results[criterion] for criterion in criteria],
+            "graph_version": version
+        }
+    
+    async def simulate_route_risk(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Monte Carlo lead time distributions and unreachability per source-target pair"""
+        compiled = self.compiled
+        if data.get("pairs") is not None:
+            names = [(pair.get("source"), pair.get("target")) for pair in data["pairs"]]
+        elif data.get("source") and data.get("target"):
+            names = [(data["source"], data["target"])]
+        else:
+            names = self._supply_pairs(compiled)
+        if not names:
+            raise ValueError("No source-target pairs to simulate")
+        if len(names) > MAX_RISK_PAIRS:
+            raise ValueError(f"At most {MAX_RISK_PAIRS} pairs can be simulated at once")
+        for name in (node_id for pair in names for node_id in pair):
+            if name not in compiled.node_index:
+                raise KeyError(f"Node '{name}' not found")
+        
+        pairs = [(compiled.node_index[source], compiled.node_index[target]) for source, target in names]
+        result = await self.risk.simulate(
+            compiled,
+            pairs,
+            trials=int(data.get("trials", 10000)),
+            seed=data.get("seed"),
+            delay_scale=float(data.get("delay_scale", 1.0))
+        )
+        return {**result, "graph_version": self.version}
+    
+    def _supply_pairs(self, compiled: CompiledGraph) -> List[tuple]:
+        """Every connected supplier-store pair, up to the pair limit"""
+        suppliers = [node_id for node_id, node in self.nodes_data.items() if node.get("type") == "supplier"]
+        stores = [node_id for node_id, node in self.nodes_data.items() if node.get("type") == "store"]
+        if not suppliers or not stores:
+            return []
+        reached = np.isfinite(dijkstra(
+            compiled.matrix("duration"), directed=True, unweighted=True,
+            indices=[compiled.node_index[node_id] for node_id in suppliers]
+        ))
+        store_positions = [compiled.node_index[node_id] for node_id in stores]
+        return [
+            (supplier, store)
+            for row, supplier in enumerate(suppliers)
+            for store, position in zip(stores, store_positions)
+            if reached[row, position]
+        ][:MAX_RISK_PAIRS]
+    
+    def nearest_nodes(self, lat: float, lng: float, k: int = 5, node_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The ``k`` nodes closest to a point by great-circle distance"""
+        if not 1 <= k <= 1000:
+            raise ValueError("k must be between 1 and 1000")
+        return [
+            {**self.nodes_data[node_id], "distance_km": round(distance, 3)}
+            for node_id, distance in self.spatial.nearest(lat, lng, k, node_type)
+        ]
+    
+    def nodes_within(self, lat: float, lng: float, radius_km: float, node_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Nodes within ``radius_km`` of a point, nearest first"""
+        return [
+            {**self.nodes_data[node_id], "distance_km": round(distance, 3)}
+            for node_id, distance in self.spatial.within(lat, lng, radius_km, node_type)
+        ]
+    
+    def nodes_in_bbox(
+        self,
+        min_lat: float,
+        min_lng: float,
+        max_lat: float,
+        max_lng: float,
+        node_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Nodes inside a map viewport"""
+        return [self.nodes_data[node_id] for node_id in self.spatial.in_bbox(min_lat, min_lng, max_lat, max_lng, node_type)]
+    
+    async def disruption_impact(self, disruption: Dict[str, Any]) -> Dict[str, Any]:
+        """Downstream reach, rerouted store supply paths and cost/time deltas for a disruption or prediction"""
+        edge_ids, node_ids, unmatched = self._disrupted_elements(disruption)
+        version = self.version
+        # Forest builds and reroutes run in a thread; the engine's state never leaves this process
+        impact = await asyncio.to_thread(self.impact.assess, self.compiled, edge_ids, node_ids)
+        return {**impact, "unmatched": unmatched, "graph_version": version}
+    
+    def _disrupted_elements(self, disruption: Dict[str, Any]) -> tuple:
+        """Join a disruption's routes, nodes, regions and location to graph edges and nodes"""
+        edge_ids = set()
+        node_ids = set()
+        unmatched = []
+        
+        for name in disruption.get("affected_routes") or []:
+            if name in self.edges_data:
+                edge_ids.add(name)
+            elif name in self.nodes_data:
+                node_ids.add(name)
+            else:
+                unmatched.append(name)
+        for name in disruption.get("affected_nodes") or []:
+            if name in self.nodes_data:
+                node_ids.add(name)
+            else:
+                unmatched.append(name)
+        for region in disruption.get("affected_regions") or []:
+            matches = self._nodes_in_city(region)
+            if matches:
+                node_ids.update(matches)
+            elif region in self.nodes_data:
+                node_ids.add(region)
+            else:
+                unmatched.append(region)
+        
+        location = disruption.get("location")
+        if isinstance(location, dict) and "radius_km" in location:
+            try:
+                lat, lng, radius_km = float(location["lat"]), float(location["lng"]), float(location["radius_km"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("location needs numeric lat, lng and radius_km")
+            node_ids.update(node_id for node_id, _ in self.spatial.within(lat, lng, radius_km))
+        
+        return sorted(edge_ids), sorted(node_ids), unmatched
+    
+    def _nodes_in_city(self, city: str) -> List[str]:
+        """Node ids in a city (case-insensitive), from an index rebuilt once per graph version"""
+        if self._cities is None or self._cities[0] != self.version:
+            cities: Dict[str, List[str]] = {}
+            for node_id, node in self.nodes_data.items():
+                name = (node.get("location") or {}).get("city")
+                if name:
+                    cities.setdefault(str(name).lower(), []).append(node_id)
+            self._cities = (self.version, cities)
+        return self._cities[1].get(str(city).lower(), [])
     
     def _identify_bottlenecks(self) -> List[Dict[str, Any]]:
         """Identify potential bottlenecks in the network"""
-        bottlenecks = []
-        
-        for node_id, node_data in self.nodes_data.items():
-            # Check capacity utilization
-            if node_data.get("current_stock") and node_data.get("capacity"):
-                utilization = node_data["current_stock"] / node_data["capacity"]
-                
-                if utilization > 0.9:  # Over 90% capacity
-                    bottlenecks.append({
-                        "node_id": node_id,
-                        "name": node_data["name"],
-                        "type": "capacity",
-                        "utilization": round(utilization, 2),
-                        "severity": "high" if utilization > 0.95 else "medium"
-                    })
-        
-        return bottlenecks
+        return list(self.bottlenecks.values())
     
-    def _generate_network_recommendations(self, resilience: float, bottlenecks: List) -> List[str]:
+    def _generate_network_recommendations(self, resilience: Dict[str, Any], bottlenecks: List) -> List[str]:
         """Generate recommendations based on network analysis"""
         recommendations = []
         
-        if resilience < 0.5:
+        if resilience["score"] < 0.5:
             recommendations.append("Consider adding redundant routes to improve network resilience")
+        
+        single_points = resilience.get("articulation_points", [])
+        if single_points:
+            names = [self.nodes_data[node_id]["name"] for node_id in single_points[:3] if node_id in self.nodes_data]
+            recommendations.append(f"Add alternative routes around single points of failure: {', '.join(names)}")
             
         if len(bottlenecks) > 0:
             recommendations.append("Address capacity constraints at identified bottleneck nodes")
             
-        if len(self.graph.nodes()) < 5:
+        if len(self.nodes_data) < 5:
             recommendations.append("Expand network with additional suppliers or distribution centers")
             
         recommendations.append("Implement real-time monitoring for critical network nodes")
@@ -273,40 +808,48 @@ class GraphService:
         
         return recommendations
     
-    def _find_multiple_paths(self, source: str, target: str) -> List[Dict[str, Any]]:
-        """Find multiple optimal paths between two nodes"""
+    async def _find_multiple_paths(self, source: str, target: str) -> List[Dict[str, Any]]:
+        """Find multiple optimal paths between two nodes from the route index"""
+        compiled = self.compiled
+        if source not in compiled.node_index or target not in compiled.node_index:
+            return []
+        
+        source_idx = compiled.node_index[source]
+        target_idx = compiled.node_index[target]
+        
+        # Cached trees are walked on the loop; missing ones are built in the worker pool
+        trees = {weight: self.route_index.lookup(source_idx, weight) for weight in INDEXED_CRITERIA.values()}
+        missing = [weight for weight, tree in trees.items() if tree is None]
+        if missing:
+            built = await self.pool.run(build_trees, compiled, [source_idx], missing, 1)
+            self.route_index.adopt(compiled, built)
+            trees.update({weight: (distances, predecessors) for weight, _, distances, predecessors in built})
+        
         paths = []
+        for optimization_type, weight in INDEXED_CRITERIA.items():
+            path = walk_predecessors(trees[weight][1], source_idx, target_idx)
+            if path is None:
+                return []
+            paths.append(self._calculate_path_metrics(compiled, [compiled.node_ids[i] for i in path], optimization_type))
         
-        try:
-            # Shortest path by distance
-            shortest_path = nx.shortest_path(self.graph, source, target, weight='distance')
-            paths.append(self._calculate_path_metrics(shortest_path, "shortest_distance"))
-            
-            # Lowest cost path
-            cost_path = nx.shortest_path(self.graph, source, target, weight='cost')
-            paths.append(self._calculate_path_metrics(cost_path, "lowest_cost"))
-            
-            # Fastest path
-            time_path = nx.shortest_path(self.graph, source, target, weight='duration')
-            paths.append(self._calculate_path_metrics(time_path, "fastest_time"))
-            
-        except nx.NetworkXNoPath:
-            pass
-            
         return paths
     
-    def _find_all_optimal_routes(self) -> List[Dict[str, Any]]:
-        """Find optimal routes for all node pairs"""
-        routes = []
+    def _find_all_optimal_routes(self, weights: Dict[str, float] = ROUTE_SCORE_WEIGHTS, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top routes by composite score, computed for every edge at once on the CSR weight columns"""
+        compiled = self.compiled
+        scores = compiled.route_scores(weights)
         
-        for edge_id, edge_data in self.edges_data.items():
-            route_score = self._calculate_route_score(edge_data)
-            
+        # Stable descending order keeps ties in edge order, like list.sort
+        top = np.argsort(-scores, kind="stable")[:limit]
+        
+        routes = []
+        for position in top.tolist():
+            edge_data = self.edges_data[compiled.edge_ids[position]]
             routes.append({
-                "route_id": edge_id,
+                "route_id": edge_data["id"],
                 "source": edge_data["source_id"],
                 "target": edge_data["target_id"],
-                "score": route_score,
+                "score": float(scores[position]),
                 "metrics": {
                     "distance": edge_data["distance"],
                     "cost": edge_data["cost"],
@@ -316,48 +859,36 @@ class GraphService:
                 "route_type": edge_data["route_type"]
             })
         
-        # Sort by score
-        routes.sort(key=lambda x: x["score"], reverse=True)
-        return routes[:10]  # Top 10 routes
+        return routes
     
-    def _calculate_path_metrics(self, path: List[str], optimization_type: str) -> Dict[str, Any]:
-        """Calculate metrics for a given path"""
-        total_distance = 0
-        total_cost = 0
-        total_duration = 0
-        total_risk = 0
-        
-        for i in range(len(path) - 1):
-            edge_data = self.graph[path[i]][path[i+1]]
-            total_distance += edge_data.get("distance", 0)
-            total_cost += edge_data.get("cost", 0)
-            total_duration += edge_data.get("duration", 0)
-            total_risk += edge_data.get("risk_score", 0)
+    def _calculate_path_metrics(self, compiled: CompiledGraph, path: List[str], optimization_type: str) -> Dict[str, Any]:
+        """Calculate metrics for a given path from the snapshot's CSR weight columns"""
+        positions = compiled.path_positions([compiled.node_index[node_id] for node_id in path])
+        hops = max(1, len(path) - 1)
         
         return {
             "path": path,
             "optimization_type": optimization_type,
             "metrics": {
-                "total_distance": total_distance,
-                "total_cost": total_cost,
-                "total_duration": total_duration,
-                "average_risk": round(total_risk / max(1, len(path) - 1), 2)
+                "total_distance": _as_number(compiled.weights["distance"][positions].sum()),
+                "total_cost": _as_number(compiled.weights["cost"][positions].sum()),
+                "total_duration": _as_number(compiled.weights["duration"][positions].sum()),
+                "average_risk": round(float(compiled.weights["risk_score"][positions].sum()) / hops, 2),
+                # Chance that at least one leg fails, treating leg risks as independent
+                "failure_probability": round(1 - float(np.prod(1 - np.clip(compiled.weights["risk_score"][positions], 0, 1))), 4)
             }
         }
     
-    def _calculate_route_score(self, edge_data: Dict) -> float:
-        """Calculate a composite score for route optimization"""
-        # Normalize metrics (lower is better for cost, duration, risk; higher for efficiency)
-        distance_score = 1 / (1 + edge_data["distance"] / 1000)  # Normalize by 1000km
-        cost_score = 1 / (1 + edge_data["cost"] / 1000)  # Normalize by $1000
-        time_score = 1 / (1 + edge_data["duration"] / 24)  # Normalize by 24 hours
-        risk_score = 1 - edge_data["risk_score"]  # Invert risk (lower risk = higher score)
-        
-        # Weighted average
-        composite_score = (distance_score * 0.2 + cost_score * 0.3 + time_score * 0.3 + risk_score * 0.2)
-        
-        return round(composite_score, 3)
-    
     async def optimize_routes(self, data: Dict) -> Dict[str, Any]:
         """Real-time route optimization"""
-        return await self.find_optimal_routes(data)
\ No newline at end of file
+        return await self.find_optimal_routes(data)
+
+def _log_warm_failure(task: asyncio.Task):
+    """Surface background warming errors; the trees still fill in on demand"""
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Route index warming failed: {task.exception()}")
+
+def _as_number(value: float):
+    """Return integral floats as ints, matching how whole-number attributes were loaded"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
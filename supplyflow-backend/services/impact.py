@@ -0,0 +1,388 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict, deque
+import threading
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from services.graph_engine import CompiledGraph, _expand
+from services.change_feed import GraphChange
+from services.route_index import ROUTE_CRITERIA
+
+# Node types where supply paths start and end
+SUPPLY_NODE_TYPE = "supplier"
+DEMAND_NODE_TYPE = "store"
+
+# Path totals reported per store, and the criterion whose reroute prices each delta
+PATH_METRICS = ("distance", "cost", "duration")
+DELTA_CRITERIA = {"distance": "shortest_distance", "cost": "lowest_cost", "duration": "fastest_time"}
+
+# Changes queued between assessments before replaying them stops paying off
+MAX_PENDING_CHANGES = 1024
+
+class SupplyForest:
+    """Shortest-path forest rooted at every supplier for one edge weight
+
+    Children are stored CSR-style by parent, which makes the forest its own
+    reverse index: the supply paths that depend on a route or node are
+    exactly the ones ending in the subtree below it.
+    """
+
+    def __init__(self, graph: CompiledGraph, weight: str, suppliers: np.ndarray):
+        self.weight = weight
+        n = graph.number_of_nodes()
+        if len(suppliers):
+            distances, predecessors, _ = dijkstra(
+                graph.matrix(weight), directed=True, indices=suppliers, min_only=True, return_predecessors=True
+            )
+        else:
+            distances, predecessors = np.full(n, np.inf), np.full(n, -9999)
+        self.distances = distances
+        self.predecessors = predecessors.astype(np.int32)
+
+        children = np.flatnonzero(self.predecessors >= 0)
+        parents = self.predecessors[children]
+        self.children = children[np.argsort(parents, kind="stable")].astype(np.int64)
+        self.child_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(parents, minlength=n), out=self.child_ptr[1:])
+
+    def heads(self, sources: np.ndarray, targets: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """Forest nodes cut off by removing the given edges and nodes"""
+        on_tree = self.predecessors[targets] == sources
+        supplied = nodes[np.isfinite(self.distances[nodes])]
+        return np.unique(np.concatenate([targets[on_tree], supplied]).astype(np.int64))
+
+    def subtree(self, heads: np.ndarray) -> np.ndarray:
+        """Every node whose supply path passes through one of ``heads``, heads included"""
+        levels = []
+        frontier = heads
+        # One head may sit inside another's subtree
+        seen = np.zeros(self.child_ptr.shape[0] - 1, dtype=bool)
+        while frontier.size:
+            frontier = frontier[~seen[frontier]]
+            seen[frontier] = True
+            levels.append(frontier)
+            _, frontier = _expand(frontier, self.child_ptr, self.children)
+        return np.concatenate(levels) if levels else np.empty(0, dtype=np.int64)
+
+    def stale_after(self, source: int, target: int, old: float, new: float) -> bool:
+        """Whether an edge weight change can alter the forest"""
+        if old == new:
+            return False
+        if self.predecessors[target] == source:
+            return True
+        return new < old and self.distances[source] + new < self.distances[target]
+
+    def reroute(
+        self,
+        graph: CompiledGraph,
+        sources: np.ndarray,
+        affected: np.ndarray,
+        usable: np.ndarray,
+        roots: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Distances and predecessors with ``affected`` cut loose and re-solved on its own
+
+        Removing edges and nodes can only lengthen paths, so nodes outside
+        the affected subtrees keep their settled distances; the affected
+        region is solved from a virtual root whose edges enter it at those
+        distances (or at zero for live suppliers inside it).
+        """
+        n = graph.number_of_nodes()
+        local = np.full(n, -1, dtype=np.int64)
+        local[affected] = np.arange(1, len(affected) + 1)
+        weights = graph.weights[self.weight]
+
+        positions = np.flatnonzero(usable & (local[graph.indices] > 0))
+        edge_from = sources[positions]
+        edge_to = graph.indices[positions]
+        internal = local[edge_from] > 0
+        entering = ~internal & np.isfinite(self.distances[edge_from])
+
+        # Cheapest way into each affected node from the settled part of the forest
+        entry_nodes = np.concatenate([edge_to[entering], roots])
+        entry_costs = np.concatenate([self.distances[edge_from[entering]] + weights[positions[entering]], np.zeros(len(roots))])
+        entry_from = np.concatenate([edge_from[entering], np.full(len(roots), -9999)])
+        order = np.lexsort((entry_costs, entry_nodes))
+        entry_nodes, entry_costs, entry_from = entry_nodes[order], entry_costs[order], entry_from[order]
+        first = np.ones(len(entry_nodes), dtype=bool)
+        first[1:] = entry_nodes[1:] != entry_nodes[:-1]
+        entry_nodes, entry_costs, entry_from = entry_nodes[first], entry_costs[first], entry_from[first]
+
+        size = len(affected) + 1
+        region = csr_matrix(
+            (
+                np.concatenate([entry_costs, weights[positions[internal]]]),
+                (
+                    np.concatenate([np.zeros(len(entry_nodes), dtype=np.int64), local[edge_from[internal]]]),
+                    np.concatenate([local[entry_nodes], local[edge_to[internal]]])
+                )
+            ),
+            shape=(size, size)
+        )
+        region_distances, region_predecessors = dijkstra(region, directed=True, indices=0, return_predecessors=True)
+
+        entered_from = np.full(size, -9999, dtype=np.int64)
+        entered_from[local[entry_nodes]] = entry_from
+        region_predecessors = region_predecessors[1:]
+        new_predecessors = np.where(
+            region_predecessors == 0,
+            entered_from[1:],
+            np.where(region_predecessors > 0, affected[np.maximum(region_predecessors, 1) - 1], -9999)
+        )
+
+        distances = self.distances.copy()
+        predecessors = self.predecessors.copy()
+        distances[affected] = region_distances[1:]
+        predecessors[affected] = new_predecessors
+        return distances, predecessors
+
+class ImpactEngine:
+    """Downstream impact of disrupted routes and nodes on store supply
+
+    Keeps one supplier-rooted shortest-path forest per route criterion. A
+    disruption only touches the stores below the disrupted elements in
+    those forests, and only that region is re-solved, so an assessment
+    costs in proportion to its impact rather than to the whole network.
+
+    Assessments run off the event loop, one at a time. Graph changes are
+    queued on the loop and applied by the next assessment before it looks
+    at any cached forest or result.
+    """
+
+    def __init__(self, nodes: Callable[[], Dict[str, Dict[str, Any]]], max_results: int = 256):
+        self._nodes = nodes
+        self.max_results = max_results
+        self._graph: Optional[CompiledGraph] = None
+        self._edge_sources: Optional[np.ndarray] = None
+        self._suppliers: Optional[np.ndarray] = None
+        self._stores: Optional[np.ndarray] = None
+        self._types: Optional[np.ndarray] = None
+        self._forests: Dict[str, SupplyForest] = {}
+        # (edge ids, node ids) -> assessment, least recently used first
+        self._results: "OrderedDict[Tuple[frozenset, frozenset], Dict[str, Any]]" = OrderedDict()
+        # (handler, change) pairs published since the last assessment
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+        self.misses = 0
+
+    def apply_change(self, change: GraphChange):
+        """Change feed subscriber: queue the change for the next assessment"""
+        if len(self._pending) >= MAX_PENDING_CHANGES:
+            # Too far behind to be worth replaying; the next assessment starts over
+            self._pending.clear()
+            self._pending.append((self._reset, change))
+        else:
+            self._pending.append((self._apply, change))
+
+    def reset(self, change: GraphChange):
+        """Drop cached assessments and forests; they are rebuilt on the next assessment"""
+        self._pending.append((self._reset, change))
+
+    def _apply(self, change: GraphChange):
+        """Keep every forest the change cannot affect"""
+        self._results.clear()
+        if change.kind == "edge_updated":
+            for weight, new in change.after.items():
+                forest = self._forests.get(weight)
+                if forest is not None and forest.stale_after(change.source, change.target, change.before[weight], new):
+                    del self._forests[weight]
+            # Same topology in a new snapshot: node roles and surviving forests still hold
+            if self._graph is not None:
+                self._graph = change.graph
+        elif change.kind == "node_updated":
+            # Only a type change moves where supply paths start or end
+            if change.before.get("type") != change.after.get("type"):
+                self._graph = None
+        else:
+            self._graph = None
+
+    def _reset(self, change: GraphChange):
+        self._results.clear()
+        self._graph = None
+
+    def assess(self, graph: CompiledGraph, edge_ids: Sequence[str], node_ids: Sequence[str]) -> Dict[str, Any]:
+        """Downstream reach, rerouted supply paths and per-store deltas for disrupted routes and nodes
+
+        Safe to call from a worker thread while changes keep arriving.
+        """
+        for edge_id in edge_ids:
+            if edge_id not in graph.edge_index:
+                raise KeyError(f"Edge '{edge_id}' not found")
+        for node_id in node_ids:
+            if node_id not in graph.node_index:
+                raise KeyError(f"Node '{node_id}' not found")
+
+        with self._lock:
+            while self._pending:
+                handler, change = self._pending.popleft()
+                handler(change)
+            return self._assess(graph, edge_ids, node_ids)
+
+    def _assess(self, graph: CompiledGraph, edge_ids: Sequence[str], node_ids: Sequence[str]) -> Dict[str, Any]:
+        self._attach(graph)
+        key = (frozenset(edge_ids), frozenset(node_ids))
+        result = self._results.get(key)
+        if result is not None:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return result
+
+        self.misses += 1
+        started = time.perf_counter()
+        dead_edges = np.array(sorted(graph.edge_index[edge_id] for edge_id in key[0]), dtype=np.int64)
+        dead_nodes = np.array(sorted(graph.node_index[node_id] for node_id in key[1]), dtype=np.int64)
+        cut_from = self._edge_sources[dead_edges]
+        cut_to = graph.indices[dead_edges].astype(np.int64)
+
+        usable = None
+        baseline: Dict[str, SupplyForest] = {}
+        rerouted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        affected_stores = np.empty(0, dtype=np.int64)
+        for weight in set(ROUTE_CRITERIA.values()):
+            forest = self._forest(weight)
+            baseline[weight] = forest
+            heads = forest.heads(cut_from, cut_to, dead_nodes)
+            if not heads.size:
+                continue
+            if usable is None:
+                usable = self._usable(graph, dead_edges, dead_nodes)
+            affected = forest.subtree(heads)
+            roots = affected[self._suppliers[affected] & ~np.isin(affected, dead_nodes)]
+            rerouted[weight] = forest.reroute(graph, self._edge_sources, affected, usable, roots)
+            affected_stores = np.union1d(affected_stores, affected[self._stores[affected]])
+
+        stores = [self._store_impact(graph, int(store), baseline, rerouted) for store in affected_stores.tolist()]
+        # Cut-off stores first, then the costliest reroutes
+        stores.sort(key=lambda s: (s["status"] != "unreachable", -(s["cost_delta"] or 0), s["store_id"]))
+        unreachable = sum(1 for s in stores if s["status"] == "unreachable")
+
+        result = {
+            "disrupted": {"edges": sorted(key[0]), "nodes": sorted(key[1])},
+            "downstream": self._downstream(graph, cut_to, dead_nodes),
+            "affected_stores": stores,
+            "summary": {
+                "affected_stores": len(stores),
+                "unreachable_stores": unreachable,
+                "rerouted_stores": len(stores) - unreachable,
+                "total_cost_delta": round(sum(s["cost_delta"] or 0 for s in stores), 2),
+                "max_duration_delta": max((s["duration_delta"] or 0 for s in stores), default=0)
+            },
+            "compute_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+        self._results[key] = result
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "forests": len(self._forests),
+            "pending_changes": len(self._pending),
+            "builds": self.builds,
+            "cached_results": len(self._results),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _attach(self, graph: CompiledGraph):
+        """Point the engine at a compiled graph, resetting node roles and forests if it is new"""
+        if self._graph is graph:
+            return
+        # Results for another snapshot, e.g. one a slower caller captured before a change, no longer hold
+        self._results.clear()
+        nodes = self._nodes()
+        types = np.array([nodes.get(node_id, {}).get("type") or "unknown" for node_id in graph.node_ids], dtype=object)
+        self._graph = graph
+        self._types = types
+        self._edge_sources = graph.edge_sources().astype(np.int64)
+        self._suppliers = types == SUPPLY_NODE_TYPE
+        self._stores = types == DEMAND_NODE_TYPE
+        self._forests = {}
+
+    def _forest(self, weight: str) -> SupplyForest:
+        forest = self._forests.get(weight)
+        if forest is None:
+            forest = SupplyForest(self._graph, weight, np.flatnonzero(self._suppliers))
+            self._forests[weight] = forest
+            self.builds += 1
+        return forest
+
+    def _usable(self, graph: CompiledGraph, dead_edges: np.ndarray, dead_nodes: np.ndarray) -> np.ndarray:
+        """Edges that survive the disruption"""
+        dead = np.zeros(graph.number_of_nodes(), dtype=bool)
+        dead[dead_nodes] = True
+        usable = ~(dead[self._edge_sources] | dead[graph.indices])
+        usable[dead_edges] = False
+        return usable
+
+    def _downstream(self, graph: CompiledGraph, cut_to: np.ndarray, dead_nodes: np.ndarray) -> Dict[str, Any]:
+        """Nodes reachable from the disrupted routes and nodes"""
+        starts = np.union1d(cut_to, dead_nodes)
+        if not starts.size:
+            return {"count": 0, "by_type": {}, "nodes": []}
+        hops = dijkstra(graph.matrix("distance"), directed=True, indices=starts, unweighted=True, min_only=True)
+        reached = np.isfinite(hops)
+        reached[dead_nodes] = False
+        positions = np.flatnonzero(reached)
+        types, counts = np.unique(self._types[positions].astype(str), return_counts=True)
+        return {
+            "count": len(positions),
+            "by_type": dict(zip(types.tolist(), counts.tolist())),
+            "nodes": [graph.node_ids[i] for i in positions.tolist()]
+        }
+
+    def _store_impact(
+        self,
+        graph: CompiledGraph,
+        store: int,
+        baseline: Dict[str, SupplyForest],
+        rerouted: Dict[str, Tuple[np.ndarray, np.ndarray]]
+    ) -> Dict[str, Any]:
+        """Baseline and rerouted supply path of one store under every criterion"""
+        criteria = {}
+        for criterion, weight in ROUTE_CRITERIA.items():
+            forest = baseline[weight]
+            before = _supply_path(forest.predecessors, forest.distances, store)
+            after = before
+            if weight in rerouted:
+                after = _supply_path(rerouted[weight][1], rerouted[weight][0], store)
+            criteria[criterion] = {
+                "baseline_path": [graph.node_ids[i] for i in before],
+                "rerouted_path": [graph.node_ids[i] for i in after] if after is not None else None,
+                "baseline": _path_totals(graph, before),
+                "rerouted": _path_totals(graph, after) if after is not None else None
+            }
+
+        deltas = {}
+        for metric, criterion in DELTA_CRITERIA.items():
+            route = criteria[criterion]
+            deltas[f"{metric}_delta"] = (
+                round(route["rerouted"][metric] - route["baseline"][metric], 4) if route["rerouted"] is not None else None
+            )
+
+        return {
+            "store_id": graph.node_ids[store],
+            "name": self._nodes().get(graph.node_ids[store], {}).get("name"),
+            # Reachability does not depend on the criterion, so any one decides it
+            "status": "unreachable" if deltas["cost_delta"] is None else "rerouted",
+            **deltas,
+            "criteria": criteria
+        }
+
+def _supply_path(predecessors: np.ndarray, distances: np.ndarray, node: int) -> Optional[List[int]]:
+    """Path from the supplier a node is served by, or None when no supplier reaches it"""
+    if not np.isfinite(distances[node]):
+        return None
+    path = [node]
+    while predecessors[path[-1]] >= 0:
+        path.append(int(predecessors[path[-1]]))
+    path.reverse()
+    return path
+
+def _path_totals(graph: CompiledGraph, path: List[int]) -> Dict[str, float]:
+    positions = graph.path_positions(path)
+    return {metric: round(float(graph.weights[metric][positions].sum()), 4) for metric in PATH_METRICS}
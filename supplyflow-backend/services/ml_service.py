@@ -1,17 +1,178 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from abc import ABC, abstractmethod
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+import asyncio
+import copy
+import hashlib
+import math
 import random
-import json
+from sklearn.ensemble import GradientBoostingRegressor
+
+from services.executor import WorkerPool
+from services.demand_store import DemandStore, to_store_dates
+from services.serialization import dumps_str
+
+# Sample series dimensions
+SAMPLE_REGIONS = ["north_america", "europe", "asia"]
+SAMPLE_CATEGORIES = ["electronics", "automotive", "consumer_goods"]
+
+# Days used to estimate the level and trend of a series
+FORECAST_WINDOW = 30
+
+SECONDS_PER_DAY = 86400
+
+# Batch forecasting limits
+MAX_BATCH_SERIES = 10000
+MAX_FORECAST_DAYS = 730
+
+# Most series fitted in one worker task; gradient boosting takes ~0.35 s per
+# year-long series, so a chunk stays well inside the default task timeout
+FIT_CHUNK_SERIES = 16
+
+# Largest number of observations accepted by one record_demand call
+MAX_DEMAND_RECORDS = 100000
+
+# Simulated live disruptions and the range their probability moves in
+MONITORED_DISRUPTIONS = (
+    ({"id": "live_1", "type": "weather", "severity": "medium", "status": "monitoring"}, (0.4, 0.8)),
+    ({"id": "live_2", "type": "port_congestion", "severity": "low", "status": "active"}, (0.2, 0.5))
+)
+
+# Chance that a monitored disruption's reading moves between two polls
+MONITOR_CHANGE_PROBABILITY = 0.2
+
+class DemandHistory:
+    """Snapshot of the demand store with per-(region, product_category) series mapped lazily
+    
+    The snapshot pins each partition's row count and generation when it is
+    taken, so later appends are invisible to it. Raw columns are read-only
+    views over the memory-mapped files. Models see each series resampled to
+    one value per calendar day, from its first observation to the last day
+    in the snapshot.
+    """
+    
+    def __init__(self, store: Optional[DemandStore] = None):
+        self.store = store
+        self.version = store.version if store is not None else 0
+        self._partitions = store.partitions() if store is not None else {}
+        self._series: Dict[tuple, tuple] = {}
+        self._daily: Dict[tuple, np.ndarray] = {}
+        self._all: Optional[np.ndarray] = None
+        self._end_day: Optional[int] = None
+        self._windows: Dict[int, tuple] = {}
+    
+    def __getstate__(self) -> dict:
+        # Ship only the snapshot description; workers map the same files themselves
+        return {"store": self.store, "version": self.version, "partitions": self._partitions}
+    
+    def __setstate__(self, state: dict):
+        self.__init__()
+        self.store = state["store"]
+        self.version = state["version"]
+        self._partitions = state["partitions"]
+    
+    def __len__(self) -> int:
+        return sum(rows for rows, _ in self._partitions.values())
+    
+    def keys(self) -> List[tuple]:
+        return list(self._partitions)
+    
+    def columns(self, key: tuple) -> tuple:
+        """(dates, demand) for one series as stored, date-ordered"""
+        if key not in self._series:
+            rows, generation = self._partitions[key]
+            self._series[key] = self.store.columns(key, rows, generation)
+        return self._series[key]
+    
+    def series(self, region: str, product_category: str) -> np.ndarray:
+        """Daily demand for one series (empty if unknown)"""
+        key = (region, product_category)
+        if key not in self._partitions:
+            return np.empty(0)
+        if key not in self._daily:
+            self._daily[key] = resample_daily(*self.columns(key), self.end_day())
+        return self._daily[key]
+    
+    def all(self) -> np.ndarray:
+        """Daily demand summed across every series"""
+        if self._all is None:
+            parts = [self.columns(key) for key in self.keys()]
+            self._all = resample_daily(
+                np.concatenate([dates for dates, _ in parts]) if parts else np.empty(0, dtype=np.int64),
+                np.concatenate([demand for _, demand in parts]) if parts else np.empty(0),
+                self.end_day()
+            )
+        return self._all
+    
+    def end_day(self) -> int:
+        """Last calendar day (days since the epoch) observed in any series, or -1 when empty"""
+        if self._end_day is None:
+            self._end_day = max(
+                (int(self.columns(key)[0][-1]) // SECONDS_PER_DAY for key, (rows, _) in self._partitions.items() if rows),
+                default=-1
+            )
+        return self._end_day
+    
+    def end_date(self) -> Optional[datetime]:
+        """Midnight of the last observed day; forecasts start the day after"""
+        if self.end_day() < 0:
+            return None
+        return datetime(1970, 1, 1) + timedelta(days=self.end_day())
+    
+    def window_matrix(self, keys: List[tuple], width: int = FORECAST_WINDOW) -> tuple:
+        """Recent daily windows and day counts for many series in one gather
+        
+        Unknown keys fall back to the global history. The stacked matrix of
+        every series is built once per width and reused across batches.
+        """
+        if width not in self._windows:
+            series_keys = self.keys()
+            daily = [self.series(*key) for key in series_keys] + [self.all()]
+            stacked = np.vstack([recent_window(series, width) for series in daily])
+            samples = np.array([len(series) for series in daily])
+            self._windows[width] = ({key: i for i, key in enumerate(series_keys)}, stacked, samples)
+        
+        row_of, stacked, samples = self._windows[width]
+        fallback = len(stacked) - 1
+        rows = np.fromiter((row_of.get(key, fallback) for key in keys), dtype=np.int64, count=len(keys))
+        return stacked[rows], samples[rows]
+
+def resample_daily(dates: np.ndarray, demand: np.ndarray, end_day: int) -> np.ndarray:
+    """One value per calendar day from the first observation through ``end_day``
+    
+    Same-day observations are summed. Days without any carry the last observed
+    day forward, so appending later observations only extends the series and
+    cached fits can still be updated incrementally.
+    """
+    if not len(dates):
+        return np.empty(0)
+    days = np.asarray(dates, dtype=np.int64) // SECONDS_PER_DAY
+    first = int(days.min())
+    offsets = days - first
+    length = max(end_day - first, int(offsets.max())) + 1
+    totals = np.bincount(offsets, weights=np.asarray(demand, dtype=np.float64), minlength=length)
+    observed = np.bincount(offsets, minlength=length) > 0
+    last_seen = np.maximum.accumulate(np.where(observed, np.arange(length), 0))
+    return totals[last_seen]
 
 class MLService:
     """Machine Learning service for supply chain predictions and analytics"""
     
-    def __init__(self):
+    def __init__(self, pool: Optional[WorkerPool] = None, demand_store_path: str = "data/demand"):
+        self.pool = pool or WorkerPool()
         self.models_loaded = False
         self.disruption_patterns = []
-        self.demand_history = []
+        self.demand_store_path = demand_store_path
+        self.demand_store: Optional[DemandStore] = None
+        self.demand_history = DemandHistory()
+        # (region, product_category, model) -> fitted model, series digest and backtest metrics
+        self.fitted_models: Dict[tuple, Dict[str, Any]] = {}
+        # Bumped whenever a cached fit is replaced, so status responses can be cached
+        self.models_version = 0
+        # Monitored disruptions by id, replaced only when a reading changes
+        self.monitored_disruptions: Dict[str, Dict[str, Any]] = {}
     
     async def initialize_models(self):
         """Initialize ML models and load training data"""
@@ -21,6 +182,12 @@ class MLService:
         # Generate sample historical data for better predictions
         self._generate_sample_data()
         
+        # Demand history lives on disk; only an empty store is seeded with samples
+        self.demand_store = DemandStore(self.demand_store_path)
+        if not self.demand_store.partitions():
+            self._seed_demand_store()
+        self.demand_history = DemandHistory(self.demand_store)
+        
         print("✅ ML models initialized successfully")
     
     def _generate_sample_data(self):
@@ -49,23 +216,27 @@ class MLService:
                 "typical_duration": "1-14 days"
             }
         ]
+    
+    def _seed_demand_store(self):
+        """Write a year of sample demand history into an empty store"""
+        days = 365
+        offsets = np.arange(days)
+        base_date = np.datetime64(datetime.now() - timedelta(days=days), "s")
         
-        # Generate demand history
-        base_date = datetime.now() - timedelta(days=365)
-        for i in range(365):
-            date = base_date + timedelta(days=i)
-            
-            # Simulate seasonal demand with some randomness
-            seasonal_factor = 1 + 0.3 * np.sin(2 * np.pi * i / 365)
-            base_demand = 1000
-            noise = random.gauss(0, 50)
-            
-            self.demand_history.append({
-                "date": date.isoformat(),
-                "demand": max(0, int(base_demand * seasonal_factor + noise)),
-                "region": random.choice(["north_america", "europe", "asia"]),
-                "product_category": random.choice(["electronics", "automotive", "consumer_goods"])
-            })
+        # Simulate seasonal demand with some randomness
+        seasonal_factor = 1 + 0.3 * np.sin(2 * np.pi * offsets / days)
+        noise = np.random.normal(0, 50, days)
+        dates = (base_date + offsets.astype("timedelta64[D]")).astype("datetime64[s]")
+        demand = np.maximum(0, (1000 * seasonal_factor + noise).astype(np.int64))
+        regions = np.random.choice(SAMPLE_REGIONS, days)
+        categories = np.random.choice(SAMPLE_CATEGORIES, days)
+        
+        batches = {}
+        for region in SAMPLE_REGIONS:
+            for category in SAMPLE_CATEGORIES:
+                mask = (regions == region) & (categories == category)
+                batches[(region, category)] = (to_store_dates(dates[mask]), demand[mask])
+        self.demand_store.append(batches)
     
     async def predict_disruptions(self, data: Dict) -> Dict[str, Any]:
         """Predict potential supply chain disruptions using ML"""
@@ -227,65 +398,51 @@ class MLService:
             raise Exception(f"Recommendation generation failed: {str(e)}")
     
     async def forecast_demand(self, data: Dict) -> Dict[str, Any]:
-        """Forecast demand using historical data and ML models"""
+        """Forecast demand with a fitted per-series model, reusing cached fits"""
+        product_category = data.get("product_category", "electronics")
+        region = data.get("region", "north_america")
+        forecast_days = int(data.get("forecast_days", 30))
+        model_name = self._resolve_model(data.get("model", DEFAULT_FORECAST_MODEL))
+        if not 1 <= forecast_days <= MAX_FORECAST_DAYS:
+            raise ValueError(f"forecast_days must be between 1 and {MAX_FORECAST_DAYS}")
+        
         try:
-            product_category = data.get("product_category", "electronics")
-            region = data.get("region", "north_america")
-            forecast_days = data.get("forecast_days", 30)
-            
-            # Filter historical data
-            relevant_history = [
-                d for d in self.demand_history 
-                if d["product_category"] == product_category and d["region"] == region
-            ]
-            
-            if not relevant_history:
-                # Use global average if no specific data
-                relevant_history = self.demand_history
+            history = self.demand_history
+            key, series = self._series_for(history, region, product_category)
+            cache_key = (*key, model_name)
             
-            # Simple forecast using moving average with trend
-            recent_data = relevant_history[-30:]  # Last 30 days
-            recent_demands = [d["demand"] for d in recent_data]
+            # Fitting is CPU-bound, so it runs in the worker pool
+            entry, mean, lower, upper = await self.pool.run(
+                fit_and_forecast, model_name, series, self.fitted_models.get(cache_key),
+                history.version, forecast_days
+            )
+            self._store_fit(cache_key, entry)
             
-            # Calculate trend
-            if len(recent_demands) > 1:
-                trend = (recent_demands[-1] - recent_demands[0]) / len(recent_demands)
-            else:
-                trend = 0
-            
-            # Generate forecast
-            base_demand = np.mean(recent_demands) if recent_demands else 1000
-            forecast = []
-            
-            for i in range(forecast_days):
-                # Apply trend and seasonal factors
-                seasonal_factor = 1 + 0.2 * np.sin(2 * np.pi * i / 365)
-                predicted_demand = max(0, int(base_demand + trend * i * seasonal_factor))
-                
-                # Add confidence intervals
-                confidence_lower = max(0, int(predicted_demand * 0.8))
-                confidence_upper = int(predicted_demand * 1.2)
-                
-                forecast.append({
-                    "date": (datetime.now() + timedelta(days=i+1)).isoformat(),
-                    "predicted_demand": predicted_demand,
-                    "confidence_interval": {
-                        "lower": confidence_lower,
-                        "upper": confidence_upper
-                    },
-                    "confidence_score": round(max(0.5, 1 - i * 0.01), 2)  # Decreasing confidence over time
-                })
+            steps = np.arange(forecast_days)
+            forecast = [
+                {
+                    "date": date,
+                    "predicted_demand": predicted,
+                    "confidence_interval": {"lower": low, "upper": high},
+                    "confidence_score": confidence
+                }
+                for date, predicted, low, high, confidence in zip(
+                    forecast_dates(forecast_days, history.end_date()),
+                    mean.astype(np.int64).tolist(),
+                    lower.astype(np.int64).tolist(),
+                    upper.astype(np.int64).tolist(),
+                    np.round(np.maximum(0.5, 1 - steps * 0.01), 2).tolist()
+                )
+            ]
             
             return {
                 "forecast": forecast,
                 "model_info": {
-                    "model_type": "time_series_ml",
-                    "training_samples": len(relevant_history),
-                    "accuracy_metrics": {
-                        "mape": round(random.uniform(8, 15), 1),  # Mean Absolute Percentage Error
-                        "rmse": round(random.uniform(50, 100), 1),  # Root Mean Square Error
-                        "r2_score": round(random.uniform(0.75, 0.95), 2)  # R-squared
-                    }
+                    "model_type": entry["model_name"],
+                    "training_samples": int(len(series)),
+                    "accuracy_metrics": entry["metrics"],
+                    "data_version": entry["data_version"],
+                    "refit": entry["refit"]
                 },
                 "parameters": {
                     "product_category": product_category,
@@ -298,6 +455,156 @@ class MLService:
         except Exception as e:
             raise Exception(f"Demand forecasting failed: {str(e)}")
     
+    async def forecast_demand_batch(self, data: Dict) -> Dict[str, Any]:
+        """Forecast many (region, product_category) series in one call"""
+        requested = data.get("series") or []
+        if not requested:
+            raise ValueError("'series' must list at least one {region, product_category} entry")
+        if len(requested) > MAX_BATCH_SERIES:
+            raise ValueError(f"At most {MAX_BATCH_SERIES} series per batch")
+        model_name = self._resolve_model(data.get("model", DEFAULT_FORECAST_MODEL))
+        
+        default_horizon = data.get("forecast_days", 30)
+        keys = []
+        horizons = []
+        for entry in requested:
+            horizon = int(entry.get("forecast_days", default_horizon))
+            if not 1 <= horizon <= MAX_FORECAST_DAYS:
+                raise ValueError(f"forecast_days must be between 1 and {MAX_FORECAST_DAYS}")
+            keys.append((entry.get("region", "north_america"), entry.get("product_category", "electronics")))
+            horizons.append(horizon)
+        
+        history = self.demand_history
+        if model_name == MovingAverageModel.name:
+            # Baseline forecasts every series in one vectorized pass
+            result = await self.pool.run(build_batch_forecast, history, keys, horizons)
+        else:
+            # Fit each distinct series once, then fan results back out to the requested rows
+            resolved = [self._series_for(history, *key) for key in keys]
+            fits = await self._fit_many(model_name, dict(resolved), history.version, max(horizons))
+            result = assemble_batch_forecast(keys, horizons, resolved, fits, history.end_date())
+        
+        result["model_info"] = {
+            "model_type": model_name,
+            "series_count": len(keys),
+            "data_version": history.version
+        }
+        result["generated_at"] = datetime.now().isoformat()
+        return result
+    
+    def record_demand(self, data: Dict) -> Dict[str, Any]:
+        """Append demand observations; cached fits pick them up incrementally on next use"""
+        records = data.get("observations") or []
+        if not records:
+            raise ValueError("'observations' must list at least one {region, product_category, demand} entry")
+        if len(records) > MAX_DEMAND_RECORDS:
+            raise ValueError(f"At most {MAX_DEMAND_RECORDS} observations per call")
+        
+        frame = pd.DataFrame(records)
+        missing = {"region", "product_category", "demand"} - set(frame.columns)
+        if missing:
+            raise ValueError(f"Observations missing fields: {sorted(missing)}")
+        
+        frame["demand"] = pd.to_numeric(frame["demand"], errors="coerce")
+        if frame["demand"].isna().any() or (frame["demand"] < 0).any():
+            raise ValueError("'demand' must be a non-negative number")
+        now = datetime.now().isoformat()
+        dates = frame["date"].fillna(now) if "date" in frame.columns else pd.Series(now, index=frame.index)
+        try:
+            frame["date"] = to_store_dates(pd.to_datetime(dates, format="ISO8601").to_numpy(dtype="datetime64[s]"))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid observation date: {str(e)}")
+        
+        batches = {
+            key: (group["date"].to_numpy(), group["demand"].to_numpy())
+            for key, group in frame.groupby(["region", "product_category"], sort=False)
+        }
+        if self.demand_store is None:
+            self.demand_store = DemandStore(self.demand_store_path)
+        self.demand_store.append(batches)
+        self.demand_history = DemandHistory(self.demand_store)
+        return {
+            "recorded": len(frame),
+            "total_observations": len(self.demand_history),
+            "data_version": self.demand_history.version
+        }
+    
+    def model_status(self) -> Dict[str, Any]:
+        """Registered forecasting models and the currently cached fits"""
+        return {
+            "available_models": list(FORECAST_MODELS),
+            "default_model": DEFAULT_FORECAST_MODEL,
+            "data_version": self.demand_history.version,
+            "fitted_series": [
+                {
+                    "region": region,
+                    "product_category": product_category,
+                    "model": entry["model_name"],
+                    "observations": entry["observations"],
+                    "data_version": entry["data_version"],
+                    "accuracy_metrics": entry["metrics"]
+                }
+                for (region, product_category, _), entry in self.fitted_models.items()
+            ]
+        }
+    
+    @property
+    def status_version(self) -> tuple:
+        """Version of everything ``model_status`` reports"""
+        return (self.demand_history.version, self.models_version)
+    
+    async def _fit_many(
+        self,
+        model_name: str,
+        series_of: Dict[tuple, np.ndarray],
+        data_version: int,
+        horizon: int
+    ) -> Dict[tuple, tuple]:
+        """Fit distinct series in pool-sized chunks, caching each chunk's fits as it lands
+        
+        Each chunk is one worker task small enough to finish inside the task
+        timeout, and no more chunks run than there are workers, so queued
+        chunks do not spend their deadline waiting. A chunk that fails leaves
+        the fits of finished chunks cached for the retry.
+        """
+        keys = list(series_of)
+        size = max(1, min(FIT_CHUNK_SERIES, math.ceil(len(keys) / self.pool.max_workers)))
+        running = asyncio.Semaphore(self.pool.max_workers)
+        fits: Dict[tuple, tuple] = {}
+        
+        async def fit_chunk(chunk: List[tuple]):
+            async with running:
+                results = await self.pool.run(
+                    fit_and_forecast_many, model_name, [series_of[key] for key in chunk],
+                    [self.fitted_models.get((*key, model_name)) for key in chunk],
+                    data_version, horizon
+                )
+            for key, fit in zip(chunk, results):
+                self._store_fit((*key, model_name), fit[0])
+                fits[key] = fit
+        
+        await asyncio.gather(*(fit_chunk(keys[start:start + size]) for start in range(0, len(keys), size)))
+        return fits
+    
+    def _store_fit(self, cache_key: tuple, entry: Dict[str, Any]):
+        # Cache hits come back as fresh dicts too, so compare what was fitted
+        previous = self.fitted_models.get(cache_key)
+        self.fitted_models[cache_key] = entry
+        if previous is None or entry["refit"] != "none" or entry["digest"] != previous["digest"]:
+            self.models_version += 1
+    
+    def _resolve_model(self, model_name: str) -> str:
+        if model_name not in FORECAST_MODELS:
+            raise ValueError(f"Unknown model '{model_name}', expected one of {list(FORECAST_MODELS)}")
+        return model_name
+    
+    def _series_for(self, history: DemandHistory, region: str, product_category: str) -> tuple:
+        """Series to fit for a key, falling back to the global history when it is unknown"""
+        series = history.series(region, product_category)
+        if len(series):
+            return (region, product_category), series
+        return ("*", "*"), history.all()
+    
     def _calculate_impact(self, severity: str, pattern: Dict) -> Dict[str, Any]:
         """Calculate potential impact of a disruption"""
         severity_multipliers = {
@@ -341,36 +648,457 @@ class MLService:
     async def get_latest_disruptions(self) -> str:
         """Get latest disruption updates for streaming"""
         try:
-            # Simulate real-time disruption monitoring
-            current_disruptions = [
-                {
-                    "id": "live_1",
-                    "type": "weather",
-                    "severity": "medium",
-                    "status": "monitoring",
-                    "probability": round(random.uniform(0.4, 0.8), 2),
-                    "last_updated": datetime.now().isoformat()
-                },
-                {
-                    "id": "live_2",
-                    "type": "port_congestion",
-                    "severity": "low",
-                    "status": "active",
-                    "probability": round(random.uniform(0.2, 0.5), 2),
-                    "last_updated": datetime.now().isoformat()
-                }
-            ]
-            
-            return json.dumps({
+            return dumps_str({
                 "type": "disruption_update",
-                "data": current_disruptions,
+                "data": await self.get_disruption_records(),
                 "timestamp": datetime.now().isoformat(),
                 "source": "ml_prediction_engine"
             })
             
         except Exception as e:
-            return json.dumps({"error": str(e), "timestamp": datetime.now().isoformat()})
+            return dumps_str({"error": str(e), "timestamp": datetime.now().isoformat()})
+    
+    async def get_disruption_records(self) -> List[Dict[str, Any]]:
+        """Current monitored disruptions, one record per id"""
+        # Simulate real-time disruption monitoring
+        now = datetime.now().isoformat()
+        for record, (low, high) in MONITORED_DISRUPTIONS:
+            current = self.monitored_disruptions.get(record["id"])
+            if current is None:
+                probability = round(random.uniform(low, high), 2)
+            elif random.random() < MONITOR_CHANGE_PROBABILITY:
+                probability = round(min(high, max(low, current["probability"] + random.uniform(-0.05, 0.05))), 2)
+            else:
+                continue
+            
+            if current is None or probability != current["probability"]:
+                # A new dict, so records handed out earlier keep their old values
+                self.monitored_disruptions[record["id"]] = {**record, "probability": probability, "last_updated": now}
+        
+        return list(self.monitored_disruptions.values())
     
     async def check_disruptions(self, data: Dict) -> Dict[str, Any]:
         """Real-time disruption checking for WebSocket"""
-        return await self.predict_disruptions(data)
\ No newline at end of file
+        return await self.predict_disruptions(data)
+
+def forecast_arrays(windows: np.ndarray, horizon: int) -> Dict[str, np.ndarray]:
+    """Trend, seasonality and confidence bands for a (series, window) matrix in one pass
+
+    Rows are right-aligned recent observations with NaN padding on the left.
+    Every returned array is shaped (series, horizon) except ``confidence_score``,
+    which depends only on the step ahead.
+    """
+    windows = np.atleast_2d(windows)
+    counts = np.sum(~np.isnan(windows), axis=1)
+    width = windows.shape[1]
+    
+    # Level from the moving average, trend from first to last observation
+    has_data = counts > 0
+    base_demand = np.full(windows.shape[0], 1000.0)
+    base_demand[has_data] = np.nanmean(windows[has_data], axis=1)
+    first = windows[np.arange(windows.shape[0]), np.clip(width - counts, 0, width - 1)]
+    trend = np.where(counts > 1, (windows[:, -1] - first) / np.maximum(counts, 1), 0.0)
+    
+    steps = np.arange(horizon)
+    seasonal_factor = 1 + 0.2 * np.sin(2 * np.pi * steps / 365)
+    predicted = np.maximum(
+        0, (base_demand[:, None] + trend[:, None] * steps * seasonal_factor).astype(np.int64)
+    )
+    
+    return {
+        "predicted_demand": predicted,
+        "lower": np.maximum(0, (predicted * 0.8).astype(np.int64)),
+        "upper": (predicted * 1.2).astype(np.int64),
+        "confidence_score": np.round(np.maximum(0.5, 1 - steps * 0.01), 2)
+    }
+
+def forecast_dates(horizon: int, start: Optional[datetime] = None) -> List[str]:
+    """ISO timestamps for the days after ``start`` (the last observed day, or now), computed once per horizon"""
+    start = np.datetime64(start or datetime.now(), "us")
+    dates = start + np.arange(1, horizon + 1).astype("timedelta64[D]")
+    return np.datetime_as_string(dates, unit="us").tolist()
+
+def recent_window(series: np.ndarray, width: int = FORECAST_WINDOW) -> np.ndarray:
+    """Last ``width`` observations, NaN-padded on the left"""
+    window = np.full(width, np.nan)
+    tail = series[-width:]
+    if len(tail):
+        window[width - len(tail):] = tail
+    return window
+
+def build_batch_forecast(
+    demand_history: DemandHistory,
+    keys: List[tuple],
+    horizons: List[int]
+) -> Dict[str, Any]:
+    """Forecast many series together and return them column-wise"""
+    windows, samples = demand_history.window_matrix(keys)
+    max_horizon = max(horizons)
+    arrays = forecast_arrays(windows, max_horizon)
+    
+    # Each series keeps only its own horizon; dates and confidence are shared by step
+    return {
+        "dates": forecast_dates(max_horizon, demand_history.end_date()),
+        "confidence_score": arrays["confidence_score"],
+        "series": [
+            {
+                "region": region,
+                "product_category": product_category,
+                "horizon": horizon,
+                "training_samples": int(count)
+            }
+            for (region, product_category), horizon, count in zip(keys, horizons, samples)
+        ],
+        "predicted_demand": [row[:h] for row, h in zip(arrays["predicted_demand"], horizons)],
+        "lower": [row[:h] for row, h in zip(arrays["lower"], horizons)],
+        "upper": [row[:h] for row, h in zip(arrays["upper"], horizons)]
+    }
+
+def assemble_batch_forecast(
+    keys: List[tuple],
+    horizons: List[int],
+    resolved: List[tuple],
+    fits: Dict[tuple, tuple],
+    start: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Columnar batch result from per-series model fits, matching build_batch_forecast"""
+    max_horizon = max(horizons)
+    steps = np.arange(max_horizon)
+    rows = [fits[key] for key, _ in resolved]
+    return {
+        "dates": forecast_dates(max_horizon, start),
+        "confidence_score": np.round(np.maximum(0.5, 1 - steps * 0.01), 2),
+        "series": [
+            {
+                "region": region,
+                "product_category": product_category,
+                "horizon": horizon,
+                "training_samples": int(len(series))
+            }
+            for (region, product_category), horizon, (_, series) in zip(keys, horizons, resolved)
+        ],
+        "predicted_demand": [row[1][:h].astype(np.int64) for row, h in zip(rows, horizons)],
+        "lower": [row[2][:h].astype(np.int64) for row, h in zip(rows, horizons)],
+        "upper": [row[3][:h].astype(np.int64) for row, h in zip(rows, horizons)]
+    }
+
+# ---------------------------------------------------------------------------
+# Forecasting models
+# ---------------------------------------------------------------------------
+
+# Two-sided 95% normal quantile for prediction intervals
+INTERVAL_Z = 1.96
+
+class ForecastModel(ABC):
+    """Base class for per-series forecasting models
+    
+    ``fit`` estimates parameters from a full series, ``update`` folds in newly
+    appended observations without a full refit where the model allows it, and
+    ``predict`` returns (mean, lower, upper) arrays for the horizon.
+    """
+    name = "base"
+    min_observations = 2
+    
+    @abstractmethod
+    def fit(self, y: np.ndarray) -> "ForecastModel":
+        """Estimate parameters from the full series"""
+    
+    def update(self, new_observations: np.ndarray) -> "ForecastModel":
+        """Default incremental update: refit on the extended series"""
+        return self.fit(np.concatenate([self._y, new_observations]))
+    
+    @abstractmethod
+    def predict(self, horizon: int) -> tuple:
+        """(mean, lower, upper) arrays for the next ``horizon`` steps"""
+    
+    def _bands(self, mean: np.ndarray, sigma: float, horizon: int) -> tuple:
+        """Prediction interval widening with the square root of the step ahead"""
+        spread = INTERVAL_Z * sigma * np.sqrt(np.arange(1, horizon + 1))
+        return np.maximum(0, mean), np.maximum(0, mean - spread), np.maximum(0, mean + spread)
+
+class MovingAverageModel(ForecastModel):
+    """Baseline: 30-day moving average with linear trend (vectorized forecast_arrays)"""
+    name = "moving_average"
+    min_observations = 1
+    
+    def fit(self, y: np.ndarray) -> "MovingAverageModel":
+        self._y = np.asarray(y, dtype=np.float64)
+        return self
+    
+    def predict(self, horizon: int) -> tuple:
+        arrays = forecast_arrays(recent_window(self._y), horizon)
+        return (
+            arrays["predicted_demand"][0].astype(np.float64),
+            arrays["lower"][0].astype(np.float64),
+            arrays["upper"][0].astype(np.float64)
+        )
+
+class HoltWintersModel(ForecastModel):
+    """Additive Holt-Winters with a weekly season, smoothing parameters chosen by grid search on one-step SSE"""
+    name = "holt_winters"
+    min_observations = 4
+    
+    ALPHAS = np.array([0.1, 0.3, 0.5, 0.7, 0.9])
+    BETAS = np.array([0.01, 0.05, 0.1, 0.3])
+    GAMMAS = np.array([0.05, 0.1, 0.3])
+    
+    def __init__(self, season_length: int = 7):
+        self.season_length = season_length
+    
+    def fit(self, y: np.ndarray) -> "HoltWintersModel":
+        y = np.asarray(y, dtype=np.float64)
+        self._y = y
+        
+        # Without two full seasons fall back to Holt's linear trend
+        m = self.season_length if len(y) >= 2 * self.season_length else 1
+        gammas = self.GAMMAS if m > 1 else np.array([0.0])
+        grid = np.array(np.meshgrid(self.ALPHAS, self.BETAS, gammas, indexing="ij")).reshape(3, -1)
+        alpha, beta, gamma = grid
+        
+        # Initial state from the first season(s)
+        level = np.full(grid.shape[1], y[:m].mean())
+        trend = np.full(grid.shape[1], (y[m:2 * m].mean() - y[:m].mean()) / m if m > 1 else y[1] - y[0])
+        season = np.tile(y[:m] - y[:m].mean() if m > 1 else np.zeros(1), (grid.shape[1], 1))
+        sse = np.zeros(grid.shape[1])
+        
+        # One recursion across the series, vectorized over every parameter combination
+        start = m if m > 1 else 1
+        for t in range(start, len(y)):
+            s = season[:, t % m]
+            error = y[t] - (level + trend + s)
+            sse += error ** 2
+            new_level = alpha * (y[t] - s) + (1 - alpha) * (level + trend)
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            season[:, t % m] = gamma * (y[t] - new_level) + (1 - gamma) * s
+            level = new_level
+        
+        best = int(np.argmin(sse))
+        self.m = m
+        self.alpha, self.beta, self.gamma = float(alpha[best]), float(beta[best]), float(gamma[best])
+        self.level, self.trend = float(level[best]), float(trend[best])
+        self.season = season[best].copy()
+        self.t = len(y)
+        self.sse = float(sse[best])
+        self.errors = max(1, len(y) - start)
+        return self
+    
+    def update(self, new_observations: np.ndarray) -> "HoltWintersModel":
+        """Run the recursion forward with the fitted parameters"""
+        for value in np.asarray(new_observations, dtype=np.float64):
+            s = self.season[self.t % self.m]
+            error = value - (self.level + self.trend + s)
+            self.sse += error ** 2
+            self.errors += 1
+            new_level = self.alpha * (value - s) + (1 - self.alpha) * (self.level + self.trend)
+            self.trend = self.beta * (new_level - self.level) + (1 - self.beta) * self.trend
+            self.season[self.t % self.m] = self.gamma * (value - new_level) + (1 - self.gamma) * s
+            self.level = new_level
+            self.t += 1
+        self._y = np.concatenate([self._y, new_observations])
+        return self
+    
+    def predict(self, horizon: int) -> tuple:
+        steps = np.arange(1, horizon + 1)
+        mean = self.level + steps * self.trend + self.season[(self.t + steps - 1) % self.m]
+        return self._bands(mean, np.sqrt(self.sse / self.errors), horizon)
+
+class ARIMALiteModel(ForecastModel):
+    """ARIMA(p, 1, 0) with intercept, fitted by least squares on accumulated normal equations"""
+    name = "arima_lite"
+    
+    def __init__(self, order: int = 3):
+        self.order = order
+    
+    @property
+    def min_observations(self) -> int:
+        return self.order + 3
+    
+    def fit(self, y: np.ndarray) -> "ARIMALiteModel":
+        y = np.asarray(y, dtype=np.float64)
+        self._y = y
+        p = self.order
+        diffs = np.diff(y)
+        
+        # Design matrix rows [1, d[t-1], ..., d[t-p]] -> d[t]
+        rows = np.column_stack(
+            [np.ones(len(diffs) - p)] + [diffs[p - k - 1:len(diffs) - k - 1] for k in range(p)]
+        )
+        targets = diffs[p:]
+        self.xtx = rows.T @ rows
+        self.xty = rows.T @ targets
+        self.yty = float(targets @ targets)
+        self.count = len(targets)
+        self.recent = diffs[-p:].copy()
+        self.last = float(y[-1])
+        self._solve()
+        return self
+    
+    def update(self, new_observations: np.ndarray) -> "ARIMALiteModel":
+        """Add each new row to the normal equations instead of refitting"""
+        for value in np.asarray(new_observations, dtype=np.float64):
+            diff = value - self.last
+            row = np.concatenate([[1.0], self.recent[::-1]])
+            self.xtx += np.outer(row, row)
+            self.xty += row * diff
+            self.yty += diff * diff
+            self.count += 1
+            self.recent = np.concatenate([self.recent[1:], [diff]])
+            self.last = float(value)
+        self._y = np.concatenate([self._y, new_observations])
+        self._solve()
+        return self
+    
+    def _solve(self):
+        # Small ridge term keeps short or flat series well conditioned
+        ridge = 1e-6 * np.eye(self.xtx.shape[0])
+        self.coefficients = np.linalg.solve(self.xtx + ridge, self.xty)
+        sse = self.yty - 2 * self.coefficients @ self.xty + self.coefficients @ self.xtx @ self.coefficients
+        self.sigma = float(np.sqrt(max(sse, 0.0) / max(1, self.count - len(self.coefficients))))
+    
+    def predict(self, horizon: int) -> tuple:
+        recent = list(self.recent)
+        level = self.last
+        mean = np.empty(horizon)
+        for h in range(horizon):
+            diff = self.coefficients[0] + sum(
+                self.coefficients[k + 1] * recent[-k - 1] for k in range(self.order)
+            )
+            level += diff
+            mean[h] = level
+            recent = recent[1:] + [diff]
+        return self._bands(mean, self.sigma, horizon)
+
+class GradientBoostingModel(ForecastModel):
+    """Gradient boosting on lagged values, forecasting recursively"""
+    name = "gradient_boosting"
+    
+    def __init__(self, lags: int = 7):
+        self.lags = lags
+    
+    @property
+    def min_observations(self) -> int:
+        return self.lags + 5
+    
+    def fit(self, y: np.ndarray) -> "GradientBoostingModel":
+        y = np.asarray(y, dtype=np.float64)
+        self._y = y
+        features = np.lib.stride_tricks.sliding_window_view(y[:-1], self.lags)
+        targets = y[self.lags:]
+        self.regressor = GradientBoostingRegressor(n_estimators=100, max_depth=3, random_state=0)
+        self.regressor.fit(features, targets)
+        self.sigma = float(np.std(targets - self.regressor.predict(features)))
+        return self
+    
+    def predict(self, horizon: int) -> tuple:
+        window = list(self._y[-self.lags:])
+        mean = np.empty(horizon)
+        for h in range(horizon):
+            mean[h] = self.regressor.predict(np.array([window[-self.lags:]]))[0]
+            window.append(mean[h])
+        return self._bands(mean, self.sigma, horizon)
+
+# Pluggable model registry: name -> factory
+FORECAST_MODELS = {
+    MovingAverageModel.name: MovingAverageModel,
+    HoltWintersModel.name: HoltWintersModel,
+    ARIMALiteModel.name: ARIMALiteModel,
+    GradientBoostingModel.name: GradientBoostingModel
+}
+
+DEFAULT_FORECAST_MODEL = HoltWintersModel.name
+
+def backtest(model_name: str, y: np.ndarray) -> Optional[Dict[str, Any]]:
+    """Holdout accuracy: fit on all but the last slice and score the forecast against it"""
+    holdout = max(1, min(14, len(y) // 5))
+    train, actual = y[:-holdout], y[-holdout:]
+    model = FORECAST_MODELS[model_name]()
+    if len(train) < max(model.min_observations, 2):
+        return None
+    
+    predicted = model.fit(train).predict(holdout)[0]
+    errors = actual - predicted
+    total = float(np.sum((actual - actual.mean()) ** 2))
+    return {
+        "mape": round(float(np.mean(np.abs(errors) / np.maximum(np.abs(actual), 1)) * 100), 1),
+        "rmse": round(float(np.sqrt(np.mean(errors ** 2))), 1),
+        "r2_score": round(1 - float(np.sum(errors ** 2)) / total, 2) if total > 0 else None,
+        "holdout_size": holdout,
+        "method": "holdout_backtest"
+    }
+
+def prefix_digest(y: np.ndarray) -> str:
+    """Digest of a series' raw bytes, to tell an append from an edit of the fitted prefix"""
+    return hashlib.blake2b(np.ascontiguousarray(y, dtype=np.float64).tobytes(), digest_size=16).hexdigest()
+
+def fit_series(
+    model_name: str,
+    y: np.ndarray,
+    cached: Optional[Dict[str, Any]],
+    data_version: int
+) -> Dict[str, Any]:
+    """Reuse, incrementally update or fully refit a cached series model"""
+    y = np.asarray(y, dtype=np.float64)
+    model_class = FORECAST_MODELS[model_name]
+    long_enough = len(y) >= model_class().min_observations
+    # A short series cached as the moving-average fallback moves to the requested model once it can
+    if cached is not None and (cached["model_name"] == model_name or not long_enough):
+        seen = cached["observations"]
+        # Append-only growth keeps the fitted prefix byte for byte
+        if seen <= len(y) and prefix_digest(y[:seen]) == cached["digest"]:
+            if seen == len(y):
+                return {**cached, "data_version": data_version, "refit": "none"}
+            # Copy so a concurrent reader of the cached fit never sees a half-applied update
+            model = copy.deepcopy(cached["model"]).update(y[seen:])
+            metrics, scored = cached["metrics"], cached["scored_observations"]
+            # The backtest refits from scratch, so rerun it only once the holdout slice is all new data
+            if metrics is None or len(y) - scored >= metrics["holdout_size"]:
+                metrics, scored = backtest(cached["model_name"], y), len(y)
+            return {
+                **cached,
+                "model": model,
+                "observations": len(y),
+                "digest": prefix_digest(y),
+                "data_version": data_version,
+                "metrics": metrics,
+                "scored_observations": scored,
+                "refit": "incremental"
+            }
+
+    if not long_enough:
+        model_class = MovingAverageModel
+
+    return {
+        "model": model_class().fit(y),
+        "model_name": model_class.name,
+        "observations": len(y),
+        "digest": prefix_digest(y),
+        "data_version": data_version,
+        "metrics": backtest(model_class.name, y),
+        "scored_observations": len(y),
+        "refit": "full"
+    }
+
+def fit_and_forecast(
+    model_name: str,
+    y: np.ndarray,
+    cached: Optional[Dict[str, Any]],
+    data_version: int,
+    horizon: int
+) -> tuple:
+    """Fit (or reuse) one series model and forecast it; returns (cache entry, mean, lower, upper)"""
+    entry = fit_series(model_name, y, cached, data_version)
+    mean, lower, upper = entry["model"].predict(horizon)
+    return entry, mean, lower, upper
+
+def fit_and_forecast_many(
+    model_name: str,
+    series: List[np.ndarray],
+    cached: List[Optional[Dict[str, Any]]],
+    data_version: int,
+    horizon: int
+) -> List[tuple]:
+    """Batch variant of fit_and_forecast, run as one worker task per chunk of series"""
+    return [
+        fit_and_forecast(model_name, y, entry, data_version, horizon)
+        for y, entry in zip(series, cached)
+    ]
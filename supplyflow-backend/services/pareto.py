@@ -0,0 +1,240 @@
+from typing import Any, Dict, List, Optional, Tuple
+import heapq
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from services.graph_engine import CompiledGraph, ROUTE_SCORE_WEIGHTS
+
+# Criteria a path is compared on; risk adds up as -log(1 - risk_score), so a
+# path's risk total converts back to its probability of failing on some leg
+PARETO_CRITERIA = ("distance", "cost", "duration", "risk")
+
+# Constraint name -> criterion position
+CONSTRAINTS = {"max_distance": 0, "max_cost": 1, "max_duration": 2, "max_risk": 3}
+
+def normalize_weights(weights: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Validated ranking weights over the criteria, summing to 1"""
+    if weights is None:
+        return dict(ROUTE_SCORE_WEIGHTS)
+    if not isinstance(weights, dict):
+        raise ValueError("weights must be an object")
+    unknown = set(weights) - set(PARETO_CRITERIA)
+    if unknown:
+        raise ValueError(f"Unknown weight(s) {sorted(unknown)}, expected {list(PARETO_CRITERIA)}")
+    try:
+        values = {criterion: float(weights.get(criterion, 0)) for criterion in PARETO_CRITERIA}
+    except (TypeError, ValueError):
+        raise ValueError("weights must be numbers")
+    total = sum(values.values())
+    if any(value < 0 for value in values.values()) or total <= 0:
+        raise ValueError("weights must be non-negative and not all zero")
+    return {criterion: value / total for criterion, value in values.items()}
+
+def path_limits(constraints: Optional[Dict[str, Any]]) -> np.ndarray:
+    """Upper bounds per criterion from caller constraints (inf where unconstrained)"""
+    limits = np.full(len(PARETO_CRITERIA), np.inf)
+    if not constraints:
+        return limits
+    unknown = set(constraints) - set(CONSTRAINTS)
+    if unknown:
+        raise ValueError(f"Unknown constraint(s) {sorted(unknown)}, expected {list(CONSTRAINTS)}")
+    for name, value in constraints.items():
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+        if value < 0:
+            raise ValueError(f"{name} must be non-negative")
+        if name == "max_risk":
+            if value >= 1:
+                raise ValueError("max_risk is a failure probability and must be below 1")
+            value = -np.log1p(-value)
+        limits[CONSTRAINTS[name]] = value
+    return limits
+
+def compute_pareto_routes(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    weights: Dict[str, float],
+    limits: np.ndarray,
+    epsilon: float = 0.0,
+    max_labels: int = 20000,
+    limit: int = 20
+) -> Dict[str, Any]:
+    """Pareto frontier of source->target paths over distance, cost, duration and risk
+
+    A multi-criteria label-setting search (Martins). One reverse Dijkstra
+    per criterion gives exact lower bounds to the target and that
+    criterion's optimal path, which seeds the frontier before the search
+    starts. Labels are settled in order of an A*-style key, so a settled
+    label is never dominated later. A label is dropped when its bounds
+    break a constraint, when a known path dominates its bounds, or when a
+    label at the same node dominates it; with ``epsilon`` > 0 dominance
+    allows that relative slack, trading exactness for a smaller frontier.
+    Past ``max_labels`` settled labels the search stops and returns the
+    paths found so far, which always include the single-criterion optima.
+    """
+    started = time.perf_counter()
+    columns = np.column_stack([
+        graph.weights["distance"],
+        graph.weights["cost"],
+        graph.weights["duration"],
+        graph.column("risk_cost")
+    ])
+
+    # Exact bound on what is left to the target, and the optimal path to it, per criterion
+    n = graph.number_of_nodes()
+    bounds = np.empty((n, len(PARETO_CRITERIA)))
+    optima = []
+    for i in range(len(PARETO_CRITERIA)):
+        reverse = csr_matrix((columns[:, i], graph.indices, graph.indptr), shape=(n, n)).T
+        bounds[:, i], successors = dijkstra(reverse, directed=True, indices=target, return_predecessors=True)
+        if np.isfinite(bounds[source, i]):
+            nodes = [source]
+            while nodes[-1] != target:
+                nodes.append(int(successors[nodes[-1]]))
+            optima.append(graph.path_positions(nodes))
+
+    result = {
+        "source": graph.node_ids[source],
+        "target": graph.node_ids[target],
+        "paths": [],
+        "frontier_size": 0,
+        "weights": weights,
+        "labels_created": 0,
+        "labels_settled": 0
+    }
+    if not np.isfinite(bounds[source]).all():
+        return {**result, "status": "unreachable", "compute_seconds": round(time.perf_counter() - started, 4)}
+
+    # Known complete paths: the single-criterion optima until the search finds its own
+    known: Dict[Tuple[float, ...], np.ndarray] = {}
+    for positions in optima:
+        totals = tuple(columns[positions].sum(axis=0).tolist())
+        if (np.asarray(totals) <= limits).all():
+            known[totals] = positions
+    found = np.array(list(known), dtype=np.float64).reshape(-1, len(PARETO_CRITERIA))
+
+    # Queue key: sum of criteria relative to their best possible value
+    scale = 1 / np.maximum(bounds[source], 1e-9)
+    slack = 1 + epsilon
+    values: List[Tuple[float, ...]] = [(0.0, 0.0, 0.0, 0.0)]
+    nodes = [source]
+    parents = [-1]
+    edges = [-1]
+    removed = [False]
+    at_node: Dict[int, List[int]] = {source: [0]}
+    queue = [(float(bounds[source] @ scale), 0)]
+    settled = 0
+    status = "complete"
+
+    while queue:
+        _, label = heapq.heappop(queue)
+        node = nodes[label]
+        if removed[label] or node == target:
+            continue
+        if settled >= max_labels:
+            status = "truncated"
+            break
+        settled += 1
+
+        start, end = graph.indptr[node], graph.indptr[node + 1]
+        if start == end:
+            continue
+        heads = graph.indices[start:end]
+        extended = np.asarray(values[label]) + columns[start:end]
+        estimates = extended + bounds[heads]
+        keep = np.isfinite(estimates).all(axis=1) & (estimates <= limits).all(axis=1)
+        if len(found):
+            # A known path at least as good as every completion makes the extension pointless;
+            # one that merely ties it is kept, since that completion may be the known path itself
+            covered = (found[None, :, :] <= estimates[:, None, :] * slack).all(axis=2)
+            tied = (found[None, :, :] == estimates[:, None, :]).all(axis=2)
+            keep &= ~(covered & ~tied).any(axis=1)
+
+        for j in np.flatnonzero(keep).tolist():
+            head = int(heads[j])
+            candidate = tuple(extended[j].tolist())
+            labels = at_node.setdefault(head, [])
+            if any(_dominates(values[other], candidate, slack) for other in labels):
+                continue
+
+            # The new label evicts every label at the node it dominates
+            survivors = []
+            for other in labels:
+                if _dominates(candidate, values[other], 1.0):
+                    removed[other] = True
+                else:
+                    survivors.append(other)
+            new = len(values)
+            values.append(candidate)
+            nodes.append(head)
+            parents.append(label)
+            edges.append(start + j)
+            removed.append(False)
+            survivors.append(new)
+            at_node[head] = survivors
+            if head == target:
+                known = {
+                    totals: positions for totals, positions in known.items()
+                    if not _dominates(candidate, totals, 1.0)
+                }
+                known[candidate] = new
+                found = np.array(list(known), dtype=np.float64).reshape(-1, len(PARETO_CRITERIA))
+            else:
+                heapq.heappush(queue, (float(np.dot(estimates[j], scale)), new))
+
+    paths = []
+    for totals, path in known.items():
+        if not isinstance(path, np.ndarray):
+            positions = []
+            while edges[path] >= 0:
+                positions.append(edges[path])
+                path = parents[path]
+            path = np.array(positions[::-1], dtype=np.int64)
+        paths.append(_path(graph, path, totals))
+    _rank(paths, weights)
+    return {
+        **result,
+        "paths": paths[:limit],
+        "frontier_size": len(paths),
+        "status": status if paths or status == "truncated" else "infeasible",
+        "labels_created": len(values),
+        "labels_settled": settled,
+        "compute_seconds": round(time.perf_counter() - started, 4)
+    }
+
+def _dominates(a, b, slack: float) -> bool:
+    """Whether ``a`` is no worse than ``b`` (within ``slack``) on every criterion"""
+    return a[0] <= b[0] * slack and a[1] <= b[1] * slack and a[2] <= b[2] * slack and a[3] <= b[3] * slack
+
+def _path(graph: CompiledGraph, positions: np.ndarray, totals: Tuple[float, ...]) -> Dict[str, Any]:
+    """Node and edge ids of a path given by edge positions, plus its totals"""
+    nodes = graph.edge_sources()[positions].tolist() + [int(graph.indices[positions[-1]])]
+    return {
+        "path": [graph.node_ids[i] for i in nodes],
+        "edges": graph.edge_ids[positions].tolist(),
+        "metrics": {
+            "total_distance": round(totals[0], 4),
+            "total_cost": round(totals[1], 4),
+            "total_duration": round(totals[2], 4),
+            "failure_probability": round(float(-np.expm1(-totals[3])), 4)
+        },
+        "_totals": totals
+    }
+
+def _rank(paths: List[Dict[str, Any]], weights: Dict[str, float]):
+    """Score paths by weighted closeness to the frontier's best per criterion, best first"""
+    if not paths:
+        return
+    totals = np.array([path.pop("_totals") for path in paths])
+    best = totals.min(axis=0)
+    ratios = np.where(totals > 0, best / np.where(totals > 0, totals, 1), 1.0)
+    scores = ratios @ np.array([weights[criterion] for criterion in PARETO_CRITERIA])
+    for path, score, row in zip(paths, scores.tolist(), totals):
+        path["score"] = round(score, 4)
+        path["best_for"] = [criterion for criterion, value, low in zip(PARETO_CRITERIA, row, best) if value == low]
+    paths.sort(key=lambda path: -path["score"])
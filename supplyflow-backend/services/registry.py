@@ -0,0 +1,139 @@
+from typing import Optional
+import os
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+
+from services.graph_service import GraphService
+from services.ml_service import MLService
+from services.disruption_service import DisruptionService
+from services.executor import WorkerPool
+from services.broadcaster import Broadcaster
+from services.delta_feed import DeltaFeed
+from services.response_cache import ResponseCache
+
+class ServiceRegistry:
+    """Long-lived container for the services shared by every router"""
+
+    def __init__(self):
+        self.pool: Optional[WorkerPool] = None
+        self.graph_service: Optional[GraphService] = None
+        self.ml_service: Optional[MLService] = None
+        self.disruption_service: Optional[DisruptionService] = None
+        self.broadcaster: Optional[Broadcaster] = None
+        self.disruption_feed: Optional[DeltaFeed] = None
+        self.response_cache = ResponseCache(
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        )
+
+    @property
+    def initialized(self) -> bool:
+        """Whether every service has been built and loaded"""
+        return (
+            self.graph_service is not None
+            and self.ml_service is not None
+            and self.disruption_service is not None
+        )
+
+    async def initialize(self):
+        """Build each service once and load its data"""
+        # One executor for all CPU-bound service work
+        self.pool = WorkerPool(
+            kind=os.getenv("WORKER_POOL_KIND", "thread"),
+            max_workers=int(os.getenv("WORKER_POOL_SIZE", "0")) or None,
+            max_pending=int(os.getenv("WORKER_POOL_MAX_PENDING", "0")) or None,
+            default_timeout=float(os.getenv("WORKER_TASK_TIMEOUT", "30"))
+        )
+
+        self.graph_service = GraphService(
+            route_index_size=int(os.getenv("ROUTE_INDEX_MAX_TREES", "256")),
+            centrality_epsilon=float(os.getenv("CENTRALITY_EPSILON", "0.1")),
+            resilience_budget=float(os.getenv("RESILIENCE_TIME_BUDGET", "2.0")),
+            risk_max_trials=int(os.getenv("RISK_MAX_TRIALS", "100000")),
+            risk_trials_per_task=int(os.getenv("RISK_TRIALS_PER_TASK", "5000")),
+            pareto_max_labels=int(os.getenv("PARETO_MAX_LABELS", "20000")),
+            alternatives_cache_size=int(os.getenv("ALTERNATIVE_PATHS_CACHE_SIZE", "1024")),
+            pool=self.pool
+        )
+        self.ml_service = MLService(
+            pool=self.pool,
+            demand_store_path=os.getenv("DEMAND_STORE_PATH", "data/demand")
+        )
+        self.disruption_service = DisruptionService(
+            log_path=os.getenv("DISRUPTION_LOG_PATH", "data/disruptions.db"),
+            log_batch_size=int(os.getenv("DISRUPTION_LOG_BATCH_SIZE", "64")),
+            log_flush_interval=float(os.getenv("DISRUPTION_LOG_FLUSH_INTERVAL", "0.5")),
+            snapshot_every=int(os.getenv("DISRUPTION_SNAPSHOT_EVERY", "1000")),
+            impact=self.graph_service.disruption_impact
+        )
+
+        # A configured node/edge file pair replaces the built-in sample network
+        nodes_file = os.getenv("GRAPH_NODES_FILE")
+        edges_file = os.getenv("GRAPH_EDGES_FILE")
+        if nodes_file and edges_file:
+            await self.graph_service.load_from_files(
+                nodes_file,
+                edges_file,
+                chunk_size=int(os.getenv("GRAPH_LOAD_CHUNK_SIZE", "100000")),
+                strict=os.getenv("GRAPH_LOAD_STRICT", "false").lower() == "true"
+            )
+        else:
+            await self.graph_service.load_sample_data()
+        await self.ml_service.initialize_models()
+        await self.disruption_service.load_sample_data()
+
+        # One producer serves every /stream client, sending only what changed per tick
+        history = int(os.getenv("STREAM_HISTORY", "256"))
+        self.disruption_feed = DeltaFeed("disruption", history=history)
+        self.broadcaster = Broadcaster(
+            self._next_disruption_delta,
+            event="disruption_delta",
+            snapshot=lambda: self.disruption_feed.snapshot(),
+            snapshot_event="disruption_snapshot",
+            interval=float(os.getenv("STREAM_INTERVAL", "30")),
+            queue_size=int(os.getenv("STREAM_QUEUE_SIZE", "16")),
+            history=history
+        )
+        await self.broadcaster.start()
+
+    async def _next_disruption_delta(self) -> Optional[dict]:
+        """Diff the latest disruptions against the previous tick"""
+        return self.disruption_feed.apply(await self.ml_service.get_disruption_records())
+
+    async def shutdown(self):
+        """Release the shared services"""
+        if self.broadcaster is not None:
+            await self.broadcaster.stop()
+            self.broadcaster = None
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.disruption_service is not None:
+            self.disruption_service.close()
+        self.graph_service = None
+        self.ml_service = None
+        self.disruption_service = None
+        self.disruption_feed = None
+        self.response_cache.clear()
+
+def get_registry(connection: HTTPConnection) -> ServiceRegistry:
+    """Resolve the registry attached to the application in lifespan"""
+    registry = getattr(connection.app.state, "services", None)
+    if registry is None or not registry.initialized:
+        raise HTTPException(status_code=503, detail="Services not initialized")
+    return registry
+
+def get_graph_service(connection: HTTPConnection) -> GraphService:
+    """Dependency returning the shared GraphService"""
+    return get_registry(connection).graph_service
+
+def get_ml_service(connection: HTTPConnection) -> MLService:
+    """Dependency returning the shared MLService"""
+    return get_registry(connection).ml_service
+
+def get_disruption_service(connection: HTTPConnection) -> DisruptionService:
+    """Dependency returning the shared DisruptionService"""
+    return get_registry(connection).disruption_service
+
+def get_response_cache(connection: HTTPConnection) -> ResponseCache:
+    """Dependency returning the shared ResponseCache"""
+    return get_registry(connection).response_cache
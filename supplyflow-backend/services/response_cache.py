@@ -0,0 +1,105 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Union
+from collections import OrderedDict
+import hashlib
+import inspect
+from starlette.requests import Request
+from starlette.responses import Response
+
+from services.serialization import dumps
+
+# Clients must revalidate, which costs a 304 once the entry is cached
+CACHE_CONTROL = "no-cache"
+
+class CachedResponse:
+    """An encoded response body and its strong ETag"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+class ResponseCache:
+    """LRU of encoded JSON responses keyed by endpoint, query parameters and data version
+
+    Entries are evicted least recently used first once their bodies exceed
+    ``max_bytes`` in total. A data change bumps the version in the key, so
+    stale entries are never served; they simply age out.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, body: bytes) -> CachedResponse:
+        """Store a body, evicting the least recently used entries beyond ``max_bytes``"""
+        entry = CachedResponse(body)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous.body)
+        # Bodies larger than the whole cache are served but not kept
+        if len(body) <= self.max_bytes:
+            self._entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    async def respond(
+        self,
+        request: Request,
+        version: Hashable,
+        build: Callable[[], Union[Any, Awaitable[Any]]]
+    ) -> Response:
+        """Serve ``build()``'s content for this request and data version, or 304 when the client has it"""
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())), version)
+        entry = self.get(key)
+        if entry is None:
+            self.misses += 1
+            content = build()
+            if inspect.isawaitable(content):
+                content = await content
+            entry = self.put(key, dumps(content))
+        else:
+            self.hits += 1
+
+        headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified
+        }
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
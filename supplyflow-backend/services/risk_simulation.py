@@ -0,0 +1,228 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import math
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+
+from services.graph_engine import CompiledGraph, _expand
+from services.executor import WorkerPool
+
+# Sampled edge weights held in memory at once per batch of trials
+BATCH_CELLS = 4_000_000
+
+# Lead time percentiles reported per pair
+PERCENTILES = (50, 90, 95, 99)
+
+def simulate_lead_times(
+    graph: CompiledGraph,
+    sources: Sequence[int],
+    targets: Sequence[int],
+    trials: int,
+    seed: Optional[np.random.SeedSequence] = None,
+    delay_scale: float = 1.0
+) -> np.ndarray:
+    """Sampled source->target lead times, shape (trials, pairs), inf where the target was cut off
+
+    Each trial fails every edge independently with probability
+    ``risk_score`` and stretches the surviving durations by
+    ``1 + delay_scale * risk_score * Exp(1)``. Lead times come from
+    relaxing a whole batch of trials at once, over only the edges that can
+    lie on a path between the requested pairs.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    lead_times = np.full((trials, len(sources)), np.inf)
+    if not trials or not len(sources):
+        return lead_times
+
+    # Keep nodes reachable from a source that can also reach a target
+    n = graph.number_of_nodes()
+    matrix = graph.matrix("duration")
+    forward = np.isfinite(dijkstra(matrix, directed=True, indices=np.unique(sources), unweighted=True, min_only=True))
+    backward = np.isfinite(dijkstra(matrix.T, directed=True, indices=np.unique(targets), unweighted=True, min_only=True))
+    relevant = forward & backward
+    local = np.full(n, -1, dtype=np.int64)
+    kept_nodes = np.flatnonzero(relevant)
+    local[kept_nodes] = np.arange(len(kept_nodes))
+    size = len(kept_nodes)
+
+    all_sources = graph.edge_sources()
+    kept = np.flatnonzero(relevant[all_sources] & relevant[graph.indices])
+    sweep = _Sweep(local[all_sources[kept]], local[graph.indices[kept]], size)
+    durations = graph.weights["duration"][kept][sweep.order]
+    risk = np.clip(graph.weights["risk_score"][kept], 0.0, 1.0)[sweep.order]
+
+    batch = max(1, min(trials, BATCH_CELLS // max(1, len(kept), size)))
+    rng = np.random.default_rng(seed)
+    pair_sources = local[sources]
+    pair_targets = local[targets]
+
+    for first in range(0, trials, batch):
+        count = min(batch, trials - first)
+        failed = rng.random((count, len(kept))) < risk
+        weights = durations * (1 + delay_scale * risk * rng.exponential(1.0, (count, len(kept))))
+        weights[failed] = np.inf
+
+        for source in np.unique(pair_sources[pair_sources >= 0]).tolist():
+            distances = sweep.run(source, weights)
+            for pair in np.flatnonzero((pair_sources == source) & (pair_targets >= 0)).tolist():
+                lead_times[first:first + count, pair] = distances[:, pair_targets[pair]]
+
+    return lead_times
+
+class _Sweep:
+    """Edges grouped by the topological level of their target's strongly connected component
+
+    Levels are relaxed in order, so each is settled once every level feeding
+    it is. On an acyclic network (the usual supplier -> port -> warehouse ->
+    store shape) that is a single relaxation per edge; levels holding a
+    cycle are re-relaxed, along only the edges out of nodes that improved,
+    until nothing changes.
+    """
+
+    def __init__(self, edge_from: np.ndarray, edge_to: np.ndarray, size: int):
+        self.size = size
+        _, components = connected_components(
+            csr_matrix((np.ones(len(edge_from)), (edge_from, edge_to)), shape=(size, size)),
+            directed=True, connection="strong"
+        )
+        # Kahn's algorithm over the condensation, one frontier of components per level
+        crossing = components[edge_from] != components[edge_to]
+        links = np.unique(np.column_stack([components[edge_from], components[edge_to]])[crossing], axis=0)
+        count = int(components.max()) + 1 if size else 0
+        by_source = np.argsort(links[:, 0], kind="stable")
+        out_ptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(links[:, 0], minlength=count), out=out_ptr[1:])
+        in_degree = np.bincount(links[:, 1], minlength=count)
+        component_levels = np.zeros(count, dtype=np.int64)
+        frontier = np.flatnonzero(in_degree == 0)
+        level = 0
+        while frontier.size:
+            component_levels[frontier] = level
+            _, leaving = _expand(frontier, out_ptr, by_source)
+            np.subtract.at(in_degree, links[leaving, 1], 1)
+            reached = np.unique(links[leaving, 1])
+            frontier = reached[in_degree[reached] == 0]
+            level += 1
+        levels = component_levels[components]
+
+        self.order = np.lexsort((edge_to, levels[edge_to]))
+        self.edge_from = edge_from[self.order]
+        self.edge_to = edge_to[self.order]
+        edge_levels = levels[self.edge_to]
+        looped = levels[self.edge_from] == edge_levels
+        bounds = np.flatnonzero(np.diff(edge_levels)) + 1
+        self.groups = [
+            (lo, hi, bool(looped[lo:hi].any()))
+            for lo, hi in zip([0, *bounds.tolist()], [*bounds.tolist(), len(self.edge_to)])
+        ]
+
+    def run(self, source: int, weights: np.ndarray) -> np.ndarray:
+        """Shortest distances from ``source`` for every trial row of ``weights``"""
+        distances = np.full((weights.shape[0], self.size), np.inf)
+        distances[:, source] = 0
+        # Nodes finite in at least one trial; edges out of the rest cannot help
+        reached = np.zeros(self.size, dtype=bool)
+        reached[source] = True
+        for lo, hi, looped in self.groups:
+            active = reached[self.edge_from[lo:hi]]
+            while active.any():
+                positions = lo + np.flatnonzero(active)
+                heads, starts = np.unique(self.edge_to[positions], return_index=True)
+                best = np.minimum.reduceat(distances[:, self.edge_from[positions]] + weights[:, positions], starts, axis=1)
+                current = distances[:, heads]
+                better = best < current
+                improved = np.zeros(self.size, dtype=bool)
+                improved[heads[better.any(axis=0)]] = True
+                distances[:, heads] = np.where(better, best, current)
+                reached |= improved
+                if not looped:
+                    break
+                active = improved[self.edge_from[lo:hi]]
+        return distances
+
+def summarize_lead_times(lead_times: np.ndarray) -> List[Dict[str, Any]]:
+    """Unreachability probability and lead time distribution per pair"""
+    trials = lead_times.shape[0]
+    summaries = []
+    for column in lead_times.T:
+        reached = column[np.isfinite(column)]
+        p_unreachable = 1 - len(reached) / trials if trials else 0.0
+        distribution = None
+        if len(reached):
+            values = np.percentile(reached, PERCENTILES)
+            distribution = {
+                "mean": round(float(reached.mean()), 2),
+                **{f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, values.tolist())},
+                "max": round(float(reached.max()), 2)
+            }
+        summaries.append({
+            "p_unreachable": round(p_unreachable, 4),
+            # Binomial standard error of the estimate
+            "p_unreachable_stderr": round(math.sqrt(p_unreachable * (1 - p_unreachable) / trials), 4) if trials else 0.0,
+            "lead_time": distribution
+        })
+    return summaries
+
+class RiskSimulator:
+    """Monte Carlo lead time and reachability risk, split into worker pool tasks"""
+
+    def __init__(self, pool: Optional[WorkerPool] = None, max_trials: int = 100000, trials_per_task: int = 5000):
+        self.pool = pool or WorkerPool()
+        self.max_trials = max_trials
+        self.trials_per_task = max(1, trials_per_task)
+
+    async def simulate(
+        self,
+        graph: CompiledGraph,
+        pairs: Sequence[Tuple[int, int]],
+        trials: int = 10000,
+        seed: Optional[int] = None,
+        delay_scale: float = 1.0
+    ) -> Dict[str, Any]:
+        """Distributions per (source, target) pair; tasks run in parallel on a process pool"""
+        if not 1 <= trials <= self.max_trials:
+            raise ValueError(f"trials must be between 1 and {self.max_trials}")
+        if delay_scale < 0:
+            raise ValueError("delay_scale must be non-negative")
+        if seed is not None and (not isinstance(seed, int) or seed < 0):
+            raise ValueError("seed must be a non-negative integer")
+
+        started = time.perf_counter()
+        sources = [source for source, _ in pairs]
+        targets = [target for _, target in pairs]
+        tasks = math.ceil(trials / self.trials_per_task)
+        # Independent streams per task keep a seeded run reproducible however it is split
+        seeds = np.random.SeedSequence(seed).spawn(tasks)
+        chunks = await asyncio.gather(*(
+            self.pool.run(
+                simulate_lead_times, graph, sources, targets,
+                min(self.trials_per_task, trials - i * self.trials_per_task), seeds[i], delay_scale
+            )
+            for i in range(tasks)
+        ))
+        lead_times = np.concatenate(chunks, axis=0)
+
+        # Deterministic lead time on the unperturbed graph, for comparison
+        baseline = dijkstra(graph.matrix("duration"), directed=True, indices=sorted(set(sources)))
+        rows = {source: row for row, source in enumerate(sorted(set(sources)))}
+        results = []
+        for (source, target), summary in zip(pairs, summarize_lead_times(lead_times)):
+            expected = baseline[rows[source], target]
+            results.append({
+                "source": graph.node_ids[source],
+                "target": graph.node_ids[target],
+                "baseline_lead_time": round(float(expected), 2) if np.isfinite(expected) else None,
+                **summary
+            })
+
+        return {
+            "pairs": results,
+            "trials": trials,
+            "tasks": tasks,
+            "seed": seed,
+            "delay_scale": delay_scale,
+            "compute_seconds": round(time.perf_counter() - started, 4)
+        }
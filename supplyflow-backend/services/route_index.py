@@ -0,0 +1,219 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import time
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from services.graph_engine import CompiledGraph, walk_predecessors, with_derived
+from services.change_feed import GraphChange
+
+# Optimization type -> edge weight column
+ROUTE_CRITERIA = {
+    "shortest_distance": "distance",
+    "lowest_cost": "cost",
+    "fastest_time": "duration"
+}
+
+# Every criterion served from cached trees; leg risks compound, so the safest
+# route minimizes the derived -log(1 - risk) column
+INDEXED_CRITERIA = {**ROUTE_CRITERIA, "lowest_risk": "risk_cost"}
+
+class RouteIndex:
+    """Precomputed multi-criteria shortest-path trees with incremental invalidation"""
+
+    def __init__(self, max_trees: int = 256, warm_batch_size: int = 64):
+        self.max_trees = max_trees
+        self.warm_batch_size = warm_batch_size
+        self._graph: Optional[CompiledGraph] = None
+        # (weight, source) -> (distances, predecessors), least recently used first
+        self._trees: "OrderedDict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def attach(self, graph: CompiledGraph):
+        """Point the index at a compiled graph, dropping trees from an older topology"""
+        if self._graph is not graph:
+            self._trees.clear()
+        self._graph = graph
+
+    def warm(
+        self,
+        sources: Sequence[int],
+        weights: Sequence[str] = tuple(INDEXED_CRITERIA.values()),
+        time_budget: Optional[float] = None
+    ):
+        """Precompute trees for the given sources on the calling thread"""
+        if self._graph is not None:
+            trees = build_trees(self._graph, self.warm_sources(sources, weights), weights, self.warm_batch_size, time_budget)
+            self.adopt(self._graph, trees)
+
+    def warm_sources(self, sources: Sequence[int], weights: Sequence[str]) -> List[int]:
+        """The leading sources whose trees fit in the index for every weight"""
+        return list(sources)[: max(1, self.max_trees // max(1, len(weights)))]
+
+    def lookup(self, source: int, weight: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Cached (distances, predecessors) for one source, or None on a miss"""
+        key = (weight, source)
+        tree = self._trees.get(key)
+        if tree is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._trees.move_to_end(key)
+        return tree
+
+    def adopt(self, graph: CompiledGraph, trees: List[Tuple[str, int, np.ndarray, np.ndarray]]) -> bool:
+        """Store trees built elsewhere for ``graph``; dropped when the index has moved past that snapshot"""
+        if graph is not self._graph:
+            return False
+        for weight, source, distances, predecessors in trees:
+            self._store((weight, source), distances, predecessors)
+        return True
+
+    def path(self, source: int, target: int, weight: str) -> Optional[List[int]]:
+        """Shortest path by walking the cached predecessor tree (O(path length))"""
+        _, predecessors = self._tree(source, weight)
+        return walk_predecessors(predecessors, source, target)
+
+    def edge_weight_changed(self, source: int, target: int, weight: str, old: float, new: float):
+        """Invalidate only the trees whose shortest paths the edge change can affect"""
+        if old == new:
+            return
+
+        stale = []
+        for key, (distances, predecessors) in self._trees.items():
+            if key[0] != weight:
+                continue
+            # Tree edge changed: subtree distances (and possibly shape) are stale
+            if predecessors[target] == source:
+                stale.append(key)
+            # Cheaper non-tree edge now beats the current best way into target
+            elif new < old and distances[source] + new < distances[target]:
+                stale.append(key)
+
+        for key in stale:
+            del self._trees[key]
+        self.invalidations += len(stale)
+
+    def apply_change(self, change: GraphChange):
+        """Change feed subscriber: keep every tree the change cannot affect"""
+        if change.kind == "network_loaded":
+            self.attach(change.graph)
+            return
+
+        if change.kind == "edge_updated":
+            before, after = with_derived(change.before), with_derived(change.after)
+            for weight, new in after.items():
+                self.edge_weight_changed(change.source, change.target, weight, before[weight], new)
+        elif change.kind == "edge_added":
+            # Like a weight drop from infinity: only trees it shortcuts go stale
+            after = with_derived(change.after)
+            self._drop(
+                key for key, (distances, _) in self._trees.items()
+                if distances[change.source] + after[key[0]] < distances[change.target]
+            )
+        elif change.kind == "edge_removed":
+            self._drop(
+                key for key, (_, predecessors) in self._trees.items()
+                if predecessors[change.target] == change.source
+            )
+        elif change.kind == "node_added":
+            # New nodes take the next position and start out unreachable
+            grow = change.graph.number_of_nodes() - self._graph.number_of_nodes()
+            for key, (distances, predecessors) in list(self._trees.items()):
+                self._trees[key] = (
+                    np.concatenate([distances, np.full(grow, np.inf)]),
+                    np.concatenate([predecessors, np.full(grow, -9999, dtype=np.int32)])
+                )
+        elif change.kind == "node_removed":
+            # Incident edges were removed (and their trees dropped) first, so the
+            # surviving trees never route through the node and only need renumbering
+            node_map = change.node_map
+            keep = node_map >= 0
+            self._drop(key for key in self._trees if not keep[key[1]])
+            renumbered = OrderedDict()
+            for (weight, source), (distances, predecessors) in self._trees.items():
+                mapped = np.where(predecessors >= 0, node_map[np.maximum(predecessors, 0)], predecessors)
+                renumbered[(weight, int(node_map[source]))] = (distances[keep], mapped[keep].astype(np.int32))
+            self._trees = renumbered
+
+        self._graph = change.graph
+
+    def reset(self, change: GraphChange):
+        """Drop every tree and follow the change's graph; used when applying a change failed"""
+        self.invalidations += len(self._trees)
+        self._trees.clear()
+        self._graph = change.graph
+
+    def _drop(self, keys):
+        stale = list(keys)
+        for key in stale:
+            del self._trees[key]
+        self.invalidations += len(stale)
+
+    def clear(self):
+        """Drop every cached tree"""
+        self._trees.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters for monitoring"""
+        return {
+            "cached_trees": len(self._trees),
+            "max_trees": self.max_trees,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations
+        }
+
+    def _tree(self, source: int, weight: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Cached (distances, predecessors) for one source, computing it on a miss"""
+        tree = self.lookup(source, weight)
+        if tree is None:
+            ((_, _, distances, predecessors),) = build_trees(self._graph, [source], [weight], 1)
+            tree = (distances, predecessors)
+            self._store((weight, source), *tree)
+        return tree
+
+    def _store(self, key: Tuple[str, int], distances: np.ndarray, predecessors: np.ndarray):
+        """Insert a tree, evicting the least recently used beyond capacity"""
+        self._trees[key] = (distances, predecessors)
+        self._trees.move_to_end(key)
+        while len(self._trees) > self.max_trees:
+            self._trees.popitem(last=False)
+
+def build_trees(
+    graph: CompiledGraph,
+    sources: Sequence[int],
+    weights: Sequence[str],
+    batch_size: int,
+    time_budget: Optional[float] = None
+) -> List[Tuple[str, int, np.ndarray, np.ndarray]]:
+    """(weight, source, distances, predecessors) per source and weight, batching Dijkstra runs per criterion
+
+    A pure function of the snapshot, so it runs in the worker pool. With a
+    time budget, building stops after the batch that crosses it; the
+    remaining trees are computed on first use instead.
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    sources = list(sources)
+    trees = []
+    # Under a budget, start with one tree per criterion and size later batches to fit
+    size = batch_size if deadline is None else 1
+    start = 0
+    while start < len(sources):
+        batch = sources[start:start + size]
+        started = time.perf_counter()
+        for weight in weights:
+            distances, predecessors = dijkstra(graph.matrix(weight), directed=True, indices=batch, return_predecessors=True)
+            for row, source in enumerate(batch):
+                trees.append((weight, source, distances[row], predecessors[row].astype(np.int32)))
+        start += len(batch)
+
+        if deadline is not None:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            per_source = (time.perf_counter() - started) / len(batch)
+            size = int(min(batch_size, max(1, remaining // max(per_source, 1e-9))))
+    return trees
@@ -0,0 +1,54 @@
+from typing import Any, Union
+from datetime import date, datetime
+import msgpack
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+
+# NumPy arrays are written straight from their buffers instead of via lists
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Wire encodings a WebSocket client may request
+ENCODINGS = ("json", "msgpack")
+
+def _default(value: Any) -> Any:
+    """Encode types the JSON and MessagePack encoders do not handle themselves"""
+    if isinstance(value, np.ndarray):
+        # Arrays orjson cannot take directly (non-contiguous, object dtype)
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+def dumps(content: Any) -> bytes:
+    """UTF-8 JSON for ``content``, including NumPy arrays and scalars"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+def dumps_str(content: Any) -> str:
+    """``dumps`` as text, for SSE frames and WebSocket text messages"""
+    return dumps(content).decode("utf-8")
+
+def loads(data: Union[str, bytes]) -> Any:
+    return orjson.loads(data)
+
+def packb(content: Any) -> bytes:
+    """MessagePack for ``content``"""
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+def unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by ``dumps``
+
+    Returning one directly from a route also skips FastAPI's per-element
+    ``jsonable_encoder`` walk, so large payloads (and NumPy arrays) are
+    encoded in a single pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
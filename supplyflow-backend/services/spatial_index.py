@@ -0,0 +1,237 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from scipy.spatial import cKDTree
+
+from services.change_feed import GraphChange
+
+# Mean Earth radius used for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Staged changes tolerated before the trees are rebuilt, as a share of indexed nodes
+REBUILD_FRACTION = 0.05
+MIN_REBUILD_CHANGES = 64
+
+def to_unit_vectors(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Points on the unit sphere; straight-line (chord) distance grows monotonically with great-circle distance"""
+    lat = np.radians(lat)
+    lng = np.radians(lng)
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)])
+
+def chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+def km_to_chord(km: float) -> float:
+    return 2 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+def validate_point(lat: float, lng: float):
+    if not -90 <= lat <= 90:
+        raise ValueError(f"Latitude {lat} out of range [-90, 90]")
+    if not -180 <= lng <= 180:
+        raise ValueError(f"Longitude {lng} out of range [-180, 180]")
+
+class _Points:
+    """Node ids with coordinates, a k-d tree on their unit vectors and a latitude-sorted order"""
+
+    def __init__(self, ids: List[str], lat: np.ndarray, lng: np.ndarray):
+        self.ids = ids
+        self.lat = lat
+        self.lng = lng
+        self.tree = cKDTree(to_unit_vectors(lat, lng)) if ids else None
+        self.by_lat = np.argsort(lat, kind="stable")
+        self.sorted_lat = lat[self.by_lat]
+
+class SpatialIndex:
+    """Nearest, radius and bounding-box queries over node locations
+
+    One k-d tree per node type (plus one over all nodes) is built on 3-D
+    unit vectors, so Euclidean nearest neighbours are great-circle nearest
+    neighbours with no projection distortion. Node changes from the graph
+    change feed are staged in a small overlay, searched by brute force,
+    and folded into the trees once the overlay grows past a fraction of
+    the index.
+    """
+
+    def __init__(self, nodes: Callable[[], Iterable[Dict[str, Any]]]):
+        self._nodes = nodes
+        self._all: Optional[_Points] = None
+        self._by_type: Dict[str, _Points] = {}
+        # Node id -> (lat, lng, type) as of the last build
+        self._indexed: Dict[str, Tuple[float, float, Optional[str]]] = {}
+        # Overlay since the last build: ids hidden from the trees and re-staged records
+        self._removed: Set[str] = set()
+        self._staged: Dict[str, Tuple[float, float, Optional[str]]] = {}
+        self._dirty = True
+        self.builds = 0
+
+    def apply_change(self, change: GraphChange):
+        """Change feed subscriber: only node changes can move a location"""
+        if change.kind == "network_loaded":
+            self._dirty = True
+        elif change.kind in ("node_added", "node_updated"):
+            self._stage(change.entity_id, change.record)
+        elif change.kind == "node_removed":
+            self._stage(change.entity_id, None)
+
+    def reset(self, change: GraphChange):
+        """Rebuild from the node records on the next query"""
+        self._dirty = True
+
+    def nearest(self, lat: float, lng: float, k: int = 5, node_type: Optional[str] = None) -> List[Tuple[str, float]]:
+        """The ``k`` closest nodes as (node id, distance km), nearest first"""
+        validate_point(lat, lng)
+        points = self._current(node_type)
+        target = to_unit_vectors(np.array([lat]), np.array([lng]))[0]
+
+        candidates: List[Tuple[float, str]] = []
+        if points is not None and points.tree is not None:
+            # Ask for enough extra neighbours to survive hidden ids
+            wanted = min(len(points.ids), k + len(self._removed))
+            chords, positions = points.tree.query(target, k=wanted)
+            chords, positions = np.atleast_1d(chords), np.atleast_1d(positions)
+            candidates.extend(
+                (chord, points.ids[position])
+                for chord, position in zip(chords.tolist(), positions.tolist())
+                if points.ids[position] not in self._removed
+            )
+        candidates.extend(self._staged_matches(target, node_type))
+        candidates.sort()
+        return [(node_id, float(chord_to_km(chord))) for chord, node_id in candidates[:k]]
+
+    def within(self, lat: float, lng: float, radius_km: float, node_type: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Every node within ``radius_km`` as (node id, distance km), nearest first"""
+        validate_point(lat, lng)
+        if radius_km < 0:
+            raise ValueError("radius_km must be non-negative")
+        points = self._current(node_type)
+        target = to_unit_vectors(np.array([lat]), np.array([lng]))[0]
+        limit = km_to_chord(radius_km)
+
+        candidates: List[Tuple[float, str]] = []
+        if points is not None and points.tree is not None:
+            positions = points.tree.query_ball_point(target, limit)
+            if positions:
+                chords = np.linalg.norm(points.tree.data[positions] - target, axis=1)
+                candidates.extend(
+                    (chord, points.ids[position])
+                    for chord, position in zip(chords.tolist(), positions)
+                    if points.ids[position] not in self._removed
+                )
+        candidates.extend(item for item in self._staged_matches(target, node_type) if item[0] <= limit)
+        candidates.sort()
+        return [(node_id, float(chord_to_km(chord))) for chord, node_id in candidates]
+
+    def in_bbox(
+        self,
+        min_lat: float,
+        min_lng: float,
+        max_lat: float,
+        max_lng: float,
+        node_type: Optional[str] = None
+    ) -> List[str]:
+        """Node ids inside a lat/lng box; ``min_lng > max_lng`` means the box crosses the antimeridian"""
+        validate_point(min_lat, min_lng)
+        validate_point(max_lat, max_lng)
+        if min_lat > max_lat:
+            raise ValueError("min_lat must not exceed max_lat")
+        points = self._current(node_type)
+
+        matches: List[str] = []
+        if points is not None and points.ids:
+            # Latitude band by binary search, then a vectorized longitude filter
+            start = np.searchsorted(points.sorted_lat, min_lat, side="left")
+            stop = np.searchsorted(points.sorted_lat, max_lat, side="right")
+            band = points.by_lat[start:stop]
+            lng = points.lng[band]
+            inside = _lng_inside(lng, min_lng, max_lng)
+            matches.extend(
+                points.ids[position] for position in band[inside].tolist()
+                if points.ids[position] not in self._removed
+            )
+        for node_id, (lat, lng, staged_type) in self._staged.items():
+            if node_type is not None and staged_type != node_type:
+                continue
+            if min_lat <= lat <= max_lat and _lng_inside(np.array([lng]), min_lng, max_lng)[0]:
+                matches.append(node_id)
+        return matches
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "indexed_nodes": len(self._indexed),
+            "staged_changes": len(self._staged) + len(self._removed),
+            "builds": self.builds
+        }
+
+    def _stage(self, node_id: str, node: Optional[Dict[str, Any]]):
+        point = _coordinates(node) if node is not None else None
+        entry = (*point, node.get("type")) if point is not None else None
+        # Updates that leave location and type alone (stock, capacity, ...) cost nothing
+        if entry is not None and node_id not in self._removed and self._indexed.get(node_id) == entry:
+            return
+        if node_id in self._indexed:
+            self._removed.add(node_id)
+        self._staged.pop(node_id, None)
+        if entry is not None:
+            self._staged[node_id] = entry
+
+    def _current(self, node_type: Optional[str]) -> Optional[_Points]:
+        """Trees for ``node_type``, rebuilt first when the overlay has grown too large"""
+        pending = len(self._staged) + len(self._removed)
+        if self._dirty or pending > max(MIN_REBUILD_CHANGES, REBUILD_FRACTION * len(self._indexed)):
+            self._build()
+        return self._all if node_type is None else self._by_type.get(node_type)
+
+    def _build(self):
+        ids: List[str] = []
+        lats: List[float] = []
+        lngs: List[float] = []
+        types: List[Optional[str]] = []
+        for node in self._nodes():
+            point = _coordinates(node)
+            if point is not None:
+                ids.append(node["id"])
+                lats.append(point[0])
+                lngs.append(point[1])
+                types.append(node.get("type"))
+
+        lat = np.asarray(lats, dtype=np.float64)
+        lng = np.asarray(lngs, dtype=np.float64)
+        node_types = np.asarray(types, dtype=object)
+        self._all = _Points(ids, lat, lng)
+        self._by_type = {}
+        for node_type in set(types) - {None}:
+            mask = node_types == node_type
+            self._by_type[node_type] = _Points([ids[i] for i in np.flatnonzero(mask).tolist()], lat[mask], lng[mask])
+
+        self._indexed = dict(zip(ids, zip(lats, lngs, types)))
+        self._removed = set()
+        self._staged = {}
+        self._dirty = False
+        self.builds += 1
+
+    def _staged_matches(self, target: np.ndarray, node_type: Optional[str]) -> List[Tuple[float, str]]:
+        staged = [
+            (node_id, lat, lng) for node_id, (lat, lng, staged_type) in self._staged.items()
+            if node_type is None or staged_type == node_type
+        ]
+        if not staged:
+            return []
+        vectors = to_unit_vectors(np.array([s[1] for s in staged]), np.array([s[2] for s in staged]))
+        chords = np.linalg.norm(vectors - target, axis=1)
+        return [(chord, item[0]) for chord, item in zip(chords.tolist(), staged)]
+
+def _coordinates(node: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """(lat, lng) of a node record, or None when it has no usable location"""
+    location = node.get("location") or {}
+    try:
+        lat, lng = float(location["lat"]), float(location["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+def _lng_inside(lng: np.ndarray, min_lng: float, max_lng: float) -> np.ndarray:
+    if min_lng <= max_lng:
+        return (lng >= min_lng) & (lng <= max_lng)
+    return (lng >= min_lng) | (lng <= max_lng)
@@ -0,0 +1,167 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import json
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from services.broadcaster import Broadcaster, Subscription
+from services.serialization import ENCODINGS, dumps_str, loads, packb, unpackb
+
+class WebSocketSession:
+    """Multiplexes concurrent requests and push subscriptions over one WebSocket
+
+    Every message may carry an ``id``. Requests run concurrently (at most
+    ``max_concurrent`` at a time, and at most ``max_pending`` in flight) and
+    each reply is tagged with the id of the request it answers, so replies
+    can arrive out of order. ``{"type": "cancel", "id": ...}`` cancels a
+    request, and ``subscribe``/``unsubscribe`` start and stop pushing a
+    channel's events tagged with the subscription's id.
+
+    With ``encoding="msgpack"`` messages travel as binary MessagePack frames
+    in both directions instead of JSON text.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        channels: Optional[Dict[str, Broadcaster]] = None,
+        max_concurrent: int = 8,
+        max_pending: int = 64,
+        encoding: str = "json"
+    ):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding '{encoding}', expected one of {ENCODINGS}")
+        self.websocket = websocket
+        self.encoding = encoding
+        self.handler = handler
+        self.channels = channels or {}
+        self.max_pending = max(1, max_pending)
+        self._slots = asyncio.Semaphore(max(1, max_concurrent))
+        # Concurrent tasks share the socket, so sends are serialized
+        self._send_lock = asyncio.Lock()
+        self._requests: Dict[Any, asyncio.Task] = {}
+        self._subscriptions: Dict[Any, asyncio.Task] = {}
+
+    async def run(self):
+        """Read messages until the client disconnects, then cancel its work"""
+        try:
+            while True:
+                received = await self.websocket.receive()
+                if received["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(received.get("code", 1000))
+                try:
+                    if received.get("bytes") is not None:
+                        message = unpackb(received["bytes"]) if self.encoding == "msgpack" else loads(received["bytes"])
+                    else:
+                        message = loads(received["text"])
+                    if not isinstance(message, dict):
+                        raise ValueError("Message must be an object")
+                except Exception as e:
+                    await self.send({"type": "error", "message": f"Invalid message: {str(e)}"})
+                    continue
+                await self._dispatch(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in [*self._requests.values(), *self._subscriptions.values()]:
+                task.cancel()
+
+    async def send(self, message: Any):
+        """Send a message in the session's encoding; pre-serialized str/bytes go out as is"""
+        if not isinstance(message, (str, bytes)):
+            message = packb(message) if self.encoding == "msgpack" else dumps_str(message)
+        async with self._send_lock:
+            if isinstance(message, bytes):
+                await self.websocket.send_bytes(message)
+            else:
+                await self.websocket.send_text(message)
+
+    async def _dispatch(self, message: Dict[str, Any]):
+        request_id = message.get("id")
+        kind = message.get("type")
+
+        if not isinstance(request_id, (str, int, float, type(None))):
+            await self.send({"type": "error", "message": "Request id must be a string or number"})
+        elif kind == "cancel":
+            task = self._requests.get(request_id)
+            if task is None:
+                await self.send({"id": request_id, "type": "error", "message": "No such request in flight"})
+            else:
+                task.cancel()
+        elif kind == "subscribe":
+            await self._subscribe(request_id, message)
+        elif kind == "unsubscribe":
+            task = self._subscriptions.pop(request_id, None)
+            if task is not None:
+                task.cancel()
+            await self.send({"id": request_id, "type": "unsubscribed"})
+        elif request_id is not None and (request_id in self._requests or request_id in self._subscriptions):
+            await self.send({"id": request_id, "type": "error", "message": "Request id already in use"})
+        elif len(self._requests) >= self.max_pending:
+            await self.send({"id": request_id, "type": "error", "message": "Too many requests in flight"})
+        else:
+            # Requests without an id are still served, just without correlation
+            key = request_id if request_id is not None else object()
+            self._requests[key] = asyncio.create_task(self._serve(key, request_id, message))
+
+    async def _serve(self, key: Any, request_id: Any, message: Dict[str, Any]):
+        try:
+            async with self._slots:
+                response = await self.handler(message)
+            reply = {"id": request_id, **response} if request_id is not None else response
+        except asyncio.CancelledError:
+            reply = {"id": request_id, "type": "cancelled"}
+        except Exception as e:
+            reply = {"id": request_id, "type": "error", "message": str(e)}
+        finally:
+            self._requests.pop(key, None)
+
+        try:
+            await self.send(reply)
+        except Exception:
+            # The socket closed while the request ran
+            pass
+
+    async def _subscribe(self, subscription_id: Any, message: Dict[str, Any]):
+        channel = message.get("channel")
+        if subscription_id is None:
+            await self.send({"type": "error", "message": "subscribe requires an id"})
+        elif channel not in self.channels:
+            await self.send({
+                "id": subscription_id,
+                "type": "error",
+                "message": f"Unknown channel '{channel}', expected one of {list(self.channels)}"
+            })
+        elif subscription_id in self._subscriptions or subscription_id in self._requests:
+            await self.send({"id": subscription_id, "type": "error", "message": "Request id already in use"})
+        else:
+            broadcaster = self.channels[channel]
+            await self.send({"id": subscription_id, "type": "subscribed", "channel": channel})
+            last_event_id = message.get("last_event_id")
+            subscription = broadcaster.subscribe(str(last_event_id) if last_event_id is not None else None)
+            self._subscriptions[subscription_id] = asyncio.create_task(
+                self._push(subscription_id, channel, broadcaster, subscription)
+            )
+
+    async def _push(self, subscription_id: Any, channel: str, broadcaster: Broadcaster, subscription: Subscription):
+        """Forward a channel's events, reusing each event's already serialized data"""
+        prefix = dumps_str({"id": subscription_id, "type": "push", "channel": channel})[:-1]
+        last_event_id = None
+        try:
+            async for event in subscription:
+                if self.encoding == "msgpack":
+                    header = {"id": subscription_id, "type": "push", "channel": channel, "event": event.event, "event_id": event.id}
+                    await self.send(event.packed(header))
+                else:
+                    await self.send(f'{prefix},"event":{json.dumps(event.event)},"event_id":{event.id},"data":{event.data}}}')
+                last_event_id = event.id
+            # The subscriber fell behind; it can resubscribe with last_event_id
+            if self._subscriptions.pop(subscription_id, None) is not None:
+                await self.send({
+                    "id": subscription_id,
+                    "type": "subscription_closed",
+                    "channel": channel,
+                    "last_event_id": last_event_id
+                })
+        finally:
+            broadcaster.unsubscribe(subscription)
@@ -0,0 +1,120 @@
+"""
+K-shortest (Yen) and backup paths against networkx
+"""
+
+import itertools
+import math
+import networkx as nx
+import numpy as np
+
+from services.alternative_paths import AlternativePathCache, compute_alternative_paths
+from services.graph_engine import CompiledGraph
+
+CRITERION_ATTRIBUTES = {"shortest_distance": "distance", "lowest_cost": "cost", "fastest_time": "duration"}
+
+def random_graph(rng, num_nodes=12, num_edges=40):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(f"n{i}" for i in range(num_nodes))
+    while graph.number_of_edges() < num_edges:
+        source, target = rng.integers(0, num_nodes, 2).tolist()
+        if source != target:
+            graph.add_edge(
+                f"n{source}", f"n{target}",
+                distance=float(rng.integers(1, 100)),
+                cost=float(rng.integers(1, 100)),
+                duration=float(rng.integers(1, 30)),
+                risk_score=round(float(rng.random() * 0.4), 3)
+            )
+    return graph
+
+def path_cost(graph, path, criterion):
+    edges = [graph.edges[u, v] for u, v in zip(path, path[1:])]
+    if criterion == "lowest_risk":
+        return sum(-math.log1p(-edge["risk_score"]) for edge in edges)
+    return sum(edge[CRITERION_ATTRIBUTES[criterion]] for edge in edges)
+
+def test_k_shortest_matches_shortest_simple_paths():
+    checked = 0
+    for seed in range(60):
+        rng = np.random.default_rng(seed)
+        graph = random_graph(rng)
+        compiled = CompiledGraph.from_networkx(graph)
+        source, target = rng.choice(compiled.number_of_nodes(), 2, replace=False).tolist()
+        criterion = ("shortest_distance", "lowest_cost", "fastest_time", "lowest_risk")[seed % 4]
+        result = compute_alternative_paths(compiled, source, target, criterion, k=6, backups=0)
+
+        source_id, target_id = compiled.node_ids[source], compiled.node_ids[target]
+        if not nx.has_path(graph, source_id, target_id):
+            assert result["status"] == "no_path" and result["k_shortest"] == []
+            continue
+
+        weight = (lambda u, v, edge: -math.log1p(-edge["risk_score"])) if criterion == "lowest_risk" else CRITERION_ATTRIBUTES[criterion]
+        expected = [
+            path_cost(graph, path, criterion)
+            for path in itertools.islice(nx.shortest_simple_paths(graph, source_id, target_id, weight=weight), 6)
+        ]
+        paths = [entry["path"] for entry in result["k_shortest"]]
+        # Ties may be broken differently, so compare costs rank by rank
+        assert len(paths) == len(expected)
+        assert np.allclose([path_cost(graph, path, criterion) for path in paths], expected)
+        assert len({tuple(path) for path in paths}) == len(paths)
+        for entry in result["k_shortest"]:
+            path = entry["path"]
+            assert path[0] == source_id and path[-1] == target_id
+            assert len(set(path)) == len(path)
+            assert entry["edges"] == [graph.edges[u, v].get("id", f"{u}->{v}") for u, v in zip(path, path[1:])]
+        assert [entry["rank"] for entry in result["k_shortest"]] == list(range(1, len(paths) + 1))
+        checked += 1
+    assert checked >= 30
+
+def test_backups_avoid_the_primary_where_possible():
+    for seed in range(30):
+        rng = np.random.default_rng(200 + seed)
+        graph = random_graph(rng)
+        compiled = CompiledGraph.from_networkx(graph)
+        source, target = rng.choice(compiled.number_of_nodes(), 2, replace=False).tolist()
+        source_id, target_id = compiled.node_ids[source], compiled.node_ids[target]
+        if not nx.has_path(graph, source_id, target_id):
+            continue
+
+        for disjoint in ("edge", "node"):
+            result = compute_alternative_paths(compiled, source, target, "lowest_cost", k=1, backups=2, disjoint=disjoint)
+            primary = result["k_shortest"][0]["path"]
+            primary_edges = set(zip(primary, primary[1:]))
+            primary_inner = set(primary[1:-1])
+
+            # networkx decides whether a fully disjoint alternative exists
+            reduced = graph.copy()
+            reduced.remove_edges_from(primary_edges)
+            if disjoint == "node":
+                reduced.remove_nodes_from(primary_inner)
+            exists = nx.has_path(reduced, source_id, target_id)
+
+            backups = result["backups"]
+            if exists:
+                first = backups[0]
+                assert first["disjoint"]
+                # Cheapest among the disjoint paths
+                assert path_cost(graph, first["path"], "lowest_cost") == nx.shortest_path_length(
+                    reduced, source_id, target_id, weight="cost"
+                )
+            for backup in backups:
+                path = backup["path"]
+                shared_edges = len(set(zip(path, path[1:])) & primary_edges)
+                shared_nodes = len(set(path[1:-1]) & primary_inner)
+                assert backup["shared_edges_with_primary"] == shared_edges
+                assert backup["shared_nodes_with_primary"] == shared_nodes
+                assert path != primary
+            assert len({tuple(backup["path"]) for backup in backups}) == len(backups)
+
+def test_cache_serves_smaller_requests_and_drops_old_versions():
+    cache = AlternativePathCache(max_entries=2)
+    key = ("n0", "n1", "lowest_cost", "edge")
+    result = {"k_shortest": [1, 2, 3], "backups": [1]}
+    cache.put(1, key, 3, 2, result)
+    assert cache.get(1, key, 2, 1) == {"k_shortest": [1, 2], "backups": [1]}
+    # Only one backup exists, so asking for more is still answered
+    assert cache.get(1, key, 3, 5) is not None
+    assert cache.get(1, key, 4, 1) is None
+    assert cache.get(2, key, 1, 1) is None
+    assert cache.stats()["cached_results"] == 0
@@ -0,0 +1,67 @@
+"""
+/analyze: concurrent stages with per-stage deadlines and status
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    root = tmp_path_factory.mktemp("analyze")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DEMAND_STORE_PATH", str(root / "demand"))
+        patch.setenv("DISRUPTION_LOG_PATH", str(root / "disruptions.db"))
+        with TestClient(main.app) as client:
+            yield client
+
+async def never_finishes(data):
+    await asyncio.sleep(60)
+
+async def fails(data):
+    raise RuntimeError("model offline")
+
+def test_every_stage_reports_ok(client):
+    response = client.post("/analyze", json={"source": "supplier_1", "target": "store_1"})
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["stages"]) == set(main.ANALYSIS_STAGES)
+    for stage, status in body["stages"].items():
+        assert status["status"] == "ok" and body[stage] is not None
+
+def test_slow_stage_times_out_without_holding_back_the_rest(client, monkeypatch):
+    monkeypatch.setitem(main.ANALYSIS_STAGES, "recommendations", never_finishes)
+    response = client.post("/analyze", json={"stage_timeouts": {"recommendations": 0.05}})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["recommendations"] is None
+    status = body["stages"]["recommendations"]
+    assert status["status"] == "timeout" and status["timeout_seconds"] == 0.05
+    assert status["duration_ms"] < 5000
+    assert body["stages"]["network_analysis"]["status"] == "ok" and body["network_analysis"] is not None
+
+def test_failed_stage_reports_its_error(client, monkeypatch):
+    monkeypatch.setitem(main.ANALYSIS_STAGES, "disruption_prediction", fails)
+    body = client.post("/analyze", json={"stages": ["disruption_prediction", "network_analysis"]}).json()
+    assert set(body["stages"]) == {"disruption_prediction", "network_analysis"}
+    assert body["disruption_prediction"] is None
+    assert body["stages"]["disruption_prediction"]["status"] == "error"
+    assert body["stages"]["disruption_prediction"]["error"] == "model offline"
+    assert "optimal_routes" not in body
+
+def test_all_stages_failing_is_an_error(client, monkeypatch):
+    monkeypatch.setitem(main.ANALYSIS_STAGES, "recommendations", fails)
+    monkeypatch.setitem(main.ANALYSIS_STAGES, "optimal_routes", never_finishes)
+    response = client.post("/analyze", json={
+        "stages": ["recommendations", "optimal_routes"],
+        "stage_timeouts": {"optimal_routes": 0.05}
+    })
+    assert response.status_code == 500
+    assert "timeout" in response.json()["detail"] and "model offline" in response.json()["detail"]
+
+def test_unknown_stage_is_rejected(client):
+    response = client.post("/analyze", json={"stages": ["network_analysis", "bogus"]})
+    assert response.status_code == 400
+    assert "bogus" in response.json()["detail"]
@@ -0,0 +1,83 @@
+"""
+SSE fan-out: Last-Event-ID resume and slow-client handling
+"""
+
+import asyncio
+
+from services.broadcaster import Broadcaster
+
+async def produce():
+    return None
+
+def drain(subscription):
+    """Events already queued for a subscription, without waiting"""
+    events = []
+    while not subscription.queue.empty():
+        event = subscription.queue.get_nowait()
+        if event is None:
+            break
+        events.append(event)
+    return events
+
+def test_reconnect_resumes_after_last_event_id():
+    async def run():
+        broadcaster = Broadcaster(produce, snapshot=lambda: {"state": "full"}, queue_size=8, history=4)
+        for i in range(1, 6):
+            assert broadcaster.publish({"delta": i}) == i
+
+        resumed = drain(broadcaster.subscribe("3"))
+        assert [(event.id, event.payload) for event in resumed] == [(4, {"delta": 4}), (5, {"delta": 5})]
+        assert resumed[0].frame.startswith(b"id: 4\nevent: disruption_update\n")
+        # Nothing missed: nothing queued until the next publish
+        assert drain(broadcaster.subscribe("5")) == []
+
+        # New clients, ids older than the retained history and unknown ids start from a snapshot
+        for last_event_id in (None, "0", "99", "garbage"):
+            (event,) = drain(broadcaster.subscribe(last_event_id))
+            assert (event.id, event.event, event.payload) == (5, "snapshot", {"state": "full"})
+        assert broadcaster.subscribe(None).queue.get_nowait() is broadcaster.subscribe("0").queue.get_nowait()
+
+    asyncio.run(run())
+
+def test_long_gap_without_snapshot_sends_latest_event():
+    async def run():
+        broadcaster = Broadcaster(produce, queue_size=2, history=8)
+        for i in range(1, 6):
+            broadcaster.publish({"delta": i})
+        # Four missed events do not fit a queue of two
+        assert [event.id for event in drain(broadcaster.subscribe("1"))] == [5]
+        assert [event.id for event in drain(broadcaster.subscribe("4"))] == [5]
+
+    asyncio.run(run())
+
+def test_slow_client_is_dropped_and_others_keep_streaming():
+    async def run():
+        broadcaster = Broadcaster(produce, queue_size=3)
+        slow = broadcaster.subscribe()
+        fast = broadcaster.subscribe()
+
+        received = []
+        for i in range(1, 5):
+            broadcaster.publish({"delta": i})
+            received.extend(event.id for event in drain(fast))
+
+        assert received == [1, 2, 3, 4]
+        assert slow.closed
+        assert broadcaster.stats()["subscribers"] == 1
+        assert broadcaster.stats()["dropped_clients"] == 1
+        # The dropped stream ends instead of skipping frames
+        assert [event async for event in slow] == []
+
+        resumed = drain(broadcaster.subscribe("2"))
+        assert [event.id for event in resumed] == [3, 4]
+
+    asyncio.run(run())
+
+def test_multiline_payload_frames():
+    async def run():
+        broadcaster = Broadcaster(produce, retry_interval=2.5)
+        broadcaster.publish("first\nsecond", event="note")
+        (event,) = drain(broadcaster.subscribe())
+        assert event.frame == b'id: 1\nevent: note\nretry: 2500\ndata: "first\\nsecond"\n\n'
+
+    asyncio.run(run())
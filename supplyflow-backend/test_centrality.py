@@ -0,0 +1,84 @@
+"""
+Centrality: exact and sampled estimates against networkx, and the version-keyed cache
+"""
+
+import asyncio
+import networkx as nx
+import numpy as np
+import pytest
+
+from services.centrality import CentralityCache, compute_centrality
+from services.executor import WorkerPool
+from services.graph_engine import CompiledGraph
+
+def random_graph(num_nodes, num_edges, seed, version=0):
+    graph = nx.gnm_random_graph(num_nodes, num_edges, seed=seed, directed=True)
+    graph = nx.relabel_nodes(graph, {i: f"n{i}" for i in graph.nodes()})
+    return graph, CompiledGraph.from_networkx(graph, version=version)
+
+def as_array(compiled, values):
+    return np.array([values[node_id] for node_id in compiled.node_ids])
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_exact_centrality_matches_networkx(seed):
+    graph, compiled = random_graph(25, 70, seed)
+    result = compute_centrality(compiled, samples=25)
+    assert result["method"] == "exact" and result["samples"] == 25
+    assert np.allclose(as_array(compiled, result["betweenness"]), as_array(compiled, nx.betweenness_centrality(graph)))
+    assert np.allclose(as_array(compiled, result["closeness"]), as_array(compiled, nx.closeness_centrality(graph)))
+
+def test_pivots_covering_every_node_are_exact():
+    graph, compiled = random_graph(20, 50, seed=4)
+    every = list(range(compiled.number_of_nodes()))
+    assert np.allclose(compiled.betweenness_centrality(sources=every), as_array(compiled, nx.betweenness_centrality(graph)))
+    assert np.allclose(compiled.closeness_from_pivots(every), as_array(compiled, nx.closeness_centrality(graph)))
+
+def test_sampled_centrality_tracks_exact_values():
+    graph, compiled = random_graph(300, 1500, seed=5)
+    exact_betweenness = as_array(compiled, nx.betweenness_centrality(graph))
+    exact_closeness = as_array(compiled, nx.closeness_centrality(graph))
+
+    result = compute_centrality(compiled, samples=150, seed=1)
+    assert result["method"] == "sampled" and result["samples"] == 150
+    betweenness = as_array(compiled, result["betweenness"])
+    closeness = as_array(compiled, result["closeness"])
+
+    # Mean error is a small fraction of the typical value and most of the top nodes agree
+    assert np.abs(betweenness - exact_betweenness).mean() < 0.25 * exact_betweenness.mean()
+    assert np.abs(closeness - exact_closeness).mean() < 0.05 * exact_closeness.mean()
+    top = set(np.argsort(exact_betweenness)[-10:].tolist())
+    assert len(top & set(np.argsort(betweenness)[-10:].tolist())) >= 7
+    # Same seed, same pivots
+    assert compute_centrality(compiled, samples=150, seed=1)["betweenness"] == result["betweenness"]
+
+def test_sample_size_follows_epsilon():
+    cache = CentralityCache(epsilon=0.1, pool=WorkerPool("thread", max_workers=1))
+    assert cache.sample_size(2) == 2
+    assert cache.sample_size(100) == 100
+    assert cache.sample_size(10_000) == 922
+    assert CentralityCache(epsilon=0, pool=cache.pool).sample_size(10_000) == 10_000
+    cache.pool.shutdown()
+
+def test_cache_serves_stale_results_while_recomputing():
+    async def scenario():
+        pool = WorkerPool("thread", max_workers=1)
+        cache = CentralityCache(epsilon=0.5, seed=0, pool=pool)
+        _, first = random_graph(40, 120, seed=6, version=1)
+        _, second = random_graph(40, 130, seed=7, version=2)
+
+        result = await cache.ensure(first)
+        assert result["version"] == 1 and cache.get(1) is result
+
+        # A topology change is served the old values, flagged stale, until the recompute lands
+        served = await cache.ensure(second)
+        assert served is result
+        assert cache.recomputing
+        staleness = cache.staleness(served, second.version)
+        assert staleness["stale"] and staleness["computed_for_version"] == 1 and staleness["recomputing"]
+
+        await cache._task
+        assert cache.latest()["version"] == 2 and cache.get(1) is None
+        assert not cache.staleness(cache.latest(), 2)["stale"]
+        pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,91 @@
+"""
+Memory-mapped demand store: reopening, late rows and crash recovery
+"""
+
+import os
+import pickle
+import numpy as np
+import pytest
+
+from services.demand_store import DemandStore, DATE_DTYPE, to_store_dates
+
+KEY = ("North", "Electronics")
+
+def days(*values):
+    return to_store_dates([f"2026-01-{value:02d}" for value in values])
+
+def read(store, key=KEY):
+    rows, generation = store.partitions()[key]
+    dates, demand = store.columns(key, rows, generation)
+    return np.array(dates), np.array(demand)
+
+def test_reopen_sees_committed_rows(tmp_path):
+    store = DemandStore(str(tmp_path))
+    assert store.append({KEY: (days(1, 2, 3), [10.0, 11.0, 12.0])}) == 1
+    assert store.append({KEY: (days(4, 5), [13.0, 14.0]), ("South", "Food"): (days(1), [5.0])}) == 2
+
+    reopened = DemandStore(str(tmp_path))
+    assert reopened.version == 2
+    assert reopened.partitions() == {KEY: (5, 0), ("South", "Food"): (1, 0)}
+    dates, demand = read(reopened)
+    assert dates.tolist() == days(1, 2, 3, 4, 5).tolist()
+    assert demand.tolist() == [10.0, 11.0, 12.0, 13.0, 14.0]
+    # Workers reopen from the path rather than receiving mapped arrays
+    assert read(pickle.loads(pickle.dumps(reopened)))[1].tolist() == demand.tolist()
+
+def test_snapshot_ignores_later_appends(tmp_path):
+    store = DemandStore(str(tmp_path))
+    store.append({KEY: (days(1, 2), [1.0, 2.0])})
+    rows, generation = store.partitions()[KEY]
+    store.append({KEY: (days(3), [3.0])})
+    assert store.columns(KEY, rows, generation)[1].tolist() == [1.0, 2.0]
+
+def test_out_of_order_rows_rewrite_a_new_generation(tmp_path):
+    store = DemandStore(str(tmp_path))
+    store.append({KEY: (days(1, 3, 5), [1.0, 3.0, 5.0])})
+    old = store.partitions()[KEY]
+    old_dates, old_demand = store.columns(KEY, *old)
+
+    store.append({KEY: (days(4, 2), [4.0, 2.0])})
+    assert store.partitions()[KEY] == (5, 1)
+    dates, demand = read(store)
+    assert dates.tolist() == days(1, 2, 3, 4, 5).tolist()
+    assert demand.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    # The previous generation stays readable for snapshots already handed out
+    assert old_demand.tolist() == [1.0, 3.0, 5.0]
+    directory = store._partition_dir(KEY)
+    assert sorted(os.listdir(directory)) == ["dates.0.bin", "dates.1.bin", "demand.0.bin", "demand.1.bin"]
+
+    # The next rewrite retires generation 0
+    store.append({KEY: (days(1), [0.5])})
+    assert store.partitions()[KEY] == (6, 2)
+    assert sorted(os.listdir(directory)) == ["dates.1.bin", "dates.2.bin", "demand.1.bin", "demand.2.bin"]
+    assert DemandStore(str(tmp_path)).partitions()[KEY] == (6, 2)
+    assert read(DemandStore(str(tmp_path)))[1].tolist() == [1.0, 0.5, 2.0, 3.0, 4.0, 5.0]
+
+def test_truncated_tail_is_dropped_on_reopen(tmp_path):
+    store = DemandStore(str(tmp_path))
+    store.append({KEY: (days(1, 2), [1.0, 2.0])})
+    directory = store._partition_dir(KEY)
+
+    # An append that crashed before its manifest write leaves stray, partial bytes
+    with open(store._column_path(directory, "dates", 0), "ab") as f:
+        f.write(days(3).tobytes() + b"\x01\x02\x03")
+    with open(store._column_path(directory, "demand", 0), "ab") as f:
+        f.write(b"\x09" * 5)
+
+    reopened = DemandStore(str(tmp_path))
+    assert reopened.partitions()[KEY] == (2, 0)
+    assert read(reopened)[1].tolist() == [1.0, 2.0]
+
+    reopened.append({KEY: (days(4), [4.0])})
+    dates, demand = read(DemandStore(str(tmp_path)))
+    assert dates.tolist() == days(1, 2, 4).tolist()
+    assert demand.tolist() == [1.0, 2.0, 4.0]
+    assert os.path.getsize(reopened._column_path(directory, "dates", 0)) == 3 * DATE_DTYPE.itemsize
+
+def test_mismatched_columns_are_rejected(tmp_path):
+    store = DemandStore(str(tmp_path))
+    with pytest.raises(ValueError, match="lengths differ"):
+        store.append({KEY: (days(1, 2), [1.0])})
+    assert store.version == 0
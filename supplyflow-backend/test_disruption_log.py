@@ -0,0 +1,98 @@
+"""
+Disruption event log snapshots and replay
+"""
+
+import asyncio
+import logging
+import sqlite3
+
+from services.disruption_log import DisruptionLog
+from services.disruption_service import DisruptionService
+
+def ids(disruptions):
+    return [d["id"] for d in disruptions]
+
+def test_log_replay_round_trip(tmp_path):
+    path = str(tmp_path / "disruptions.db")
+
+    async def record():
+        service = DisruptionService(log_path=path, snapshot_every=4)
+        await service.load_sample_data()
+        for i in range(6):
+            await service.create_disruption({"title": f"Event {i}", "severity": "low", "affected_routes": [f"r{i}"]})
+        await service.update_disruption("d_004", {"severity": "critical"})
+        await service.resolve_disruption("d_005")
+        active = ids(await service.get_active_disruptions())
+        state = service.store.state()
+        service.close()
+        return active, state
+
+    active, state = asyncio.run(record())
+
+    async def replay():
+        service = DisruptionService(log_path=path, snapshot_every=4)
+        await service.load_sample_data()
+        try:
+            return service, ids(await service.get_active_disruptions())
+        finally:
+            service.close()
+
+    service, replayed = asyncio.run(replay())
+    # Sample data is only seeded into an empty log
+    assert replayed == active
+    assert service.store.state() == state
+    assert service.store.get("d_004")["severity"] == "critical"
+    assert service.store.get("d_005")["status"] == "resolved"
+    assert service.store.next_id() == "d_010"
+
+def count_events(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+def test_snapshots_compact_the_log_and_close_writes_one(tmp_path):
+    path = str(tmp_path / "disruptions.db")
+
+    async def record():
+        service = DisruptionService(log_path=path, snapshot_every=4)
+        await service.load_sample_data()
+        for i in range(6):
+            await service.create_disruption({"title": f"Event {i}"})
+        # Every snapshot dropped the events behind it
+        service.log.flush()
+        assert count_events(path) == service.log.events_since_snapshot < 4
+        last_seq = service.log.last_seq
+        service.close()
+        return last_seq
+
+    last_seq = asyncio.run(record())
+    assert count_events(path) == 0
+    log = DisruptionLog(path)
+    state, events = log.load()
+    assert state is not None and events == []
+    # Numbering carries on past the snapshot even with no events left
+    assert log.append("updated", "d_001", {"severity": "low"}) == last_seq + 1
+    log.close()
+
+def test_replay_skips_orphan_events(tmp_path, caplog):
+    path = str(tmp_path / "disruptions.db")
+    log = DisruptionLog(path)
+    log.append("created", "d_001", {"id": "d_001", "title": "Kept", "status": "active"})
+    log.append("updated", "d_404", {"severity": "high"})
+    log.append("resolved", "d_001", {"status": "resolved"})
+    log.append("resolved", "d_001", {"status": "resolved"})
+    log.close()
+
+    async def replay():
+        service = DisruptionService(log_path=path)
+        with caplog.at_level(logging.WARNING, logger="services.disruption_service"):
+            await service.load_sample_data()
+        service.close()
+        return service
+
+    service = asyncio.run(replay())
+    assert service.store.get("d_001")["status"] == "resolved"
+    skipped = [record.getMessage() for record in caplog.records]
+    assert skipped == [
+        "Skipping event 2: updated of unknown or resolved disruption d_404",
+        "Skipping event 4: resolved of unknown or resolved disruption d_001"
+    ]
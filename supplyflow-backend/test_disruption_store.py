@@ -0,0 +1,59 @@
+"""
+Disruption store indexes and state round trips
+"""
+
+from datetime import datetime, timedelta
+
+from services.disruption_store import DisruptionStore
+
+def disruption(disruption_id, hours_ago, severity="high", disruption_type="weather", routes=("r1",)):
+    return {
+        "id": disruption_id,
+        "title": disruption_id,
+        "type": disruption_type,
+        "severity": severity,
+        "start_time": (datetime(2024, 1, 2) - timedelta(hours=hours_ago)).isoformat(),
+        "affected_routes": list(routes),
+        "financial_impact": "$1M per day",
+        "status": "active"
+    }
+
+def ids(disruptions):
+    return [d["id"] for d in disruptions]
+
+def test_store_indexes_follow_updates_and_resolves():
+    store = DisruptionStore()
+    store.add(disruption("d_001", 30, "critical", "infrastructure", ("r1", "r2")))
+    store.add(disruption("d_002", 20, "high", "weather", ("r2",)))
+    store.add(disruption("d_003", 10, "high", "weather", ("r3",)))
+
+    assert ids(store.query(route="r2")) == ["d_001", "d_002"]
+    assert ids(store.query(severity="high", disruption_type="weather")) == ["d_002", "d_003"]
+    assert ids(store.query(route="r2", severity="high")) == ["d_002"]
+    assert ids(store.query(limit=1)) == ["d_001"]
+
+    store.update("d_002", {"affected_routes": ["r3"], "severity": "low"})
+    assert ids(store.query(route="r2")) == ["d_001"]
+    assert ids(store.query(route="r3")) == ["d_002", "d_003"]
+    assert store.severity_counts["low"] == 1 and store.severity_counts["high"] == 1
+
+    # Moving the start time reorders the timeline
+    store.update("d_003", {"start_time": datetime(2023, 12, 1).isoformat()})
+    assert ids(store.query(route="r3")) == ["d_003", "d_002"]
+
+    store.resolve("d_001", {"status": "resolved"})
+    assert ids(store.query(route="r2")) == []
+    assert store.get("d_001")["status"] == "resolved"
+    assert store.next_id() == "d_004"
+
+def test_store_state_round_trip():
+    store = DisruptionStore()
+    for i in range(1, 6):
+        store.add(disruption(f"d_00{i}", i * 5, routes=(f"r{i % 2}",)))
+    store.resolve("d_002", {"status": "resolved"})
+
+    restored = DisruptionStore.from_state(store.state())
+    assert ids(restored.active()) == ids(store.active())
+    assert ids(restored.query(route="r1")) == ids(store.query(route="r1"))
+    assert restored.get("d_002")["status"] == "resolved"
+    assert restored.next_id() == store.next_id()
@@ -0,0 +1,66 @@
+"""
+Worker pool slots and shared graph snapshots
+"""
+
+import asyncio
+import os
+import time
+import pytest
+
+from services.executor import WorkerPool, WorkerPoolBusy, WorkerTimeout
+from services.graph_engine import CompiledGraph
+
+def small_graph(version, weight):
+    weights = {attr: [weight, weight] for attr in ("distance", "cost", "duration", "risk_score")}
+    return CompiledGraph.from_arrays(["a", "b", "c"], [0, 1], [1, 2], ["e0", "e1"], weights, version=version)
+
+def slow_total(graph, seconds):
+    time.sleep(seconds)
+    return float(graph.weights["cost"].sum())
+
+def segments_exist(names):
+    return [os.path.exists(f"/dev/shm/{name.lstrip('/')}") for name in names]
+
+def test_timed_out_task_keeps_its_slot():
+    async def scenario():
+        pool = WorkerPool("thread", max_workers=1, max_pending=1)
+        with pytest.raises(WorkerTimeout):
+            await pool.run(time.sleep, 0.3, timeout=0.05)
+        # The sleep is still running, so the only slot is taken
+        with pytest.raises(WorkerPoolBusy):
+            await pool.run(time.sleep, 0, timeout=0.05)
+        await asyncio.sleep(0.4)
+        await pool.run(time.sleep, 0, timeout=1)
+        assert pool.stats()["timed_out"] == 1
+        assert pool.stats()["rejected"] == 1
+        pool.shutdown()
+
+    asyncio.run(scenario())
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs POSIX shared memory")
+def test_snapshots_outlive_tasks_using_them():
+    async def scenario():
+        pool = WorkerPool("process", max_workers=2, max_pending=8, default_timeout=60)
+        try:
+            # Warm the workers so spawn time does not eat the sleeps below
+            await asyncio.gather(*(pool.run(time.sleep, 0) for _ in range(2)))
+            first = small_graph(1, 1.0)
+            slow = asyncio.ensure_future(pool.run(slow_total, first, 1.0))
+            await asyncio.sleep(0.1)
+            published = pool._published
+            names = [segment.name for segment in published.segments]
+
+            # Two newer snapshots while the slow task still holds the first
+            assert await pool.run(slow_total, small_graph(2, 2.0), 0) == 4.0
+            assert await pool.run(slow_total, small_graph(3, 3.0), 0) == 6.0
+            assert pool._retired == [published]
+            assert all(segments_exist(names))
+
+            assert await slow == 2.0
+            await asyncio.sleep(0.05)
+            assert pool._retired == []
+            assert not any(segments_exist(names))
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,193 @@
+"""
+Cached per-series forecast fits, batch forecasts and the simulated disruption monitor
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+
+from services.delta_feed import DeltaFeed
+from services.executor import WorkerPool
+from services.demand_store import DemandStore, to_store_dates
+from services.ml_service import (
+    FORECAST_MODELS, DemandHistory, ForecastModel, MLService, backtest, fit_series, resample_daily
+)
+
+def demand_series(length, seed=0):
+    rng = np.random.default_rng(seed)
+    days = np.arange(length)
+    return 100 + 10 * np.sin(2 * np.pi * days / 7) + rng.normal(0, 3, length)
+
+def test_appends_update_incrementally_and_edits_refit():
+    y = demand_series(94)
+    entry = fit_series("holt_winters", y[:80], None, 1)
+    assert entry["refit"] == "full"
+    assert fit_series("holt_winters", y[:80], entry, 2)["refit"] == "none"
+
+    grown = fit_series("holt_winters", y[:90], entry, 2)
+    assert grown["refit"] == "incremental"
+    assert grown["observations"] == 90
+    # Fewer new observations than the holdout: the scored metrics are kept
+    assert grown["metrics"] == entry["metrics"] and grown["scored_observations"] == 80
+    # Once the holdout is all new data, accuracy is scored on it
+    grown = fit_series("holt_winters", y, grown, 2)
+    assert grown["refit"] == "incremental"
+    assert grown["metrics"] == backtest("holt_winters", y)
+    assert grown["metrics"] != entry["metrics"] and grown["scored_observations"] == 94
+
+    # An edit inside the fitted prefix that keeps its sum still forces a full refit
+    edited = y.copy()
+    edited[3] += 5
+    edited[4] -= 5
+    assert fit_series("holt_winters", edited, grown, 3)["refit"] == "full"
+
+@pytest.mark.parametrize("model_name", ["holt_winters", "arima_lite", "gradient_boosting"])
+def test_short_series_fallback_moves_to_the_requested_model(model_name):
+    y = demand_series(120)
+    needed = FORECAST_MODELS[model_name]().min_observations
+    entry = fit_series(model_name, y[:needed - 1], None, 1)
+    assert entry["model_name"] == "moving_average"
+    # Still too short: the fallback is updated in place
+    assert fit_series(model_name, y[:needed - 1], entry, 1)["refit"] == "none"
+
+    grown = fit_series(model_name, y[:needed], entry, 2)
+    assert grown["model_name"] == model_name and grown["refit"] == "full"
+    assert fit_series(model_name, y[:needed + 5], grown, 3)["refit"] == "incremental"
+
+def test_series_are_resampled_to_days(tmp_path):
+    start = datetime(2024, 3, 1)
+    stamps = [start, start + timedelta(hours=5), start + timedelta(days=3), start + timedelta(days=4, hours=12)]
+    store = DemandStore(str(tmp_path / "demand"))
+    store.append({
+        ("europe", "electronics"): (to_store_dates(np.array(stamps, dtype="datetime64[s]")), np.array([10.0, 5.0, 7.0, 2.0])),
+        # Another series ends two days later, so every series runs to that day
+        ("asia", "electronics"): (to_store_dates(np.array([start + timedelta(days=6)], dtype="datetime64[s]")), np.array([4.0]))
+    })
+    history = DemandHistory(store)
+
+    # Same-day observations sum; days without any carry the last one forward
+    assert history.series("europe", "electronics").tolist() == [15.0, 15.0, 15.0, 7.0, 2.0, 2.0, 2.0]
+    assert history.all().tolist() == [15.0, 15.0, 15.0, 7.0, 2.0, 2.0, 4.0]
+    assert history.end_date() == start + timedelta(days=6)
+
+    # Appending later days only extends the series, so cached fits stay incremental
+    extended = resample_daily(to_store_dates(np.array(stamps, dtype="datetime64[s]")), np.array([10.0, 5.0, 7.0, 2.0]), 19800)
+    assert extended[:7].tolist() == history.series("europe", "electronics").tolist()
+
+def test_forecast_dates_follow_the_last_observed_day(tmp_path):
+    service = MLService(demand_store_path=str(tmp_path / "demand"))
+    asyncio.run(service.initialize_models())
+    result = asyncio.run(service.forecast_demand({"region": "asia", "product_category": "automotive", "forecast_days": 3}))
+
+    last_day = service.demand_history.end_date()
+    dates = [datetime.fromisoformat(row["date"]) for row in result["forecast"]]
+    assert dates == [last_day + timedelta(days=step) for step in (1, 2, 3)]
+    # One sample per day from the first observation, however sparse the observations
+    first_day = int(service.demand_history.columns(("asia", "automotive"))[0][0]) // 86400
+    assert result["model_info"]["training_samples"] == service.demand_history.end_day() - first_day + 1
+
+def test_models_must_implement_fit_and_predict():
+    class Partial(ForecastModel):
+        def fit(self, y):
+            return self
+
+    with pytest.raises(TypeError):
+        Partial()
+    for model_class in FORECAST_MODELS.values():
+        model_class()
+
+def test_monitored_disruptions_change_only_when_readings_move():
+    service = MLService()
+    first = asyncio.run(service.get_disruption_records())
+    assert [record["id"] for record in first] == ["live_1", "live_2"]
+
+    feed = DeltaFeed("disruption")
+    feed.apply(first)
+    changed = 0
+    for _ in range(50):
+        previous = {record["id"]: dict(record) for record in service.monitored_disruptions.values()}
+        delta = feed.apply(asyncio.run(service.get_disruption_records()))
+        if delta is None:
+            continue
+        assert not delta["added"] and not delta["removed"]
+        for record_id, fields in delta["changed"].items():
+            # A record only counts as changed when its probability actually moved
+            assert fields["probability"] != previous[record_id]["probability"]
+            changed += 1
+    # About one poll in five moves each record
+    assert 0 < changed < 50
+
+@pytest.fixture(scope="module")
+def trained_service(tmp_path_factory):
+    service = MLService(demand_store_path=str(tmp_path_factory.mktemp("batch") / "demand"))
+    asyncio.run(service.initialize_models())
+    return service
+
+@pytest.mark.parametrize("model", ["moving_average", "holt_winters"])
+def test_batch_forecast_matches_single_series_forecasts(trained_service, model):
+    requested = [
+        {"region": "asia", "product_category": "automotive", "forecast_days": 5},
+        {"region": "europe", "product_category": "electronics"},
+        {"region": "asia", "product_category": "automotive", "forecast_days": 2},
+        {"region": "atlantis", "product_category": "unknown", "forecast_days": 4}
+    ]
+    batch = asyncio.run(trained_service.forecast_demand_batch({"series": requested, "model": model, "forecast_days": 3}))
+    assert batch["model_info"] == {"model_type": model, "series_count": 4, "data_version": trained_service.demand_history.version}
+    assert [row["horizon"] for row in batch["series"]] == [5, 3, 2, 4]
+    assert len(batch["dates"]) == 5
+
+    for position, entry in enumerate(requested):
+        horizon = batch["series"][position]["horizon"]
+        single = asyncio.run(trained_service.forecast_demand({**entry, "model": model, "forecast_days": horizon}))
+        rows = single["forecast"]
+        assert batch["dates"][:horizon] == [row["date"] for row in rows]
+        assert np.asarray(batch["predicted_demand"][position]).tolist() == [row["predicted_demand"] for row in rows]
+        assert np.asarray(batch["lower"][position]).tolist() == [row["confidence_interval"]["lower"] for row in rows]
+        assert np.asarray(batch["upper"][position]).tolist() == [row["confidence_interval"]["upper"] for row in rows]
+        assert batch["series"][position]["training_samples"] == single["model_info"]["training_samples"]
+
+    # Unknown keys fall back to the global series
+    assert batch["series"][3]["training_samples"] == len(trained_service.demand_history.all())
+
+def test_batch_fits_each_distinct_series_once(trained_service):
+    trained_service.fitted_models.clear()
+    requested = [{"region": "asia", "product_category": "automotive"}] * 3 + [{"region": "europe", "product_category": "electronics"}]
+    asyncio.run(trained_service.forecast_demand_batch({"series": requested, "model": "arima_lite"}))
+    assert sorted(trained_service.fitted_models) == [
+        ("asia", "automotive", "arima_lite"), ("europe", "electronics", "arima_lite")
+    ]
+
+def test_batch_longer_than_one_task_timeout_succeeds(tmp_path):
+    start = np.datetime64("2024-01-01T00:00:00", "s")
+    dates = to_store_dates(start + np.arange(365).astype("timedelta64[D]"))
+    keys = [(f"region_{i}", "electronics") for i in range(200)]
+    DemandStore(str(tmp_path / "demand")).append({key: (dates, demand_series(365, seed=i)) for i, key in enumerate(keys)})
+
+    async def scenario():
+        pool = WorkerPool("thread", max_workers=1, default_timeout=0.75)
+        service = MLService(pool=pool, demand_store_path=str(tmp_path / "demand"))
+        await service.initialize_models()
+        requested = [{"region": region, "product_category": category} for region, category in keys]
+        started = time.perf_counter()
+        result = await service.forecast_demand_batch({"series": requested, "model": "holt_winters", "forecast_days": 7})
+        elapsed = time.perf_counter() - started
+        pool.shutdown()
+        return service, result, elapsed
+
+    service, result, elapsed = asyncio.run(scenario())
+    # The whole batch outlasts the task timeout; each chunk of it does not
+    assert elapsed > 0.75
+    assert len(result["predicted_demand"]) == 200
+    assert len(service.fitted_models) == 200
+
+@pytest.mark.parametrize("data,message", [
+    ({"series": []}, "at least one"),
+    ({"series": [{"region": "asia"}], "forecast_days": 0}, "forecast_days"),
+    ({"series": [{"region": "asia", "forecast_days": 1000}]}, "forecast_days"),
+    ({"series": [{"region": "asia"}], "model": "prophet"}, "Unknown model")
+])
+def test_batch_forecast_rejects_bad_requests(trained_service, data, message):
+    with pytest.raises(ValueError, match=message):
+        asyncio.run(trained_service.forecast_demand_batch(data))
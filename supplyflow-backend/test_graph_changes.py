@@ -0,0 +1,204 @@
+"""
+Graph mutations, the change feed and the caches that follow it
+"""
+
+import asyncio
+import numpy as np
+import pytest
+
+from services.change_feed import ChangeFeed, GraphChange
+from services.graph_engine import CompiledGraph, EDGE_ATTRIBUTES
+from services.graph_loader import network_from_records
+from services.graph_service import GraphService
+
+def route_totals(service, source, target):
+    """Criterion -> (distance, cost, duration) of the optimal routes; ties may pick different paths"""
+    result = asyncio.run(service.find_optimal_routes({"source": source, "target": target}))
+    return result["status"], {
+        route["optimization_type"]: (
+            route["metrics"]["total_distance"],
+            route["metrics"]["total_cost"],
+            route["metrics"]["total_duration"]
+        )
+        for route in result["optimal_routes"]
+    }
+
+def fresh_copy(service):
+    """A service loaded from scratch with the same nodes and edges"""
+    fresh = GraphService()
+    fresh.install_network(network_from_records(list(service.nodes_data.values()), list(service.edges_data.values())))
+    return fresh
+
+def test_mutations_keep_optimal_routes_consistent(build_service, random_edge):
+    service, rng = build_service()
+    pairs = [(f"n{a}", f"n{b}") for a, b in rng.integers(0, 30, (6, 2)).tolist() if a != b]
+    # Warm the route index so mutations have trees to invalidate
+    for source, target in pairs:
+        route_totals(service, source, target)
+
+    added = 0
+    for step in range(120):
+        choice = rng.random()
+        node_ids = list(service.nodes_data)
+        if choice < 0.3:
+            source, target = rng.choice(node_ids, 2, replace=False).tolist()
+            if any(e["source_id"] == source and e["target_id"] == target for e in service.edges_data.values()):
+                continue
+            added += 1
+            service.add_edge(random_edge(rng, f"x{added}", source, target))
+        elif choice < 0.55 and service.edges_data:
+            service.remove_edge(rng.choice(list(service.edges_data)))
+        elif choice < 0.85 and service.edges_data:
+            attr = ["distance", "cost", "duration", "risk_score"][int(rng.integers(0, 4))]
+            value = float(rng.random() * 0.5) if attr == "risk_score" else float(rng.integers(1, 2000))
+            service.update_edge(rng.choice(list(service.edges_data)), {attr: value})
+        elif choice < 0.93:
+            service.add_node({"id": f"m{step}", "name": f"New {step}", "type": "warehouse"})
+        else:
+            removable = [node_id for node_id in node_ids if node_id not in {p for pair in pairs for p in pair}]
+            service.remove_node(rng.choice(removable))
+
+        fresh = fresh_copy(service)
+        for source, target in pairs:
+            assert route_totals(service, source, target) == route_totals(fresh, source, target), (step, source, target)
+
+def test_snapshot_mutations_match_full_compile(build_service, random_edge):
+    service, rng = build_service(seed=3)
+    removed = []
+    for step in range(60):
+        if step % 3 == 0:
+            edge_id = rng.choice(list(service.edges_data))
+            service.remove_edge(edge_id)
+            removed.append(edge_id)
+        else:
+            source, target = rng.choice(list(service.nodes_data), 2, replace=False).tolist()
+            if any(e["source_id"] == source and e["target_id"] == target for e in service.edges_data.values()):
+                continue
+            service.add_edge(random_edge(rng, f"x{step}", source, target))
+
+        compiled = service.compiled
+        expected = fresh_copy(service).compiled
+        reference = CompiledGraph.from_arrays(
+            compiled.node_ids,
+            [compiled.node_index[expected.node_ids[i]] for i in expected.edge_sources().tolist()],
+            [compiled.node_index[expected.node_ids[i]] for i in expected.indices.tolist()],
+            expected.edge_ids,
+            expected.weights
+        )
+        assert np.array_equal(compiled.indptr, reference.indptr)
+        assert np.array_equal(compiled.indices, reference.indices)
+        assert list(compiled.edge_ids) == list(reference.edge_ids)
+        for attr in EDGE_ATTRIBUTES:
+            assert np.array_equal(compiled.weights[attr], reference.weights[attr])
+        for edge_id in service.edges_data:
+            assert compiled.edge_index[edge_id] == reference.edge_index[edge_id]
+        for edge_id in removed:
+            if edge_id not in service.edges_data:
+                assert edge_id not in compiled.edge_index
+
+def test_route_index_keeps_unaffected_trees(build_service):
+    service, _ = build_service(seed=5)
+    compiled = service.compiled
+    service.route_index.clear()
+    route_totals(service, "n0", "n1")
+    trees = service.route_index.stats()["cached_trees"]
+    assert trees == 4
+
+    # Raising a weight on an edge off every cached tree leaves the trees alone
+    used = set()
+    for weight in ("distance", "cost", "duration", "risk_cost"):
+        _, predecessors = service.route_index._tree(compiled.node_index["n0"], weight)
+        used |= {(int(p), v) for v, p in enumerate(predecessors.tolist()) if p >= 0}
+    spare = next(
+        edge_id for edge_id, edge in service.edges_data.items()
+        if (compiled.node_index[edge["source_id"]], compiled.node_index[edge["target_id"]]) not in used
+    )
+    service.update_edge(spare, {"distance": 5000.0, "cost": 5000.0, "duration": 500.0, "risk_score": 0.9})
+    assert service.route_index.stats()["cached_trees"] == trees
+    assert service.route_index.stats()["invalidations"] == 0
+
+def test_install_warms_route_trees_in_the_pool(build_service):
+    async def scenario():
+        service, _ = build_service(seed=10)
+        # No loop was running at install, so nothing was warmed
+        assert service.route_index.stats()["cached_trees"] == 0
+        service.install_network(network_from_records(list(service.nodes_data.values()), list(service.edges_data.values())))
+        await service._warming
+        assert service.route_index.stats()["cached_trees"] > 0
+
+        # A mutation landing before the warm batch returns makes it stale, so it is dropped
+        service.install_network(network_from_records(list(service.nodes_data.values()), list(service.edges_data.values())))
+        service.update_edge(next(iter(service.edges_data)), {"cost": 1.0})
+        await service._warming
+        assert service.route_index.stats()["cached_trees"] == 0
+        service.pool.shutdown()
+
+    asyncio.run(scenario())
+
+def test_edge_update_leaves_older_snapshots_untouched(build_service):
+    service, _ = build_service(seed=6)
+    before_node = service.compiled
+    service.add_node({"id": "extra", "name": "Extra", "type": "store"})
+    before_update = service.compiled
+    edge_id = next(iter(service.edges_data))
+    position = before_update.edge_index[edge_id]
+    cost = float(before_update.weights["cost"][position])
+
+    service.update_edge(edge_id, {"cost": 12345.0})
+    after = service.compiled
+    assert after is not before_update and after.version == before_update.version
+    assert after.weights["cost"][position] == 12345.0
+    assert after.matrix("cost")[after.edge_sources()[position], after.indices[position]] == 12345.0
+    # with_node shared its weight columns with the older snapshot; neither sees the patch
+    for snapshot in (before_node, before_update):
+        assert snapshot.weights["cost"][position] == cost
+    assert after.weights["distance"] is before_update.weights["distance"]
+    assert service.route_index._graph is after
+
+def test_change_feed_since_and_truncation(build_service):
+    service, _ = build_service(seed=7)
+    start = service.version
+    for i in range(5):
+        service.add_node({"id": f"extra{i}", "name": "Extra", "type": "store"})
+
+    changes = service.changes.since(start)
+    assert [change["version"] for change in changes["changes"]] == list(range(start + 1, start + 6))
+    assert [change["id"] for change in changes["changes"]] == [f"extra{i}" for i in range(5)]
+    assert not changes["truncated"]
+    assert len(service.changes.since(start, limit=2)["changes"]) == 2
+
+    feed = ChangeFeed(history=3)
+    graph = service.compiled
+    for version in range(1, 7):
+        feed.publish(GraphChange("node_updated", "n0", version, graph))
+    assert feed.since(0)["truncated"]
+    recent = feed.since(3)
+    assert [change["version"] for change in recent["changes"]] == [4, 5, 6]
+    assert not recent["truncated"]
+    assert recent["oldest_version"] == 4
+    # History holds plain dicts, not the compiled graph
+    assert all(isinstance(change, dict) for change in feed._history)
+
+def test_failing_subscriber_is_reset_and_counted(caplog, build_service):
+    service, _ = build_service(seed=9)
+    route_totals(service, "n0", "n1")
+    assert service.route_index.stats()["cached_trees"] > 0
+
+    def broken(change):
+        raise RuntimeError("boom")
+
+    service.changes._subscribers[0] = (broken, service.route_index.reset)
+    service.add_node({"id": "late", "name": "Late", "type": "store"})
+
+    stats = service.changes.stats()
+    assert stats["failures"] == {"test_failing_subscriber_is_reset_and_counted.<locals>.broken": 1}
+    assert stats["last_failure"]["kind"] == "node_added"
+    assert service.route_index.stats()["cached_trees"] == 0
+    assert service.route_index._graph is service.compiled
+    failure = next(record for record in caplog.records if record.name == "services.change_feed")
+    assert failure.levelname == "ERROR" and failure.exc_info[0] is RuntimeError
+
+def test_without_node_requires_no_edges(build_service):
+    service, _ = build_service(seed=11)
+    with pytest.raises(ValueError):
+        service.compiled.without_node(service.topology_version + 1, 0)
@@ -0,0 +1,130 @@
+"""
+Bulk network loading: validation, strict mode, dedupe report and file formats
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.graph_engine import CompiledGraph
+from services.graph_loader import GraphLoadError, network_from_records, read_network
+
+NODES = [
+    {"id": "s1", "name": "Supplier", "type": "supplier", "lat": 31.2, "lng": 121.5, "city": "Shanghai", "capacity": 1000},
+    {"id": "w1", "name": "Warehouse", "type": "warehouse", "lat": 34.0, "lng": -118.2},
+    {"id": "w2", "type": "warehouse"},
+    {"id": "st1", "name": "Store", "type": "store", "lat": 40.7, "lng": -74.0}
+]
+
+EDGES = [
+    {"id": "e1", "source_id": "s1", "target_id": "w1", "route_type": "sea", "distance": 10000, "cost": 5000, "duration": 336, "risk_score": 0.3},
+    {"id": "e2", "source_id": "w1", "target_id": "w2", "route_type": "road", "distance": 50, "cost": 200, "duration": 4, "risk_score": 0.1},
+    {"id": "e3", "source_id": "w2", "target_id": "st1", "route_type": "road", "distance": 4500, "cost": 3000, "duration": 72, "risk_score": 0.2}
+]
+
+def write_csv(path, rows):
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+def write_jsonl(path, rows):
+    path.write_text("\n".join(json.dumps(row) for row in rows))
+    return str(path)
+
+def write_parquet(path, rows):
+    pd.DataFrame(rows).to_parquet(path)
+    return str(path)
+
+@pytest.mark.parametrize("write,suffix", [(write_csv, "csv"), (write_jsonl, "jsonl"), (write_parquet, "parquet")])
+def test_formats_load_the_same_network(tmp_path, write, suffix):
+    loaded = read_network(write(tmp_path / f"nodes.{suffix}", NODES), write(tmp_path / f"edges.{suffix}", EDGES), chunk_size=2)
+    assert [node["id"] for node in loaded.nodes] == ["s1", "w1", "w2", "st1"]
+    assert loaded.nodes[0]["location"] == {"lat": 31.2, "lng": 121.5, "city": "Shanghai"}
+    # Missing optional values are dropped, not carried as NaN
+    assert loaded.nodes[2] == {"id": "w2", "name": "w2", "type": "warehouse", "location": {}}
+    assert [edge["id"] for edge in loaded.edges] == ["e1", "e2", "e3"]
+    assert loaded.report["nodes"]["chunks"] == 2 and loaded.report["edges"]["chunks"] == 2
+
+    expected = network_from_records(NODES, EDGES).compiled
+    assert np.array_equal(loaded.compiled.indptr, expected.indptr)
+    assert np.array_equal(loaded.compiled.indices, expected.indices)
+    assert list(loaded.compiled.edge_ids) == list(expected.edge_ids)
+
+def test_invalid_rows_are_rejected_and_reported(tmp_path):
+    edges = EDGES + [
+        {"id": "bad_number", "source_id": "s1", "target_id": "w2", "distance": "far", "cost": 1, "duration": 1, "risk_score": 0.1},
+        {"id": "negative", "source_id": "s1", "target_id": "st1", "distance": -5, "cost": 1, "duration": 1, "risk_score": 0.1},
+        {"id": "risky", "source_id": "w1", "target_id": "st1", "distance": 5, "cost": 1, "duration": 1, "risk_score": 1.5},
+        {"id": "no_source", "source_id": "", "target_id": "st1", "distance": 5, "cost": 1, "duration": 1, "risk_score": 0.1}
+    ]
+    loaded = read_network(write_csv(tmp_path / "nodes.csv", NODES), write_jsonl(tmp_path / "edges.jsonl", edges))
+    report = loaded.report["edges"]
+    assert report["rows_read"] == 7
+    assert report["rows_rejected"] == 4
+    assert report["loaded"] == 3
+    assert [error.split(":", 1)[1].strip() for error in report["errors"]] == [
+        "'distance' is not a number",
+        "'distance' must be non-negative",
+        "'risk_score' must be within [0, 1]",
+        "'source_id' is required"
+    ]
+    assert report["errors"][0].startswith("row 3:")
+
+def test_strict_mode_fails_on_the_first_problem(tmp_path):
+    nodes = write_csv(tmp_path / "nodes.csv", NODES)
+    bad = write_csv(tmp_path / "bad.csv", EDGES + [{**EDGES[0], "id": "e9", "cost": "free"}])
+    with pytest.raises(GraphLoadError, match="row 3 invalid"):
+        read_network(nodes, bad, strict=True)
+
+    dangling = write_csv(tmp_path / "dangling.csv", EDGES + [{**EDGES[0], "id": "e9", "target_id": "nowhere"}])
+    with pytest.raises(GraphLoadError, match="unknown nodes"):
+        read_network(nodes, dangling, strict=True)
+
+    duplicated = write_csv(tmp_path / "duplicated.csv", EDGES + [EDGES[1]])
+    with pytest.raises(GraphLoadError, match="Duplicate"):
+        read_network(nodes, duplicated, strict=True)
+
+    missing = write_csv(tmp_path / "missing.csv", [{key: value for key, value in edge.items() if key != "cost"} for edge in EDGES])
+    with pytest.raises(GraphLoadError, match="missing required columns"):
+        read_network(nodes, missing)
+
+def test_duplicates_and_dangling_edges_are_dropped_and_counted(tmp_path):
+    nodes = write_csv(tmp_path / "nodes.csv", NODES + [{**NODES[1], "name": "Second copy"}])
+    edges = write_csv(tmp_path / "edges.csv", EDGES + [
+        {**EDGES[0], "distance": 1},                        # same id
+        {**EDGES[1], "id": "e2_again"},                     # same lane under a new id
+        {**EDGES[2], "id": "e4", "target_id": "nowhere"}    # unknown endpoint
+    ])
+    loaded = read_network(nodes, edges)
+    assert loaded.report["nodes"]["duplicates"] == 1
+    assert loaded.report["edges"]["duplicates"] == 2
+    assert loaded.report["edges"]["dangling"] == 1
+    # The first occurrence wins
+    assert next(node for node in loaded.nodes if node["id"] == "w1")["name"] == "Warehouse"
+    assert next(edge for edge in loaded.edges if edge["id"] == "e1")["distance"] == 10000
+    assert loaded.compiled.number_of_edges() == 3
+
+def test_unreadable_inputs(tmp_path):
+    (tmp_path / "nodes.xml").write_text("<nodes/>")
+    with pytest.raises(GraphLoadError, match="Unsupported file type"):
+        read_network(str(tmp_path / "nodes.xml"), str(tmp_path / "edges.csv"))
+    assert not (tmp_path / "nodes.csv").exists()
+    with pytest.raises(GraphLoadError, match="File not found"):
+        read_network(str(tmp_path / "nodes.csv"), str(tmp_path / "edges.csv"))
+
+def test_unnamed_edges_are_named_after_their_lane():
+    loaded = network_from_records(NODES, [{key: value for key, value in edge.items() if key != "id"} for edge in EDGES])
+    assert [edge["id"] for edge in loaded.edges] == ["s1->w1", "w1->w2", "w2->st1"]
+    assert isinstance(loaded.compiled, CompiledGraph)
+
+def test_edge_chunks_resolve_endpoints_and_records_are_built_on_demand(tmp_path):
+    nodes = write_csv(tmp_path / "nodes.csv", NODES)
+    # Duplicates of rows from earlier one-row chunks are still caught
+    edges = write_csv(tmp_path / "edges.csv", EDGES + [{**EDGES[0], "distance": 1}, {**EDGES[1], "id": "e2_again"}])
+    loaded = read_network(nodes, edges, chunk_size=1)
+    assert loaded.report["edges"]["chunks"] == 5 and loaded.report["edges"]["duplicates"] == 2
+
+    # Until records are read, edges hold node positions rather than id strings
+    assert loaded._edges is None and loaded._edge_frame["source_id"].dtype == np.int64
+    assert loaded.edges == network_from_records(NODES, EDGES).edges
+    assert loaded._edge_frame is None and loaded.edges[0]["source_id"] == "s1"
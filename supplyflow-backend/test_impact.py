@@ -0,0 +1,129 @@
+"""
+Disruption impact against a from-scratch recomputation
+"""
+
+import asyncio
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from services.disruption_service import DisruptionService
+from services.graph_loader import network_from_records
+from services.graph_service import GraphService
+
+def layered_service(seed):
+    """Suppliers -> warehouses -> stores, with some warehouse-to-warehouse links"""
+    rng = np.random.default_rng(seed)
+    layers = {"supplier": 4, "warehouse": 8, "store": 10}
+    nodes = [
+        {"id": f"{kind}_{i}", "name": f"{kind} {i}", "type": kind}
+        for kind, count in layers.items() for i in range(count)
+    ]
+    links = set()
+    for _ in range(70):
+        a, b = [("supplier", "warehouse"), ("warehouse", "warehouse"), ("warehouse", "store")][int(rng.integers(0, 3))]
+        source, target = f"{a}_{rng.integers(0, layers[a])}", f"{b}_{rng.integers(0, layers[b])}"
+        if source != target:
+            links.add((source, target))
+    edges = [
+        {
+            "id": f"e{i}", "source_id": source, "target_id": target, "route_type": "road",
+            "distance": float(rng.integers(10, 500)), "cost": float(rng.integers(10, 500)),
+            "duration": float(rng.integers(1, 50)), "risk_score": 0.1
+        }
+        for i, (source, target) in enumerate(sorted(links))
+    ]
+    service = GraphService()
+    service.install_network(network_from_records(nodes, edges))
+    return service, rng
+
+def best_supply_cost(service, dead_edges, dead_nodes):
+    """Cheapest cost from any live supplier to every node, recomputed from scratch"""
+    compiled = service.compiled
+    n = compiled.number_of_nodes()
+    sources = compiled.edge_sources()
+    keep = np.ones(compiled.number_of_edges(), dtype=bool)
+    keep[[compiled.edge_index[e] for e in dead_edges]] = False
+    dead = [compiled.node_index[node] for node in dead_nodes]
+    keep &= ~np.isin(sources, dead) & ~np.isin(compiled.indices, dead)
+    matrix = csr_matrix((compiled.weights["cost"][keep], (sources[keep], compiled.indices[keep])), shape=(n, n))
+    suppliers = [
+        compiled.node_index[node_id] for node_id, node in service.nodes_data.items()
+        if node["type"] == "supplier" and node_id not in dead_nodes
+    ]
+    return dijkstra(matrix, directed=True, indices=suppliers, min_only=True)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_impact_matches_recomputation(seed):
+    service, rng = layered_service(seed)
+    compiled = service.compiled
+    before = best_supply_cost(service, [], [])
+    for _ in range(4):
+        dead_edges = rng.choice(list(service.edges_data), 3, replace=False).tolist()
+        dead_nodes = [f"warehouse_{rng.integers(0, 8)}"]
+        result = service.impact.assess(compiled, dead_edges, dead_nodes)
+        after = best_supply_cost(service, dead_edges, dead_nodes)
+
+        reported = {store["store_id"]: store for store in result["affected_stores"]}
+        for node_id, node in service.nodes_data.items():
+            if node["type"] != "store":
+                continue
+            position = compiled.node_index[node_id]
+            if node_id in reported:
+                store = reported[node_id]
+                if np.isfinite(after[position]):
+                    assert store["status"] == "rerouted"
+                    assert store["cost_delta"] == pytest.approx(after[position] - before[position])
+                else:
+                    assert store["status"] == "unreachable"
+                    assert store["cost_delta"] is None
+            elif np.isfinite(before[position]):
+                # Stores left out keep their cheapest supply cost
+                assert after[position] == pytest.approx(before[position])
+
+def test_impact_results_follow_graph_changes():
+    service, _ = layered_service(7)
+    edge_id = next(iter(service.edges_data))
+    first = service.impact.assess(service.compiled, [edge_id], [])
+    assert service.impact.assess(service.compiled, [edge_id], []) is first
+    service.update_edge(edge_id, {"cost": 1.0})
+    assert service.impact.assess(service.compiled, [edge_id], []) is not first
+
+    with pytest.raises(KeyError):
+        service.impact.assess(service.compiled, ["missing"], [])
+
+def test_changes_queue_until_the_next_threaded_assessment():
+    service, _ = layered_service(8)
+    edge_id = next(iter(service.edges_data))
+    first = asyncio.run(service.disruption_impact({"affected_routes": [edge_id]}))
+    service.update_edge(edge_id, {"cost": 1.0})
+    service.add_node({"id": "store_new", "name": "New store", "type": "store"})
+    assert service.impact.stats()["pending_changes"] == 2
+
+    # The queued changes drop the cached result before the next assessment looks it up
+    second = asyncio.run(service.disruption_impact({"affected_routes": [edge_id]}))
+    stats = service.impact.stats()
+    assert stats["pending_changes"] == 0 and stats["misses"] == 2 and stats["hits"] == 0
+    assert second["graph_version"] == first["graph_version"] + 2
+    assert service.impact.assess(service.compiled, [edge_id], [])["summary"] == second["summary"]
+    assert service.impact.stats()["hits"] == 1
+
+def test_create_stores_disruption_when_impact_fails():
+    async def impact(data):
+        if "location" in data:
+            raise ValueError("location needs numeric lat, lng and radius_km")
+        return {"affected_stores": [], "disruption": data["id"]}
+
+    async def scenario():
+        service = DisruptionService(impact=impact)
+        failed = await service.create_disruption({"title": "Bad location", "location": {"lat": "x"}})
+        assert failed["success"]
+        assert failed["impact"] == {"error": "Impact assessment failed: location needs numeric lat, lng and radius_km"}
+        assert (await service.get_disruption(failed["disruption"]["id"]))["title"] == "Bad location"
+
+        # The assessment sees the stored disruption, id included
+        created = await service.create_disruption({"title": "Fine"})
+        assert created["impact"]["disruption"] == created["disruption"]["id"]
+
+    asyncio.run(scenario())
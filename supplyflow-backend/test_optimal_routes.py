@@ -0,0 +1,30 @@
+"""
+Optimal routes served from the route index, per criterion
+"""
+
+import asyncio
+import math
+import networkx as nx
+
+def test_each_listed_criterion_returns_its_optimal_route(build_service):
+    service, _ = build_service(seed=13)
+    graph = service.graph
+    checked = 0
+    for source, target in [("n0", "n1"), ("n2", "n7"), ("n5", "n11"), ("n9", "n3")]:
+        result = asyncio.run(service.find_optimal_routes({"source": source, "target": target}))
+        if result["status"] != "ok":
+            continue
+        routes = {route["optimization_type"]: route for route in result["optimal_routes"]}
+        assert sorted(routes) == sorted(result["criteria"])
+
+        for criterion, attr in (("shortest_distance", "distance"), ("lowest_cost", "cost"), ("fastest_time", "duration")):
+            assert routes[criterion]["metrics"][f"total_{attr}"] == nx.shortest_path_length(graph, source, target, weight=attr)
+
+        # The safest route maximizes the chance that every leg holds
+        safest = nx.shortest_path_length(
+            graph, source, target, weight=lambda u, v, edge: -math.log1p(-edge["risk_score"])
+        )
+        failure = routes["lowest_risk"]["metrics"]["failure_probability"]
+        assert math.isclose(failure, 1 - math.exp(-safest), abs_tol=1e-4)
+        checked += 1
+    assert checked
@@ -0,0 +1,135 @@
+"""
+Pareto route search against brute-force enumeration of simple paths
+"""
+
+import math
+import networkx as nx
+import numpy as np
+import pytest
+
+from services.graph_engine import CompiledGraph
+from services.pareto import compute_pareto_routes, normalize_weights, path_limits
+
+def random_graph(rng, num_nodes=10, num_edges=28):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(f"n{i}" for i in range(num_nodes))
+    while graph.number_of_edges() < num_edges:
+        source, target = rng.integers(0, num_nodes, 2).tolist()
+        if source != target:
+            graph.add_edge(
+                f"n{source}", f"n{target}",
+                distance=float(rng.integers(1, 50)),
+                cost=float(rng.integers(1, 50)),
+                duration=float(rng.integers(1, 20)),
+                risk_score=round(float(rng.random() * 0.4), 3)
+            )
+    return graph
+
+def totals(graph, path):
+    edges = [graph.edges[u, v] for u, v in zip(path, path[1:])]
+    return (
+        sum(edge["distance"] for edge in edges),
+        sum(edge["cost"] for edge in edges),
+        sum(edge["duration"] for edge in edges),
+        sum(-math.log1p(-edge["risk_score"]) for edge in edges)
+    )
+
+def dominated(a, b):
+    """Whether ``b`` dominates ``a``"""
+    return all(y <= x + 1e-9 for x, y in zip(a, b)) and any(y < x - 1e-9 for x, y in zip(a, b))
+
+def brute_force_frontier(graph, source, target, limits=None):
+    candidates = {totals(graph, path) for path in nx.all_simple_paths(graph, source, target)}
+    if limits is not None:
+        candidates = {t for t in candidates if all(value <= limit for value, limit in zip(t, limits))}
+    return {t for t in candidates if not any(dominated(t, other) for other in candidates)}
+
+def as_key(t):
+    return (round(t[0], 4), round(t[1], 4), round(t[2], 4), round(-math.expm1(-t[3]), 4))
+
+def frontier_keys(result):
+    return {
+        (
+            path["metrics"]["total_distance"],
+            path["metrics"]["total_cost"],
+            path["metrics"]["total_duration"],
+            path["metrics"]["failure_probability"]
+        )
+        for path in result["paths"]
+    }
+
+def test_frontier_matches_all_simple_paths():
+    weights = normalize_weights(None)
+    checked = 0
+    for seed in range(40):
+        rng = np.random.default_rng(seed)
+        graph = random_graph(rng)
+        compiled = CompiledGraph.from_networkx(graph)
+        source, target = rng.choice(compiled.number_of_nodes(), 2, replace=False).tolist()
+        result = compute_pareto_routes(compiled, source, target, weights, path_limits(None), limit=1000)
+
+        expected = brute_force_frontier(graph, compiled.node_ids[source], compiled.node_ids[target])
+        if not expected:
+            assert result["status"] == "unreachable" and result["paths"] == []
+            continue
+        assert result["status"] == "complete"
+        assert frontier_keys(result) == {as_key(t) for t in expected}
+        assert result["frontier_size"] == len(expected)
+        # Every returned path is a real simple path with the totals it reports
+        for path in result["paths"]:
+            assert len(set(path["path"])) == len(path["path"])
+            assert as_key(totals(graph, path["path"])) == (
+                path["metrics"]["total_distance"],
+                path["metrics"]["total_cost"],
+                path["metrics"]["total_duration"],
+                path["metrics"]["failure_probability"]
+            )
+        scores = [path["score"] for path in result["paths"]]
+        assert scores == sorted(scores, reverse=True)
+        checked += 1
+    assert checked >= 20
+
+def test_constraints_keep_the_feasible_frontier():
+    weights = normalize_weights({"cost": 1})
+    for seed in range(20):
+        rng = np.random.default_rng(100 + seed)
+        graph = random_graph(rng)
+        compiled = CompiledGraph.from_networkx(graph)
+        source, target = rng.choice(compiled.number_of_nodes(), 2, replace=False).tolist()
+        constraints = {"max_distance": 60, "max_risk": 0.5}
+        limits = path_limits(constraints)
+        result = compute_pareto_routes(compiled, source, target, weights, limits, limit=1000)
+
+        expected = brute_force_frontier(graph, compiled.node_ids[source], compiled.node_ids[target], limits)
+        assert frontier_keys(result) == {as_key(t) for t in expected}
+        if result["status"] == "infeasible":
+            assert not expected
+        for path in result["paths"]:
+            assert path["metrics"]["total_distance"] <= 60
+            assert path["metrics"]["failure_probability"] <= 0.5
+
+def test_epsilon_thins_and_truncation_keeps_the_optima():
+    rng = np.random.default_rng(7)
+    graph = random_graph(rng, num_nodes=14, num_edges=50)
+    compiled = CompiledGraph.from_networkx(graph)
+    weights = normalize_weights(None)
+    exact = compute_pareto_routes(compiled, 0, 1, weights, path_limits(None), limit=1000)
+    thinned = compute_pareto_routes(compiled, 0, 1, weights, path_limits(None), epsilon=0.2, limit=1000)
+    assert thinned["frontier_size"] <= exact["frontier_size"]
+
+    truncated = compute_pareto_routes(compiled, 0, 1, weights, path_limits(None), max_labels=1, limit=1000)
+    assert truncated["status"] == "truncated"
+    # The single-criterion optima seed the frontier, so each best value is still there
+    for key, attr in (("total_distance", "distance"), ("total_cost", "cost"), ("total_duration", "duration")):
+        best = nx.shortest_path_length(graph, compiled.node_ids[0], compiled.node_ids[1], weight=attr)
+        assert min(path["metrics"][key] for path in truncated["paths"]) == best
+
+def test_invalid_weights_and_constraints():
+    with pytest.raises(ValueError):
+        normalize_weights({"speed": 1})
+    with pytest.raises(ValueError):
+        normalize_weights({"cost": 0})
+    with pytest.raises(ValueError):
+        path_limits({"max_risk": 1})
+    with pytest.raises(ValueError):
+        path_limits({"max_cost": -1})
@@ -0,0 +1,92 @@
+"""
+Resilience: cut structure and sampled pair connectivity against networkx
+"""
+
+import asyncio
+import itertools
+import networkx as nx
+import numpy as np
+import pytest
+
+from services.executor import WorkerPool
+from services.graph_engine import CompiledGraph
+from services.resilience import (
+    TARGET_CONNECTIVITY,
+    ResilienceEngine,
+    _cut_structure,
+    _edge_connectivity,
+    _undirected_neighbors,
+    compute_resilience
+)
+
+def random_graph(num_nodes, num_edges, seed, version=0):
+    graph = nx.gnm_random_graph(num_nodes, num_edges, seed=seed, directed=True)
+    graph = nx.relabel_nodes(graph, {i: f"n{i}" for i in graph.nodes()})
+    return graph, CompiledGraph.from_networkx(graph, version=version)
+
+@pytest.mark.parametrize("num_edges,seed", [(30, 0), (45, 1), (60, 2), (25, 3)])
+def test_cut_structure_matches_networkx(num_edges, seed):
+    graph, compiled = random_graph(30, num_edges, seed)
+    undirected = graph.to_undirected()
+    neighbors, _ = _undirected_neighbors(compiled)
+    articulation_points, bridges = _cut_structure(neighbors)
+
+    assert {compiled.node_ids[i] for i in articulation_points} == set(nx.articulation_points(undirected))
+    assert {frozenset((compiled.node_ids[u], compiled.node_ids[v])) for u, v in bridges} == {
+        frozenset(edge) for edge in nx.bridges(undirected)
+    }
+
+def test_pair_connectivity_matches_networkx():
+    graph, compiled = random_graph(20, 60, seed=4)
+    undirected = graph.to_undirected()
+    neighbors, _ = _undirected_neighbors(compiled)
+    for u, v in itertools.combinations(range(20), 2):
+        expected = nx.edge_connectivity(undirected, compiled.node_ids[u], compiled.node_ids[v])
+        assert _edge_connectivity(neighbors, u, v, cutoff=10) == expected, (u, v)
+        assert _edge_connectivity(neighbors, u, v, cutoff=2) == min(expected, 2)
+
+def test_sampled_score_tracks_exact_pair_connectivity():
+    graph, compiled = random_graph(40, 90, seed=5)
+    undirected = graph.to_undirected()
+    giant = max(nx.connected_components(undirected), key=len)
+    exact = np.mean([
+        min(nx.edge_connectivity(undirected, u, v), TARGET_CONNECTIVITY)
+        for u, v in itertools.combinations(sorted(giant), 2)
+    ])
+
+    result = compute_resilience(compiled, sample_pairs=400, time_budget=30, seed=0)
+    assert result["status"] == "complete" and result["sampled_pairs"] == 400
+    assert abs(result["mean_pair_connectivity"] - exact) < 0.15
+    assert result["components"] == nx.number_connected_components(undirected)
+    assert result["giant_component_fraction"] == round(len(giant) / 40, 3)
+    assert sorted(result["articulation_points"]) == sorted(nx.articulation_points(undirected))
+    assert 0 <= result["score"] <= 1
+
+def test_structure_drives_the_score():
+    # A ring survives any single cut; a path falls apart at every edge
+    ring = nx.cycle_graph(12, create_using=nx.DiGraph)
+    path = nx.path_graph(12, create_using=nx.DiGraph)
+    ring_result = compute_resilience(CompiledGraph.from_networkx(ring), seed=0)
+    path_result = compute_resilience(CompiledGraph.from_networkx(path), seed=0)
+    assert ring_result["bridges"] == [] and ring_result["articulation_points"] == []
+    assert len(path_result["bridges"]) == 11 and len(path_result["articulation_points"]) == 10
+    assert ring_result["mean_pair_connectivity"] == 2 and path_result["mean_pair_connectivity"] == 1
+    assert ring_result["score"] > path_result["score"]
+
+def test_exhausted_budget_reports_partial():
+    _, compiled = random_graph(40, 120, seed=6)
+    result = compute_resilience(compiled, sample_pairs=50, time_budget=0)
+    assert result["status"] == "partial" and result["sampled_pairs"] < 50
+
+def test_engine_reuses_the_result_for_a_version():
+    async def scenario():
+        pool = WorkerPool("thread", max_workers=1)
+        engine = ResilienceEngine(sample_pairs=8, pool=pool)
+        _, first = random_graph(30, 80, seed=7, version=1)
+        _, second = random_graph(30, 80, seed=8, version=2)
+        result = await engine.evaluate(first)
+        assert result["version"] == 1 and await engine.evaluate(first) is result
+        assert (await engine.evaluate(second))["version"] == 2
+        pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+"""
+ETag revalidation of cached responses
+"""
+
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from services.ml_service import MLService
+from services.response_cache import ResponseCache
+
+def make_app(cache, state):
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items(request: Request):
+        def build():
+            state["builds"] += 1
+            return {"items": state["items"]}
+        return await cache.respond(request, state["version"], build)
+
+    return app
+
+def test_etag_revalidation():
+    cache = ResponseCache()
+    state = {"version": 1, "items": [1, 2], "builds": 0}
+    client = TestClient(make_app(cache, state))
+
+    first = client.get("/items")
+    assert first.status_code == 200
+    assert first.json() == {"items": [1, 2]}
+    etag = first.headers["etag"]
+
+    # Same version: served from the cache, and 304 when the client already has it
+    assert client.get("/items", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/items", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/items", headers={"If-None-Match": '"other", ' + etag}).status_code == 304
+    assert client.get("/items", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert state["builds"] == 1
+
+    # A new data version builds a new body with a new ETag
+    state["version"] = 2
+    state["items"] = [3]
+    changed = client.get("/items", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json() == {"items": [3]}
+    assert changed.headers["etag"] != etag
+    assert state["builds"] == 2
+
+    # Query parameters are part of the key
+    client.get("/items?page=2")
+    assert state["builds"] == 3
+    assert cache.stats()["not_modified"] == 3
+
+def test_eviction_by_size():
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.get("a")
+    cache.put("c", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size == 10
+
+def test_model_status_version_ignores_cache_hits(tmp_path):
+    service = MLService(demand_store_path=str(tmp_path / "demand"))
+    asyncio.run(service.initialize_models())
+    request = {"region": "asia", "product_category": "electronics", "forecast_days": 7}
+
+    asyncio.run(service.forecast_demand(request))
+    version = service.status_version
+    # Unchanged series: the cached fit is reused and the status ETag holds
+    for _ in range(3):
+        asyncio.run(service.forecast_demand(request))
+        assert service.status_version == version
+
+    asyncio.run(service.forecast_demand({**request, "model": "moving_average"}))
+    assert service.status_version != version
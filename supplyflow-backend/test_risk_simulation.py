@@ -0,0 +1,102 @@
+"""
+Monte Carlo route risk: reproducibility, unreachable pairs and the batched sweep
+"""
+
+import asyncio
+import networkx as nx
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from services.executor import WorkerPool
+from services.graph_engine import CompiledGraph
+from services.risk_simulation import RiskSimulator, _Sweep
+
+def random_graph(rng, num_nodes=15, num_edges=45, max_risk=0.3):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(f"n{i}" for i in range(num_nodes))
+    while graph.number_of_edges() < num_edges:
+        source, target = rng.integers(0, num_nodes, 2).tolist()
+        if source != target:
+            graph.add_edge(
+                f"n{source}", f"n{target}",
+                distance=1.0, cost=1.0,
+                duration=float(rng.integers(1, 48)),
+                risk_score=float(rng.random() * max_risk)
+            )
+    return graph
+
+def simulate(simulator, graph, pairs, **kwargs):
+    return asyncio.run(simulator.simulate(graph, pairs, **kwargs))
+
+def test_seeded_runs_are_reproducible():
+    compiled = CompiledGraph.from_networkx(random_graph(np.random.default_rng(0)))
+    simulator = RiskSimulator(pool=WorkerPool(max_workers=4), trials_per_task=700)
+    pairs = [(0, 1), (2, 3), (4, 5)]
+
+    first = simulate(simulator, compiled, pairs, trials=3000, seed=42)
+    again = simulate(simulator, compiled, pairs, trials=3000, seed=42)
+    other = simulate(simulator, compiled, pairs, trials=3000, seed=43)
+    assert first["tasks"] == 5
+    assert first["pairs"] == again["pairs"]
+    assert first["pairs"] != other["pairs"]
+
+def test_pair_without_a_path_is_always_unreachable():
+    graph = random_graph(np.random.default_rng(1))
+    graph.add_node("island")
+    compiled = CompiledGraph.from_networkx(graph)
+    island = compiled.node_index["island"]
+    result = simulate(RiskSimulator(), compiled, [(0, island), (island, 0)], trials=500, seed=1)
+    for pair in result["pairs"]:
+        assert pair["p_unreachable"] == 1
+        assert pair["p_unreachable_stderr"] == 0
+        assert pair["lead_time"] is None
+        assert pair["baseline_lead_time"] is None
+
+def test_estimates_match_the_model():
+    graph = nx.DiGraph()
+    graph.add_edge("a", "b", distance=1.0, cost=1.0, duration=10.0, risk_score=0.3)
+    graph.add_edge("b", "c", distance=1.0, cost=1.0, duration=5.0, risk_score=0.0)
+    compiled = CompiledGraph.from_networkx(graph)
+    a, c = compiled.node_index["a"], compiled.node_index["c"]
+
+    pair = simulate(RiskSimulator(), compiled, [(a, c)], trials=20000, seed=7)["pairs"][0]
+    # The only path fails with the first leg, within four standard errors
+    assert abs(pair["p_unreachable"] - 0.3) < 4 * pair["p_unreachable_stderr"]
+    assert pair["baseline_lead_time"] == 15
+    # Only the risky first leg is delayed: 10 * (1 + 0.3 * Exp(1)) averages 13, plus 5 for the second
+    assert pair["lead_time"]["mean"] == pytest.approx(18, abs=0.1)
+    assert pair["lead_time"]["p50"] >= 15
+
+    # Without delays or failures every trial takes the baseline time
+    graph["a"]["b"]["risk_score"] = 0.0
+    calm = simulate(RiskSimulator(), CompiledGraph.from_networkx(graph), [(a, c)], trials=100, seed=7)["pairs"][0]
+    assert calm["p_unreachable"] == 0
+    assert calm["lead_time"]["p99"] == calm["lead_time"]["mean"] == 15
+
+def test_sweep_matches_dijkstra_per_trial():
+    for seed in range(10):
+        rng = np.random.default_rng(seed)
+        compiled = CompiledGraph.from_networkx(random_graph(rng, num_nodes=20, num_edges=60))
+        n = compiled.number_of_nodes()
+        edge_from, edge_to = compiled.edge_sources().astype(np.int64), compiled.indices.astype(np.int64)
+        sweep = _Sweep(edge_from, edge_to, n)
+
+        trials = 25
+        weights = rng.uniform(1, 50, (trials, len(edge_to)))
+        weights[rng.random(weights.shape) < 0.2] = np.inf
+        source = int(rng.integers(0, n))
+        distances = sweep.run(source, weights[:, sweep.order])
+
+        for trial in range(trials):
+            alive = np.isfinite(weights[trial])
+            matrix = csr_matrix((weights[trial][alive], (edge_from[alive], edge_to[alive])), shape=(n, n))
+            assert np.allclose(distances[trial], dijkstra(matrix, directed=True, indices=source))
+
+def test_invalid_arguments():
+    compiled = CompiledGraph.from_networkx(random_graph(np.random.default_rng(2)))
+    simulator = RiskSimulator(max_trials=1000)
+    for kwargs in ({"trials": 0}, {"trials": 1001}, {"delay_scale": -1}, {"seed": -5}):
+        with pytest.raises(ValueError):
+            simulate(simulator, compiled, [(0, 1)], **kwargs)
@@ -0,0 +1,110 @@
+"""
+Nearest, radius and bounding-box queries against brute-force great-circle distances
+"""
+
+import numpy as np
+import pytest
+
+from services.change_feed import GraphChange
+from services.spatial_index import EARTH_RADIUS_KM, SpatialIndex
+
+def random_nodes(rng, count, prefix="n"):
+    # Clustered near the antimeridian so the wrap-around cases get exercised
+    lat = rng.uniform(-80, 80, count)
+    lng = np.where(rng.random(count) < 0.4, rng.uniform(170, 180, count), rng.uniform(-180, 180, count))
+    lng = np.where(rng.random(count) < 0.5, lng, -lng)
+    return {
+        f"{prefix}{i}": {
+            "id": f"{prefix}{i}",
+            "type": ("warehouse", "store", "supplier")[i % 3],
+            "location": {"lat": float(lat[i]), "lng": float(lng[i])}
+        }
+        for i in range(count)
+    }
+
+def haversine(lat, lng, node):
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(node["location"]["lat"]), np.radians(node["location"]["lng"])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def brute_force(nodes, lat, lng, node_type=None):
+    return sorted(
+        (haversine(lat, lng, node), node_id) for node_id, node in nodes.items()
+        if node_type is None or node["type"] == node_type
+    )
+
+def in_box(node, min_lat, min_lng, max_lat, max_lng):
+    lat, lng = node["location"]["lat"], node["location"]["lng"]
+    if not min_lat <= lat <= max_lat:
+        return False
+    if min_lng <= max_lng:
+        return min_lng <= lng <= max_lng
+    return lng >= min_lng or lng <= max_lng
+
+def check_queries(index, nodes, rng):
+    for _ in range(20):
+        lat, lng = float(rng.uniform(-90, 90)), float(rng.uniform(-180, 180))
+        node_type = rng.choice([None, "warehouse", "store"])
+        expected = brute_force(nodes, lat, lng, node_type)
+
+        nearest = index.nearest(lat, lng, 7, node_type)
+        assert [distance for _, distance in nearest] == pytest.approx([d for d, _ in expected[:7]], abs=1e-6)
+        assert {node_id for node_id, _ in nearest} <= {node_id for _, node_id in expected}
+
+        radius = float(rng.uniform(100, 3000))
+        within = index.within(lat, lng, radius, node_type)
+        inside = [node_id for distance, node_id in expected if distance <= radius - 1e-6]
+        assert set(inside) <= {node_id for node_id, _ in within}
+        assert all(distance <= radius + 1e-6 for _, distance in within)
+
+    for min_lat, min_lng, max_lat, max_lng in [(-30, -60, 40, 60), (-60, 170, 60, -170), (10, 179, 70, -179.5), (-90, -180, 90, 180)]:
+        expected = {node_id for node_id, node in nodes.items() if in_box(node, min_lat, min_lng, max_lat, max_lng)}
+        assert set(index.in_bbox(min_lat, min_lng, max_lat, max_lng)) == expected
+        expected_stores = {node_id for node_id in expected if nodes[node_id]["type"] == "store"}
+        assert set(index.in_bbox(min_lat, min_lng, max_lat, max_lng, "store")) == expected_stores
+
+def test_queries_match_brute_force():
+    rng = np.random.default_rng(0)
+    nodes = random_nodes(rng, 500)
+    index = SpatialIndex(lambda: nodes.values())
+    check_queries(index, nodes, rng)
+    assert index.stats()["builds"] == 1
+
+def test_staged_changes_are_searched_before_the_rebuild():
+    rng = np.random.default_rng(1)
+    nodes = random_nodes(rng, 500)
+    index = SpatialIndex(lambda: nodes.values())
+    index.nearest(0, 0)
+
+    # Few enough changes to stay in the overlay: added, moved, retyped and removed nodes
+    for node_id, node in random_nodes(rng, 10, prefix="new").items():
+        nodes[node_id] = node
+        index.apply_change(GraphChange("node_added", node_id, 1, None, record=node))
+    for node_id in ("n1", "n2", "n3"):
+        nodes[node_id] = {**nodes[node_id], "location": {"lat": -nodes[node_id]["location"]["lat"], "lng": 179.9}}
+        index.apply_change(GraphChange("node_updated", node_id, 2, None, record=nodes[node_id]))
+    nodes["n4"] = {**nodes["n4"], "type": "store" if nodes["n4"]["type"] != "store" else "warehouse"}
+    index.apply_change(GraphChange("node_updated", "n4", 3, None, record=nodes["n4"]))
+    for node_id in ("n5", "n6"):
+        del nodes[node_id]
+        index.apply_change(GraphChange("node_removed", node_id, 4, None))
+
+    assert index.stats()["staged_changes"] > 0
+    check_queries(index, nodes, rng)
+    assert index.stats()["builds"] == 1
+    assert "n5" not in index.in_bbox(-90, -180, 90, 180)
+
+    index.reset(None)
+    check_queries(index, nodes, rng)
+    assert index.stats()["builds"] == 2 and index.stats()["staged_changes"] == 0
+
+def test_invalid_queries_are_rejected():
+    index = SpatialIndex(lambda: [])
+    with pytest.raises(ValueError):
+        index.nearest(91, 0)
+    with pytest.raises(ValueError):
+        index.within(0, 0, -1)
+    with pytest.raises(ValueError):
+        index.in_bbox(10, 0, -10, 5)
+    assert index.nearest(0, 0) == [] and index.in_bbox(-90, -180, 90, 180) == []
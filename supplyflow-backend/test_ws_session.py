@@ -0,0 +1,116 @@
+"""
+WebSocket sessions: id multiplexing, cancellation and request limits
+"""
+
+import asyncio
+from starlette.applications import Starlette
+from starlette.routing import WebSocketRoute
+from starlette.testclient import TestClient
+
+from services.broadcaster import Broadcaster
+from services.serialization import packb, unpackb
+from services.ws_session import WebSocketSession
+
+def session_app(max_concurrent=8, max_pending=64):
+    """App whose requests wait on named gates so tests control completion order"""
+    gates = {}
+    updates = Broadcaster(produce=None, snapshot=lambda: {"state": "full"})
+
+    def gate(name):
+        return gates.setdefault(name, asyncio.Event())
+
+    async def handler(message):
+        if message["type"] == "open":
+            gate(message["gate"]).set()
+            return {"type": "opened"}
+        if message["type"] == "publish":
+            return {"type": "published", "event_id": updates.publish(message["payload"])}
+        if message["type"] == "fail":
+            raise RuntimeError("boom")
+        await gate(message["gate"]).wait()
+        return {"type": "result", "gate": message["gate"]}
+
+    async def endpoint(websocket):
+        await websocket.accept()
+        encoding = websocket.query_params.get("encoding", "json")
+        session = WebSocketSession(
+            websocket,
+            handler,
+            channels={"updates": updates},
+            max_concurrent=max_concurrent,
+            max_pending=max_pending,
+            encoding=encoding
+        )
+        await session.run()
+
+    return Starlette(routes=[WebSocketRoute("/ws", endpoint)])
+
+def test_replies_are_tagged_and_may_arrive_out_of_order():
+    with TestClient(session_app()).websocket_connect("/ws") as ws:
+        ws.send_json({"id": "slow", "type": "wait", "gate": "a"})
+        ws.send_json({"id": 7, "type": "wait", "gate": "b"})
+        ws.send_json({"id": "open-b", "type": "open", "gate": "b"})
+        replies = [ws.receive_json(), ws.receive_json()]
+        assert {"id": "open-b", "type": "opened"} in replies
+        assert {"id": 7, "type": "result", "gate": "b"} in replies
+
+        ws.send_json({"id": "open-a", "type": "open", "gate": "a"})
+        replies = [ws.receive_json(), ws.receive_json()]
+        assert {"id": "slow", "type": "result", "gate": "a"} in replies
+
+        ws.send_json({"id": "bad", "type": "fail"})
+        assert ws.receive_json() == {"id": "bad", "type": "error", "message": "boom"}
+
+def test_duplicate_ids_and_pending_limit_are_rejected():
+    with TestClient(session_app(max_pending=2)).websocket_connect("/ws") as ws:
+        ws.send_json({"id": 1, "type": "wait", "gate": "g"})
+        ws.send_json({"id": 1, "type": "wait", "gate": "g"})
+        assert ws.receive_json() == {"id": 1, "type": "error", "message": "Request id already in use"}
+        ws.send_json({"id": 2, "type": "wait", "gate": "g"})
+        ws.send_json({"id": 3, "type": "wait", "gate": "g"})
+        assert ws.receive_json() == {"id": 3, "type": "error", "message": "Too many requests in flight"}
+        ws.send_json({"id": [1], "type": "wait", "gate": "g"})
+        assert ws.receive_json() == {"type": "error", "message": "Request id must be a string or number"}
+
+def test_cancel_stops_only_the_named_request():
+    with TestClient(session_app()).websocket_connect("/ws") as ws:
+        ws.send_json({"id": "stuck", "type": "wait", "gate": "never"})
+        ws.send_json({"id": "kept", "type": "wait", "gate": "later"})
+        ws.send_json({"id": "stuck", "type": "cancel"})
+        assert ws.receive_json() == {"id": "stuck", "type": "cancelled"}
+
+        # The id is free again once the cancelled request is gone
+        ws.send_json({"id": "stuck", "type": "open", "gate": "later"})
+        replies = [ws.receive_json(), ws.receive_json()]
+        assert {"id": "stuck", "type": "opened"} in replies
+        assert {"id": "kept", "type": "result", "gate": "later"} in replies
+
+        ws.send_json({"id": "gone", "type": "cancel"})
+        assert ws.receive_json() == {"id": "gone", "type": "error", "message": "No such request in flight"}
+
+def test_subscriptions_push_under_their_own_id():
+    with TestClient(session_app()).websocket_connect("/ws") as ws:
+        ws.send_json({"id": "sub", "type": "subscribe", "channel": "updates"})
+        assert ws.receive_json() == {"id": "sub", "type": "subscribed", "channel": "updates"}
+        assert ws.receive_json() == {
+            "id": "sub", "type": "push", "channel": "updates", "event": "snapshot", "event_id": 0, "data": {"state": "full"}
+        }
+
+        ws.send_json({"id": 1, "type": "publish", "payload": {"delta": 1}})
+        replies = [ws.receive_json(), ws.receive_json()]
+        assert {"id": 1, "type": "published", "event_id": 1} in replies
+        assert {
+            "id": "sub", "type": "push", "channel": "updates", "event": "disruption_update", "event_id": 1, "data": {"delta": 1}
+        } in replies
+
+        ws.send_json({"id": "sub", "type": "unsubscribe"})
+        assert ws.receive_json() == {"id": "sub", "type": "unsubscribed"}
+        ws.send_json({"id": "x", "type": "subscribe", "channel": "nope"})
+        assert ws.receive_json()["type"] == "error"
+
+def test_msgpack_sessions_use_binary_frames():
+    with TestClient(session_app()).websocket_connect("/ws?encoding=msgpack") as ws:
+        ws.send_bytes(packb({"id": 1, "type": "open", "gate": "x"}))
+        assert unpackb(ws.receive_bytes()) == {"id": 1, "type": "opened"}
+        ws.send_text("not json")
+        assert unpackb(ws.receive_bytes())["type"] == "error"